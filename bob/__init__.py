@@ -3,4 +3,4 @@
 __version__ = "0.2.5"
 
 from bob.api import BuildConfig, Command
-from bob.bob import bob
+from bob.bob import bob, bob_async
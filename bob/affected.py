@@ -0,0 +1,130 @@
+"""Select the parts of a codebase affected by the changes since a revision.
+
+The changes are determined with git, compared against the common ancestor of the
+revision and the current commit, like the changes of a pull request. Uncommitted
+and untracked files are included, files ignored by git are not.
+
+In a workspace, a changed file affects the member holding it, while a change
+outside of the members affects every member. A member depending on an affected
+member is affected as well. In a project, a target owns the toolchain file of its
+toolchain: a change to it only affects that target, any other change affects
+every target.
+"""
+import contextlib
+import logging
+import pathlib
+import subprocess
+import typing
+
+from bob.typehints import OptionsMapT
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from bob.workspace import Member
+
+
+def changed_files(root: pathlib.Path, since: str) -> typing.List[pathlib.Path]:
+    """Determine the files changed since a revision.
+
+    Args:
+        root: root folder of the codebase, changes outside of it are ignored.
+        since: the revision to compare against.
+
+    Returns:
+        The paths of the changed files, including removed files.
+
+    Raises:
+        ValueError: when the changes cannot be determined.
+    """
+    try:
+        base = _git(root, "merge-base", since, "HEAD").strip()
+        names = _git(
+            root, "diff", "--name-only", "--no-renames", "-z", "--relative", base
+        )
+        names += _git(root, "ls-files", "--others", "--exclude-standard", "-z")
+    except (OSError, subprocess.CalledProcessError) as ex:
+        raise ValueError(f"Unable to determine the changes since: {since}") from ex
+
+    result = sorted({root / x for x in names.split("\0") if x})
+    logging.info("Found %d changed files since: %s", len(result), since)
+    return result
+
+
+def select_members(
+    members: typing.Sequence["Member"], files: typing.Iterable[pathlib.Path]
+) -> typing.List["Member"]:
+    """Select the members of a workspace affected by changed files.
+
+    Args:
+        members: the members, each member follows the members it depends on.
+        files: the paths of the changed files.
+
+    Returns:
+        The affected members, in the given order.
+    """
+    selected: typing.Set[str] = set()
+    for path in files:
+        owners = {x.name for x in members if x.path in path.parents}
+        if not owners:
+            logging.info("Change outside of the workspace members: %s", path)
+            return list(members)
+        selected |= owners
+
+    for member in members:
+        if selected.intersection(member.depends):
+            selected.add(member.name)
+
+    result = [x for x in members if x.name in selected]
+    logging.info("Affected workspace members: %s", [x.name for x in result])
+    return result
+
+
+def select_combinations(
+    root: pathlib.Path, matrix: typing.Sequence[OptionsMapT], since: str
+) -> typing.List[OptionsMapT]:
+    """Select the combinations of target and build configuration affected by changes.
+
+    Args:
+        root: root folder of the project.
+        matrix: the given options of each combination.
+        since: the revision to compare against.
+
+    Returns:
+        The given options of the affected combinations, in the given order.
+
+    Raises:
+        ValueError: when the changes cannot be determined.
+    """
+    owners: typing.Dict[pathlib.Path, typing.Set[str]] = {}
+    for target in matrix[0].get("targets", {}):
+        path = _toolchain_file(root, matrix[0], target)
+        if path is not None:
+            owners.setdefault(path, set()).add(target.lower())
+
+    targets: typing.Set[str] = set()
+    for path in changed_files(root, since):
+        if path not in owners:
+            return list(matrix)
+        targets |= owners[path]
+
+    result = [x for x in matrix if str(x.get("target", "native")).lower() in targets]
+    logging.info("Affected combinations: %d of %d", len(result), len(matrix))
+    return result
+
+
+def _toolchain_file(
+    root: pathlib.Path, options: OptionsMapT, target: str
+) -> typing.Optional[pathlib.Path]:
+    with contextlib.suppress(KeyError, TypeError):
+        toolchain = options["targets"][target]["toolchain"]
+        return root / options["toolchains"][toolchain]["toolchain_file"]
+    return None
+
+
+def _git(root: pathlib.Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args],  # noqa: S607
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
@@ -1,99 +1,559 @@
 """Contains the entry point for the application.
 
 The function `bob` is called by the CLI script and is the function to call
-when integrating bob into custom scripting.
+when integrating bob into custom scripting. Its counterpart `bob_async` executes
+a command in an asyncio event loop.
+
+Importing `bob` imports this module, which is kept light. Modules only needed to
+execute a command are imported once a command executes.
 """
+# pylint: disable=import-outside-toplevel
 import contextlib
+import contextvars
+import itertools
 import logging
 import pathlib
-import subprocess
-import time
-import types
+import threading
 import typing
 
-from packaging import version
-
 from bob.api import Command
-from bob.common import parse_options
-from bob.modules import get_task
-from bob.typehints import OptionsMapT
+from bob.typehints import EnvMapT, OptionsMapT
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from bob.endpoints import Scheduler
+    from bob.executor import Job
+    from bob.output import Output
+    from bob.trace import Tracer
+    from bob.workspace import Member
+
+# A member of a workspace, the jobs linking its dependencies, and the given and
+# parsed options of each combination.
+MemberT = typing.Tuple[
+    "Member", typing.List["Job"], typing.List[OptionsMapT], typing.List[OptionsMapT]
+]
+
+# The jobs of a command, the number of jobs executing at once and the output.
+PreparedT = typing.Tuple[typing.List["Job"], int, typing.Optional["Output"]]
 
 
-class ExecutionTimer(contextlib.AbstractContextManager):
-    """High resolution timer to capture the execution time of a block.
+def bob(command: Command, input_options: OptionsMapT) -> None:
+    """Executes a `bob` command.
+
+    Args:
+        command: a command to execute
+        input_options: a map of options to pass to the command
 
-    Attributes:
-        duration (float): elapsed time in seconds.
-        duration_ns (int): elapsed time in whole nanoseconds.
-        duration_ms (float): elapsed time in miliseconds.
+    Todo:
+        - split options into given and parsed dicts.
+        - in case of an error, signal the CLI to match a return code?
     """
+    from bob import executor
+    from bob.trace import Tracer
 
-    def __init__(self: "ExecutionTimer") -> None:
-        """Initialize ExecutionTimer."""
-        self._start = 0
-        self.duration = 0.0
-        self.duration_ms = 0.0
-        self.duration_ns = 0
+    tracer = Tracer()
+    root = pathlib.Path.cwd()
+    prepared = _prepare(command, input_options, root, tracer)
+    with prepared as (jobs, slots, output), tracer.phase("Execute"):
+        executor.execute(jobs, slots, output)
 
-    def __enter__(self: "ExecutionTimer") -> "ExecutionTimer":
-        """Start the timed context by recording the current time.
+
+async def bob_async(
+    command: Command,
+    input_options: OptionsMapT,
+    *,
+    root: typing.Optional[pathlib.Path] = None,
+    timeout: typing.Optional[float] = None,
+) -> None:
+    """Executes a `bob` command in the running event loop.
+
+    The asynchronous counterpart of `bob`. The commands are prepared in a worker
+    thread and executed as subprocesses of the event loop, so several invocations
+    can execute at once, each in its own project. Cancelling the invocation
+    terminates the executing commands, or stops downloading the toolchains while the
+    commands are prepared.
+
+    Args:
+        command: a command to execute
+        input_options: a map of options to pass to the command
+        root: the root folder of the project, defaults to the working directory.
+        timeout: maximum duration of each command in seconds, a command exceeding
+            it is terminated and fails.
+    """
+    import asyncio
+
+    from bob import executor
+    from bob.trace import Tracer
+
+    tracer = Tracer()
+    root = pathlib.Path.cwd() if root is None else root
+    loop = asyncio.get_running_loop()
+    preparation = _Preparation(_prepare(command, input_options, root, tracer))
+    preparing = loop.run_in_executor(None, preparation.enter)
+    try:
+        jobs, slots, output = await asyncio.shield(preparing)
+    except asyncio.CancelledError as ex:
+        if preparation.abandon():
+            await loop.run_in_executor(None, preparation.exit, ex)
+        raise
+
+    # Writing the trace and recording the run block, the context is exited in a
+    # worker thread as well.
+    try:
+        with tracer.phase("Execute"):
+            await executor.execute_async(jobs, slots, output, cwd=root, timeout=timeout)
+    except BaseException as ex:
+        await loop.run_in_executor(None, preparation.exit, ex)
+        raise
+    await loop.run_in_executor(None, preparation.exit, None)
+
+
+class _Preparation:
+    """Prepares the jobs of a command in a worker thread, which may be abandoned.
+
+    Abandoning stops downloading the toolchains. The worker exits the context when
+    abandoned before it entered the context, otherwise the caller exits it.
+    """
+
+    def __init__(
+        self: "_Preparation", prepared: typing.ContextManager[PreparedT]
+    ) -> None:
+        from bob.tasks.bootstrap import cancelled
+
+        self._prepared = prepared
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._entered = False
+        self._context = contextvars.copy_context()
+        self._context.run(cancelled.set, self._cancelled)
+
+    def enter(self: "_Preparation") -> PreparedT:
+        """Enter the context, from the worker thread.
 
         Returns:
-            The timed context.
-        """
-        self._start = time.perf_counter_ns()
-        return self
+            The prepared jobs.
 
-    def __exit__(
-        self: "ExecutionTimer",
-        exc_type: typing.Optional[typing.Type[BaseException]],
-        exc_value: typing.Optional[BaseException],
-        exc_traceback: typing.Optional[types.TracebackType],
-    ) -> typing.Literal[False]:
-        """Stop the timed context and calculate the elapsed time.
+        Raises:
+            RuntimeError: when abandoned.
+        """
+        result = self._context.run(self._prepared.__enter__)
+        with self._lock:
+            self._entered = not self._cancelled.is_set()
+        if not self._entered:
+            self.exit(RuntimeError("Cancelled"))
+            raise RuntimeError("Cancelled")
+        return result
 
-        Args:
-            exc_type: optional exception type
-            exc_value: optional exception value
-            exc_traceback: optional exception traceback
+    def abandon(self: "_Preparation") -> bool:
+        """Stop preparing the jobs.
 
         Returns:
-            False, any captured exception will be propagated.
+            True when the context was entered, the caller has to exit it.
         """
-        stop = time.perf_counter_ns()
-        self.duration_ns = stop - self._start
-        self.duration_ms = self.duration_ns * 1e-6
-        self.duration = self.duration_ns * 1e-9
-        return False
+        with self._lock:
+            self._cancelled.set()
+            return self._entered
 
+    def exit(self: "_Preparation", error: typing.Optional[BaseException]) -> None:
+        """Exit the context.
 
-def bob(command: Command, input_options: OptionsMapT) -> None:
-    """Executes a `bob` command.
+        Args:
+            error: the exception raised while the jobs executed, if any.
+        """
+        if error is None:
+            self._prepared.__exit__(None, None, None)
+        else:
+            self._prepared.__exit__(type(error), error, error.__traceback__)
 
-    Args:
-        command: a command to execute
-        input_options: a map of options to pass to the command
 
-    Todo:
-        - split options into given and parsed dicts.
-        - in case of an error, signal the CLI to match a return code?
+@contextlib.contextmanager
+def _prepare(
+    command: Command,
+    input_options: OptionsMapT,
+    root: pathlib.Path,
+    tracer: "Tracer",
+) -> typing.Iterator[PreparedT]:
+    """Prepare the jobs of a command, for the duration of their execution.
+
+    Once the jobs executed, the trace is written and the run is recorded in the
+    history. Relative locations in the options are relative to `root`.
     """
+    from bob.common import parse_options
+    from bob.executor import ExecutionError
+    from bob.history import record_run
+
     logging.info("Execting command: %s", command)
     logging.debug("Given options: %s", input_options)
 
-    if not _required_tools_present():
-        raise RuntimeError("Missing dependencies")
+    combinations: typing.List[OptionsMapT] = []
+    status = 1
+    try:
+        with tracer.phase("Probe tools"):
+            if not _required_tools_present():
+                raise RuntimeError("Missing dependencies")
+
+        logging.debug("Working directory: %s", root)
+
+        with tracer.phase("Resolve tasks"):
+            tasks = _determine_dependent_tasks(command)
+        logging.debug("Processing %d tasks: %s", len(tasks), tasks)
+
+        with tracer.phase("Parse options"):
+            matrix = _determine_matrix(root, input_options)
+            combinations = [parse_options(x) for x in matrix]
+
+        env: EnvMapT = {"root_path": root}
+        with _generate(tasks, matrix, combinations, env, tracer) as prepared:
+            yield prepared
+        status = 0
+    except ExecutionError as ex:
+        status = ex.returncode
+        raise
+    finally:
+        with contextlib.suppress(KeyError):
+            tracer.write(root / input_options["trace_file"])
+        if input_options.get("history", {}).get("enabled", True):
+            record_run(root, str(command).lower(), combinations, tracer, status)
+
+
+def _determine_matrix(
+    root: pathlib.Path, input_options: OptionsMapT
+) -> typing.List[OptionsMapT]:
+    """Determine the given options of each combination of target and build config.
+
+    When requested, only the combinations affected by the changes are kept. In a
+    workspace, the changes select the members instead.
+    """
+    from bob.affected import select_combinations
+    from bob.common import determine_matrix
+    from bob.workspace import is_workspace
+
+    matrix: typing.List[OptionsMapT] = [
+        {**input_options, **x} for x in determine_matrix(input_options)
+    ]
+    if "affected" in input_options and not is_workspace(input_options):
+        return select_combinations(root, matrix, input_options["affected"])
+    return matrix
+
+
+@contextlib.contextmanager
+def _generate(
+    tasks: typing.Sequence[Command],
+    matrix: typing.Sequence[OptionsMapT],
+    combinations: typing.Sequence[OptionsMapT],
+    env: EnvMapT,
+    tracer: "Tracer",
+) -> typing.Iterator[PreparedT]:
+    """Generate the jobs, the output and jobserver are kept until they executed."""
+    from bob.jobserver import Jobserver
+    from bob.workspace import is_workspace
+
+    output = _create_output(combinations[0], env["root_path"]) if combinations else None
+    slots = combinations[0]["jobs"] if combinations else 1
+    with contextlib.ExitStack() as stack:
+        if output is not None:
+            stack.callback(output.close)
+
+        jobs: typing.List[Job] = []
+        if not combinations:
+            logging.info("Nothing affected by the changes, no commands to execute")
+        elif is_workspace(matrix[0]):
+            with tracer.phase("Generate commands"):
+                jobs = _generate_workspace_jobs(tasks, matrix[0], env, slots, stack)
+        elif len(combinations) == 1:
+            with tracer.phase("Generate commands"):
+                jobs, _ = _generate_jobs(tasks, matrix[0], combinations[0], env, [])
+        else:
+            jobserver = stack.enter_context(
+                Jobserver(slots, min(slots, len(combinations)))
+            )
+            for options in combinations:
+                options["jobserver"] = jobserver
+                options["parallel"] = max(1, options["jobs"] // len(combinations))
+            with tracer.phase("Generate commands"):
+                jobs = _generate_matrix_jobs(tasks, matrix, combinations, env)
+
+        tracer.add_jobs(jobs)
+        yield jobs, slots, output
+
+
+def _create_output(
+    options: OptionsMapT, root: pathlib.Path
+) -> typing.Optional["Output"]:
+    """Capture the output of the commands, when a log folder is given.
+
+    Each invocation writes its logs to a new folder, named after the current time.
+    """
+    import time
+    import uuid
+
+    from bob.output import Output
+
+    try:
+        folder = root / options["log_dir"]
+    except KeyError:
+        return None
+
+    output = Output(folder / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+    logging.info("Writing the output of the commands to: %s", output.folder)
+    return output
+
+
+def _generate_matrix_jobs(
+    tasks: typing.Sequence[Command],
+    matrix: typing.Sequence[OptionsMapT],
+    combinations: typing.Sequence[OptionsMapT],
+    env: EnvMapT,
+    scheduler: typing.Optional["Scheduler"] = None,
+) -> typing.List["Job"]:
+    """Generate the jobs for several targets and build configurations.
+
+    The leading tasks marked as shared are processed once. The other tasks are
+    processed for each combination, concurrently, sharing the jobserver or splitting
+    the jobs between them as set in the options of each combination. A combination
+    building in a container is assigned to a Docker endpoint, when configured.
+    """
+    from bob.endpoints import scheduler as create_scheduler
+    from bob.modules import get_task
+
+    logging.info("Processing %d targets and configs", len(combinations))
+    shared = 0
+    while shared < len(tasks) and getattr(get_task(tasks[shared]), "SHARED", False):
+        shared += 1
 
-    cwd = pathlib.Path.cwd()
-    logging.debug("Working directory: %s", cwd)
+    jobs, after = _generate_jobs(tasks[:shared], matrix[0], combinations[0], env, [])
+    if shared == len(tasks):
+        return jobs
 
-    tasks = _determine_dependent_tasks(command)
-    logging.debug("Processing %d tasks: %s", len(tasks), tasks)
+    if scheduler is None:
+        scheduler = create_scheduler(matrix[0])
+    for given, options in zip(matrix, combinations):
+        if scheduler is not None:
+            scheduler.assign(options)
+        jobs += _generate_combination_jobs(
+            tasks[shared:], given, options, dict(env), after
+        )
+
+    return jobs
+
+
+def _generate_combination_jobs(
+    tasks: typing.Sequence[Command],
+    input_options: OptionsMapT,
+    options: OptionsMapT,
+    env: EnvMapT,
+    after: typing.List[str],
+) -> typing.List["Job"]:
+    """Generate the jobs for a single target and build configuration.
+
+    On a remote endpoint, the codebase is copied to the endpoint first and the
+    build folder is copied back once the tasks completed.
+    """
+    from bob import executor
+    from bob.common import determine_output_folder, generate_sync_commands
+
+    prefix = f"{determine_output_folder(options)}:"
+    upload, download = generate_sync_commands(options, env["root_path"])
+    jobs = executor.link(upload, f"{prefix}upload", after)
+    if jobs:
+        after = [str(jobs[-1].name)]
+
+    task_jobs, after = _generate_jobs(
+        tasks, input_options, options, env, after, prefix=prefix
+    )
+    return jobs + task_jobs + executor.link(download, f"{prefix}download", after)
 
-    env = {
-        "root_path": cwd,
+
+def _generate_workspace_jobs(
+    tasks: typing.Sequence[Command],
+    input_options: OptionsMapT,
+    env: EnvMapT,
+    slots: int,
+    stack: contextlib.ExitStack,
+) -> typing.List["Job"]:
+    """Generate the jobs for each member of a workspace, as a single graph.
+
+    The dependencies shared by the members are retrieved into the root first. The
+    members processed at once share the jobserver.
+    """
+    from bob import endpoints, workspace
+
+    members = _discover_members(env["root_path"], input_options)
+
+    shared: typing.Dict[str, OptionsMapT] = {}
+    if Command.Bootstrap in tasks and Command.Bootstrap not in input_options.get(
+        "skip_tasks", ()
+    ):
+        shared = workspace.share_dependencies(members)
+    jobs, after = _generate_shared_jobs(env["root_path"], input_options, shared)
+
+    folder = workspace.dependencies_folder(env["root_path"], input_options)
+    prepared = [_prepare_member(x, shared, folder) for x in members]
+    settings = _share_jobserver(prepared, workspace.width(members), slots, stack)
+    scheduler = endpoints.scheduler(input_options)
+    return jobs + _generate_member_jobs(tasks, prepared, after, settings, scheduler)
+
+
+def _share_jobserver(
+    prepared: typing.Sequence[MemberT],
+    width: int,
+    slots: int,
+    stack: contextlib.ExitStack,
+) -> OptionsMapT:
+    """Start the jobserver shared by the members processed at once.
+
+    Returns:
+        The options to add for each combination of the members.
+    """
+    from bob.jobserver import Jobserver
+
+    clients = width * max((len(x[3]) for x in prepared), default=1)
+    return {
+        "jobserver": stack.enter_context(Jobserver(slots, min(slots, clients))),
+        "parallel": max(1, slots // clients),
     }
-    options = parse_options(input_options)
+
+
+def _discover_members(
+    root: pathlib.Path, input_options: OptionsMapT
+) -> typing.List["Member"]:
+    """Find the members of a workspace, only those affected by changes if requested."""
+    from bob import affected, workspace
+
+    members = workspace.discover(root, input_options)
+    if "affected" in input_options:
+        files = affected.changed_files(root, input_options["affected"])
+        members = affected.select_members(members, files)
+    logging.info("Processing %d workspace members", len(members))
+    return members
+
+
+def _generate_shared_jobs(
+    root: pathlib.Path,
+    input_options: OptionsMapT,
+    shared: typing.Mapping[str, OptionsMapT],
+) -> typing.Tuple[typing.List["Job"], typing.List[str]]:
+    """Generate the jobs retrieving the shared dependencies into the root.
+
+    Returns:
+        The jobs, and the names of the jobs no other job waits on.
+    """
+    from bob import workspace
+    from bob.common import parse_options
+
+    if not shared:
+        return [], []
+
+    logging.info("Sharing dependencies: %s", sorted(shared))
+    options = workspace.shared_options(root, input_options, shared)
+    env: EnvMapT = {"root_path": root}
+    jobs, _ = _generate_jobs(
+        [Command.Bootstrap], options, parse_options(options), env, []
+    )
+    return jobs, _namespace(jobs, workspace.ROOT_PREFIX, root, [])
+
+
+def _prepare_member(
+    member: "Member",
+    shared: typing.Mapping[str, OptionsMapT],
+    folder: pathlib.Path,
+) -> MemberT:
+    """Determine the options of a member, and the jobs linking the shared dependencies.
+
+    Returns:
+        The member, the jobs linking the dependencies, the given options and parsed
+        options of each combination of target and build configuration.
+    """
+    from bob import executor
+    from bob.common import determine_matrix, parse_options
+    from bob.workspace import link_dependencies
+
+    options, links = link_dependencies(member, shared, folder)
+    matrix: typing.List[OptionsMapT] = [
+        {**options, **x} for x in determine_matrix(options)
+    ]
+    combinations = [parse_options(x) for x in matrix]
+    return member, executor.link(links, "link"), matrix, combinations
+
+
+def _generate_member_jobs(
+    tasks: typing.Sequence[Command],
+    prepared: typing.Sequence[MemberT],
+    after: typing.Sequence[str],
+    settings: OptionsMapT,
+    scheduler: typing.Optional["Scheduler"],
+) -> typing.List["Job"]:
+    """Generate the jobs of the members of a workspace.
+
+    The jobs of a member wait on the jobs of the members it depends on, and execute
+    in the folder of the member. The settings are added to the options of each
+    combination, the scheduler assigns the combinations of all members.
+    """
+    jobs: typing.List[Job] = []
+    finals: typing.Dict[str, typing.List[str]] = {}
+    for member, linked, matrix, combinations in prepared:
+        for options in combinations:
+            options.update(settings)
+
+        prefix = f"{member.name}/"
+        needs = [
+            *after,
+            *itertools.chain.from_iterable(finals.get(x, []) for x in member.depends),
+        ]
+        needs = _namespace(linked, prefix, member.path, needs) or needs
+        member_jobs = _generate_matrix_jobs(
+            tasks, matrix, combinations, {"root_path": member.path}, scheduler
+        )
+        finals[member.name] = (
+            _namespace(member_jobs, prefix, member.path, needs) or needs
+        )
+        jobs += linked + member_jobs
+
+    return jobs
+
+
+def _namespace(
+    jobs: typing.Sequence["Job"],
+    prefix: str,
+    cwd: pathlib.Path,
+    after: typing.Sequence[str],
+) -> typing.List[str]:
+    """Prefix the names of a group of jobs, executing them in the given folder.
+
+    The jobs not waiting on any other job of the group wait on `after` instead.
+
+    Returns:
+        The names of the jobs no other job of the group waits on.
+    """
+    names = {str(x.name) for x in jobs}
+    for job in jobs:
+        needs = [f"{prefix}{x}" if x in names else x for x in job.needs or []]
+        job.needs = needs or list(after)
+        job.name = f"{prefix}{job.name}"
+        job.task = f"{prefix}{job.task}"
+        job.cwd = cwd
+
+    needed = {x for job in jobs for x in job.needs or []}
+    return [str(x.name) for x in jobs if x.name not in needed]
+
+
+def _generate_jobs(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    tasks: typing.Sequence[Command],
+    input_options: OptionsMapT,
+    options: OptionsMapT,
+    env: EnvMapT,
+    after: typing.List[str],
+    *,
+    prefix: str = "",
+) -> typing.Tuple[typing.List["Job"], typing.List[str]]:
+    """Generate the jobs for a series of tasks.
+
+    Returns:
+        The jobs, and the names of the jobs of the last task generating commands.
+    """
+    from bob import executor
+    from bob.modules import get_task
+
+    jobs: typing.List[Job] = []
     for task in tasks:
         module = get_task(task)
 
@@ -107,22 +567,27 @@ def bob(command: Command, input_options: OptionsMapT) -> None:
         except ValueError:
             logging.exception("Error processing options")
 
+        if task in input_options.get("skip_tasks", ()):
+            logging.debug("Skipping the commands of task: %s", task)
+            continue
+
         try:
             cmd_list = module.generate_commands(options, env)
         except ValueError:
             logging.exception("Valued to generate commansd for the current task")
             break
 
-        for cmd in cmd_list:
-            logging.debug(" ".join(cmd))
-            with ExecutionTimer() as timer:
-                result = subprocess.run(cmd, check=True)
-            logging.debug(
-                "Result code: `%d` in %f seconds", result.returncode, timer.duration
-            )
+        task_jobs = executor.link(cmd_list, f"{prefix}{str(task).lower()}", after)
+        if task_jobs:
+            after = [str(x.name) for x in task_jobs]
+        jobs += task_jobs
+
+    return jobs, after
 
 
 def _determine_dependent_tasks(command: Command) -> typing.List[Command]:
+    from bob.modules import get_task
+
     def scan_deps(deps: typing.List[Command]) -> typing.List[Command]:
         result = []
         for n in deps:
@@ -137,20 +602,19 @@ def _determine_dependent_tasks(command: Command) -> typing.List[Command]:
 
 
 def _required_tools_present() -> bool:
+    from packaging import version
+
+    from bob.cache import tool_version
+
     try:
-        output = subprocess.check_output(
-            ["cmake", "--version"], text=True  # noqa: S607
-        )
-        line = output.splitlines()[0]
-        cmake_version = version.parse(line.split()[2])
+        cmake_version = version.parse(tool_version("cmake"))
     except FileNotFoundError:
         logging.exception("Unable to get the cmake version")
         return False
     logging.debug("Found cmake version: %s", cmake_version)
 
     try:
-        output = subprocess.check_output(["git", "--version"], text=True)  # noqa: S607
-        git_version = output.split()[2]
+        git_version = tool_version("git")
     except FileNotFoundError:
         logging.exception("Unable to get the git version")
         return False
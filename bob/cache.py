@@ -0,0 +1,368 @@
+"""User-wide cache shared between projects.
+
+The cache lives in `$BOB_CACHE_DIR`, or `bob` in the user's cache folder. It
+stores downloaded archives by the SHA-256 digest of their content, identical
+archives are only stored once regardless of the URL they were retrieved from.
+Additionally, it holds bare mirrors of the repositories projects depend on and the
+versions of the tools bob executes.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import shutil
+import subprocess
+import typing
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore [assignment]
+
+DEFAULT_CACHE_SIZE = 20 * 1024**3
+
+TOOL_CACHE = "tools.json"
+
+_SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# Tool versions determined by this process, along with the key they were cached with.
+_TOOL_VERSIONS: typing.Dict[str, typing.Tuple[typing.List[typing.Any], str]] = {}
+
+
+def cache_dir() -> pathlib.Path:
+    """Determine the location of the user-wide cache.
+
+    Returns:
+        Path to the cache folder.
+    """
+    with_env = os.environ.get("BOB_CACHE_DIR")
+    if with_env:
+        return pathlib.Path(with_env)
+
+    base = os.environ.get("XDG_CACHE_HOME")
+    if base:
+        return pathlib.Path(base) / "bob"
+    return pathlib.Path.home() / ".cache" / "bob"
+
+
+def mirror_path(url: str) -> pathlib.Path:
+    """Determine the location of the bare mirror of a repository.
+
+    Args:
+        url: the URL of the repository.
+
+    Returns:
+        Path to the mirror in the user-wide cache.
+    """
+    name = pathlib.PurePosixPath(url.rstrip("/")).name
+    if name.endswith(".git"):
+        name = name[: -len(".git")]
+    return cache_dir() / "git" / f"{name}-{_url_key(url)[:16]}.git"
+
+
+def parse_size(size: typing.Union[int, str]) -> int:
+    """Convert a size, optionally with a K, M, G or T suffix, to bytes.
+
+    Args:
+        size: the size to convert, e.g. 1024 or "20G".
+
+    Returns:
+        The size in bytes.
+
+    Raises:
+        ValueError: when the size is invalid.
+    """
+    if isinstance(size, int):
+        return size
+
+    text = size.strip().upper().rstrip("B")
+    factor = _SIZE_UNITS.get(text[-1:], 1)
+    if text[-1:] in _SIZE_UNITS:
+        text = text[:-1]
+    try:
+        return int(float(text) * factor)
+    except ValueError as ex:
+        raise ValueError(f"Invalid size: {size}") from ex
+
+
+@contextlib.contextmanager
+def locked(
+    path: pathlib.Path, *, shared: bool = False, blocking: bool = True
+) -> typing.Iterator[bool]:
+    """Lock a file, excluding other processes and threads holding a lock on it.
+
+    The file is created when missing. Locking is not supported on every platform,
+    there the lock is always acquired without excluding anything.
+
+    Args:
+        path: the file to lock.
+        shared: take a shared lock, held by several holders at once, instead of an
+            exclusive lock.
+        blocking: wait until the lock is available.
+
+    Yields:
+        True when the lock is held, False when it is not available without waiting.
+    """
+    if fcntl is None:  # pragma: no cover
+        yield True
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDONLY | os.O_CREAT, 0o644)
+    try:
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, operation if blocking else operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def file_digest(path: pathlib.Path) -> str:
+    """Calculate the SHA-256 digest of a file.
+
+    Args:
+        path: the file to process.
+
+    Returns:
+        The digest as a hexadecimal string.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tool_version(tool: str) -> str:
+    """Determine the version of a tool.
+
+    The version is cached along with the location, size and modification time of
+    the executable. The tool is only executed when it changed, or when it cannot be
+    located.
+
+    Args:
+        tool: name or path of the executable.
+
+    Returns:
+        The version reported by `<tool> --version`.
+
+    Raises:
+        ValueError: when the output does not contain a version.
+    """
+    key = None
+    path = shutil.which(tool)
+    if path is not None:
+        stat = pathlib.Path(path).stat()
+        key = [path, stat.st_mtime_ns, stat.st_size]
+        with contextlib.suppress(KeyError):
+            if _TOOL_VERSIONS[tool][0] == key:
+                return _TOOL_VERSIONS[tool][1]
+
+    cache = _load_tool_cache()
+    if key is not None:
+        with contextlib.suppress(KeyError, TypeError):
+            if cache[tool]["key"] == key:
+                _TOOL_VERSIONS[tool] = (key, str(cache[tool]["version"]))
+                return str(cache[tool]["version"])
+
+    output = subprocess.check_output([tool, "--version"], text=True)
+    match = re.search(r"\d+(\.\d+)+", output.splitlines()[0] if output else "")
+    if match is None:
+        raise ValueError(f"Unable to determine the version of {tool}")
+
+    if key is not None:
+        cache[tool] = {"key": key, "version": match.group()}
+        _store_tool_cache(cache)
+        _TOOL_VERSIONS[tool] = (key, match.group())
+    return match.group()
+
+
+def _load_tool_cache() -> typing.Dict[str, typing.Any]:
+    try:
+        result = json.loads((cache_dir() / TOOL_CACHE).read_text())
+    except (OSError, ValueError):
+        return {}
+    return result if isinstance(result, dict) else {}
+
+
+def _store_tool_cache(cache: typing.Dict[str, typing.Any]) -> None:
+    path = cache_dir() / TOOL_CACHE
+    with contextlib.suppress(OSError):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps(cache))
+        tmp.replace(path)
+
+
+class DownloadCache:
+    """Content-addressed store for downloaded files.
+
+    Files are stored as `blobs/<digest>/<name>`, URLs refer to a digest through
+    `urls/<digest of the URL>`. The least recently used files are evicted once the
+    total size exceeds the budget. The cache is shared by processes and threads:
+    adding and evicting files is serialized and a file held by `hold` is not
+    evicted.
+    """
+
+    def __init__(self: "DownloadCache", path: pathlib.Path, max_size: int) -> None:
+        """Initialize DownloadCache.
+
+        Args:
+            path: location of the cache.
+            max_size: size budget in bytes.
+        """
+        self._blobs = path / "blobs"
+        self._urls = path / "urls"
+        self._tmp = path / "tmp"
+        self._lock = path / "lock"
+        self.max_size = max_size
+
+    def get(
+        self: "DownloadCache", url: str, sha256: typing.Optional[str] = None
+    ) -> typing.Optional[pathlib.Path]:
+        """Find a file in the cache.
+
+        Args:
+            url: the URL the file was retrieved from.
+            sha256: the expected digest of the file, if known.
+
+        Returns:
+            The path to the cached file, None when the file is not cached.
+        """
+        digest = sha256.lower() if sha256 else self._digest_for(url)
+        if digest is None:
+            return None
+
+        with locked(self._lock, shared=True):
+            path = self._blobs / digest / pathlib.PurePosixPath(url).name
+            if not path.exists():
+                candidates = list((self._blobs / digest).glob("*"))
+                if not candidates:
+                    return None
+                path = candidates[0]
+
+            os.utime(path)
+        self._remember(url, digest)
+        logging.info("Archive found in cache: %s", path)
+        return path
+
+    @contextlib.contextmanager
+    def hold(
+        self: "DownloadCache", url: str, sha256: typing.Optional[str] = None
+    ) -> typing.Iterator[typing.Optional[pathlib.Path]]:
+        """Find a file in the cache, keeping it from being evicted while in use.
+
+        Args:
+            url: the URL the file was retrieved from.
+            sha256: the expected digest of the file, if known.
+
+        Yields:
+            The path to the cached file, None when the file is not cached.
+        """
+        with contextlib.ExitStack() as stack:
+            # Evicting waits for the cache lock, the file cannot be evicted between
+            # finding and holding it.
+            with locked(self._lock, shared=True):
+                path = self.get(url, sha256)
+                if path is not None:
+                    stack.enter_context(locked(path, shared=True))
+            yield path
+
+    def temporary(self: "DownloadCache", name: str) -> pathlib.Path:
+        """Generate a location to download a file to before adding it to the cache.
+
+        Args:
+            name: the file name.
+
+        Returns:
+            A unique path on the same file system as the cache.
+        """
+        self._tmp.mkdir(parents=True, exist_ok=True)
+        return self._tmp / f"{uuid.uuid4().hex}-{name}"
+
+    def put(
+        self: "DownloadCache", url: str, path: pathlib.Path, sha256: str
+    ) -> pathlib.Path:
+        """Move a file into the cache.
+
+        The cache may exceed its budget afterwards, until `evict` is called.
+
+        Args:
+            url: the URL the file was retrieved from.
+            path: the file to move.
+            sha256: the digest of the file.
+
+        Returns:
+            The path to the cached file.
+        """
+        digest = sha256.lower()
+        folder = self._blobs / digest
+        target = folder / pathlib.PurePosixPath(url).name
+        with locked(self._lock):
+            existing = list(folder.glob("*")) if folder.exists() else []
+            if existing:
+                logging.debug("Identical archive already cached: %s", existing[0])
+                path.unlink()
+                target = existing[0]
+            else:
+                folder.mkdir(parents=True, exist_ok=True)
+                path.replace(target)
+            os.utime(target)
+
+        self._remember(url, digest)
+        return target
+
+    def evict(
+        self: "DownloadCache", keep: typing.Optional[pathlib.Path] = None
+    ) -> None:
+        """Remove the least recently used files until the cache fits its budget.
+
+        Files held by any process are not evicted.
+
+        Args:
+            keep: a file which must not be evicted.
+        """
+        if not self._blobs.exists():
+            return
+
+        with locked(self._lock):
+            files = [x for x in self._blobs.glob("*/*") if x.is_file()]
+            files.sort(key=lambda x: x.stat().st_mtime)
+            total = sum(x.stat().st_size for x in files)
+            for f in files:
+                if total <= self.max_size:
+                    break
+                if f == keep:
+                    continue
+                with locked(f, blocking=False) as unused:
+                    if not unused:
+                        logging.debug("Not evicting, in use: %s", f)
+                        continue
+                    logging.info("Evicting from cache: %s", f)
+                    total -= f.stat().st_size
+                    shutil.rmtree(f.parent)
+
+    def _digest_for(self: "DownloadCache", url: str) -> typing.Optional[str]:
+        try:
+            return (self._urls / _url_key(url)).read_text().strip()
+        except FileNotFoundError:
+            return None
+
+    def _remember(self: "DownloadCache", url: str, digest: str) -> None:
+        self._urls.mkdir(parents=True, exist_ok=True)
+        key = self._urls / _url_key(url)
+        tmp = self.temporary(key.name)
+        tmp.write_text(digest)
+        tmp.replace(key)
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
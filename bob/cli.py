@@ -1,10 +1,12 @@
 """The builder, Bob the builder.
 
 Usage:
-    bob.py bootstrap [<target>]
-    bob.py configure [<target>] [(debug|release)]
-    bob.py build [<target>] [(debug|release)]
-    bob.py install [<target>] [(debug|release)]
+    bob.py bootstrap [<target>] [options]
+    bob.py configure [<target>] [(debug|release)] [options]
+    bob.py build [<target>] [(debug|release)] [--watch | --affected [--since=<rev>]] [options]
+    bob.py install [<target>] [(debug|release)] [options]
+    bob.py stats [options]
+    bob.py daemon [--stop]
     bob.py -h | --help
     bob.py --version
 
@@ -13,18 +15,41 @@ Possible commands:
     build:     build the project for the a target.
     configure: prepare the project for the first build, automatically executed with build.
     install:   build and install the project.
+    stats:     show the duration of each step of the last run, compared to earlier runs.
+    daemon:    serve the commands of later invocations from a background process.
 
 Options:
-    -h --help        Show this screen.
-    --version        Show version.
+    -h --help             Show this screen.
+    --version             Show version.
+    -j --jobs=<n>         Maximum number of commands to execute at once, defaults to the CPU count.
+    --all                 Process all targets, in all build configurations.
+    --configs=<list>      Process the given build configurations, e.g. debug,release.
+    --trace-file=<path>   Write a timeline of the execution in the Chrome trace format.
+    --log-dir=<path>      Capture the output of the commands, writing a log per command.
+    --margin=<percent>    Flag steps slower than their baseline by this margin, defaults to 20.
+    --stop                Stop the running daemon.
+    --watch               Build again each time the sources change, until interrupted.
+    --affected            Only build what the changes since a revision affect.
+    --since=<rev>         The revision to compare against with --affected, defaults to HEAD.
+
+Targets:
+    Several targets can be given separated by commas, e.g. linux,stm32. Each
+    combination of target and build configuration is processed concurrently.
+
+Daemon:
+    While a daemon is running, commands are executed by the daemon. Set BOB_DAEMON=0
+    to execute a command in the current process instead.
 """
+# pylint: disable=import-outside-toplevel
+import contextlib
+import copy
 import logging
+import os
 import pathlib
-import subprocess
+import sys
 import typing
 
 import docopt
-import toml
 
 from bob import __version__
 from bob.api import Command
@@ -34,21 +59,54 @@ from bob.typehints import OptionsMapT
 
 ArgsT = typing.TypeVar("ArgsT", None, bool, str)
 
+# Parsed configuration files, with the modification time and size they were read at.
+_CONFIGS: typing.Dict[pathlib.Path, typing.Tuple[int, int, OptionsMapT]] = {}
+
 
 def main() -> int:
     """CLI entry-point.
 
+    The command is forwarded to the daemon, when one is running. The help, the
+    version and invalid usage are shown without connecting to the daemon.
+
     Returns:
         A result code to be returned to the OS.
     """
+    arguments = docopt.docopt(__doc__, argv=sys.argv[1:], version=__version__)
+    if not arguments.get("daemon") and os.environ.get("BOB_DAEMON", "1") != "0":
+        from bob.daemon import forward
+
+        status = forward(sys.argv[1:])
+        if status is not None:
+            return status
+
     logging.basicConfig(
         level=logging.DEBUG,
         format="%(asctime)s - %(filename)s:%(lineno)s - %(levelname)s: %(message)s",
         datefmt="%Y.%m.%d %H:%M:%S",
     )
+    return run(sys.argv[1:])
+
+
+def run(argv: typing.Sequence[str]) -> int:
+    """Execute a command, in the current process.
 
-    arguments = docopt.docopt(__doc__, version=__version__)
+    Args:
+        argv: the arguments of the CLI.
+
+    Returns:
+        A result code to be returned to the OS.
+    """
+    arguments = docopt.docopt(__doc__, argv=argv, version=__version__)
     logging.debug(arguments)
+    if arguments.get("stats"):
+        return _stats(arguments)
+    if arguments.get("daemon"):
+        return _daemon(arguments)
+    return _execute(arguments)
+
+
+def _execute(arguments: typing.Mapping[str, ArgsT]) -> int:
     try:
         command = _determine_command(arguments)
         options = _determine_options(arguments)
@@ -56,6 +114,11 @@ def main() -> int:
         logging.exception("Exception caught parsing input")
         return EX_DATAERR
 
+    if arguments.get("--watch"):
+        return _watch(command, arguments)
+
+    import subprocess
+
     try:
         bob(command, options)
     except ValueError:
@@ -71,6 +134,99 @@ def main() -> int:
     return EX_OK
 
 
+def _watch(command: Command, arguments: typing.Mapping[str, ArgsT]) -> int:
+    import asyncio
+
+    from bob.watch import watch
+
+    try:
+        asyncio.run(watch(command, lambda: _determine_options(arguments)))
+    except (OSError, RuntimeError):
+        logging.exception("Unable to watch for changes")
+        return EX_SOFTWARE
+    except KeyboardInterrupt:
+        pass
+    return EX_OK
+
+
+def _stats(arguments: typing.Mapping[str, ArgsT]) -> int:
+    from bob import history
+
+    try:
+        options = _determine_options(arguments)
+        margin = float(
+            arguments.get("--margin")
+            or options.get("history", {}).get("margin", history.DEFAULT_MARGIN)
+        )
+    except ValueError:
+        logging.exception("Exception caught parsing input")
+        return EX_DATAERR
+
+    cwd = pathlib.Path.cwd()
+    stats = history.collect_stats(cwd)
+    if not stats:
+        sys.stdout.write(f"No history recorded for {cwd}\n")
+    else:
+        sys.stdout.write(history.format_stats(stats, margin) + "\n")
+    return EX_OK
+
+
+def _daemon(arguments: typing.Mapping[str, ArgsT]) -> int:
+    from bob import daemon
+
+    if arguments.get("--stop"):
+        if not daemon.stop():
+            logging.info("No daemon listening on %s", daemon.socket_path())
+        return EX_OK
+
+    try:
+        daemon.Daemon(run, prepare).serve()
+    except RuntimeError:
+        logging.exception("Unable to start the daemon")
+        return EX_SOFTWARE
+    except KeyboardInterrupt:
+        pass
+    return EX_OK
+
+
+def load_config(path: pathlib.Path) -> OptionsMapT:
+    """Load a configuration file.
+
+    The parsed file is kept for as long as the file is unchanged, a daemon parses the
+    configuration of a project once.
+
+    Args:
+        path: the configuration file.
+
+    Returns:
+        The options in the file.
+
+    Raises:
+        FileNotFoundError: when the file does not exist.
+    """
+    import toml
+
+    stat = path.stat()
+    with contextlib.suppress(KeyError):
+        mtime, size, options = _CONFIGS[path]
+        if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+            return options
+
+    options = toml.load(path)
+    _CONFIGS[path] = (stat.st_mtime_ns, stat.st_size, options)
+    return options
+
+
+def prepare(folder: pathlib.Path) -> None:
+    """Load the configuration of the project in a folder, ahead of a command.
+
+    Args:
+        folder: the folder a command executes in.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        load_config(folder / "bob.toml")
+
+
 def _determine_command(arguments: typing.Mapping[str, ArgsT]) -> Command:
     if arguments["bootstrap"]:
         return Command.Bootstrap
@@ -93,16 +249,28 @@ def _determine_options(arguments: typing.Mapping[str, ArgsT]) -> OptionsMapT:
     Raises:
         ValueError: upon errors parsing a `bob.toml` file.
     """
-    options = {
+    options: OptionsMapT = {
         "config": _determine_build_config(arguments),
         "target": _determine_build_target(arguments),
     }
+    if arguments.get("--jobs"):
+        options["jobs"] = arguments["--jobs"]
+    if arguments.get("--all"):
+        options["all"] = True
+    if arguments.get("--configs"):
+        options["configs"] = arguments["--configs"]
+    if arguments.get("--trace-file"):
+        options["trace_file"] = arguments["--trace-file"]
+    if arguments.get("--log-dir"):
+        options["log_dir"] = arguments["--log-dir"]
+    if arguments.get("--affected"):
+        options["affected"] = arguments.get("--since") or "HEAD"
 
     cwd = pathlib.Path.cwd()
     toml_file = cwd / "bob.toml"
 
     try:
-        file_options = toml.load(toml_file)
+        file_options = copy.deepcopy(load_config(toml_file))
         logging.debug("Loading settings: %s", toml_file)
         options.update(file_options)
     except FileNotFoundError:
@@ -1,12 +1,25 @@
 """Module with functionality shared between various modules."""
 import contextlib
 import enum
+import itertools
 import logging
+import os
 import pathlib
+import shlex
 import typing
 
 from bob.api import BuildConfig
-from bob.typehints import BuildTargetT, OptionsMapT
+from bob.compiler_cache import CONTAINER_CACHE_DIR, determine_compiler_cache
+from bob.container import DEFAULT_IDLE_TIMEOUT, session_command, session_name
+from bob.jobserver import CONTAINER_FIFO, Jobserver
+from bob.typehints import BuildTargetT, CommandListT, OptionsMapT
+
+# Folders not copied to a remote endpoint: the build folders, the build kept in the
+# volume on the endpoint, and the folders only used on the host.
+SYNC_EXCLUDED = ("build", "toolchains", ".git")
+
+# Removes the files copied by a previous build from a volume, keeping the build.
+_CLEAR_VOLUME = "find /work -mindepth 1 -maxdepth 1 ! -name build -exec rm -rf {} +"
 
 
 def determine_output_folder(options: OptionsMapT) -> str:
@@ -33,16 +46,91 @@ def parse_options(options: OptionsMapT) -> OptionsMapT:
     result = {
         "build_config": _determine_config(options),
         "build_target": _determine_build_target(options),
+        "jobs": _determine_jobs(options),
     }
 
     with contextlib.suppress(KeyError):
         target = result["build_target"].name.lower()  # type: ignore [attr-defined]
         toolchain = options["targets"][target]["toolchain"]
         result["container"] = options["toolchains"][toolchain]["container"]
+        result["container_jobserver"] = bool(
+            options["toolchains"][toolchain].get("jobserver", False)
+        )
+
+    with contextlib.suppress(KeyError):
+        if options["containers"]["session"]:
+            result["container_session"] = _determine_idle_timeout(options)
+
+    with contextlib.suppress(KeyError):
+        result["log_dir"] = pathlib.Path(
+            options.get("log_dir") or options["output"]["log_dir"]
+        )
+
+    compiler_cache = determine_compiler_cache(options, "container" in result)
+    if compiler_cache is not None:
+        result["compiler_cache"] = compiler_cache
 
     return result
 
 
+def _determine_idle_timeout(options: OptionsMapT) -> int:
+    try:
+        timeout = int(options["containers"]["idle_timeout"])
+    except KeyError:
+        return DEFAULT_IDLE_TIMEOUT
+    except (TypeError, ValueError) as ex:
+        raise ValueError(
+            f"Invalid container idle timeout: {options['containers']['idle_timeout']}"
+        ) from ex
+
+    if timeout < 1:
+        raise ValueError(f"Invalid container idle timeout: {timeout}")
+    return timeout
+
+
+def determine_matrix(options: OptionsMapT) -> typing.List[OptionsMapT]:
+    """Determine the combinations of targets and build configurations to process.
+
+    The target may list several targets separated by commas, `configs` lists the
+    build configurations. With `all`, every known target is processed, in every build
+    configuration unless `configs` is given.
+
+    Args:
+        options: set of options to take into account.
+
+    Returns:
+        A list of target and config options, one for each combination.
+    """
+    targets: typing.List[typing.Optional[str]] = [None]
+    configs: typing.List[typing.Optional[str]] = [None]
+    if options.get("all", False):
+        targets = ["native", *options.get("targets", {}).keys()]
+        configs = [x.name.lower() for x in BuildConfig]
+    elif "target" in options:
+        targets = _split(options["target"])
+
+    if "configs" in options:
+        configs = _split(options["configs"])
+        names = [x.name.lower() for x in BuildConfig]
+        invalid = [x for x in configs if x not in names]
+        if invalid or not configs:
+            raise ValueError(f"Invalid build configs: {options['configs']}")
+
+    result: typing.List[OptionsMapT] = []
+    for target, config in itertools.product(targets or [None], configs):
+        combination: OptionsMapT = {}
+        if target is not None:
+            combination["target"] = target
+        if config is not None:
+            combination["config"] = config
+        result.append(combination)
+    return result
+
+
+def _split(value: str) -> typing.List[typing.Optional[str]]:
+    return list(dict.fromkeys(x.strip().lower() for x in value.split(",") if x.strip()))
+
+
 def _determine_config(options: OptionsMapT) -> BuildConfig:
     try:
         config = options["config"].lower()
@@ -54,6 +142,19 @@ def _determine_config(options: OptionsMapT) -> BuildConfig:
         return BuildConfig.Release
 
 
+def _determine_jobs(options: OptionsMapT) -> int:
+    try:
+        jobs = int(options["jobs"])
+    except KeyError:
+        return os.cpu_count() or 1
+    except (TypeError, ValueError) as ex:
+        raise ValueError(f"Invalid number of jobs: {options['jobs']}") from ex
+
+    if jobs < 1:
+        raise ValueError(f"Invalid number of jobs: {jobs}")
+    return jobs
+
+
 def generate_targets(targets: typing.Sequence[str]) -> enum.Enum:
     """Generate an Enum for the available targers."""
     names = [x.capitalize() for x in targets]
@@ -79,25 +180,140 @@ def _determine_build_target(options: OptionsMapT) -> BuildTargetT:
 
 
 def generate_container_command(
-    options: OptionsMapT, cwd: pathlib.Path
+    options: OptionsMapT,
+    cwd: pathlib.Path,
+    jobserver: typing.Optional[Jobserver] = None,
 ) -> typing.List[str]:
     """Generate a Docker command to prepend the build command.
 
+    In session mode, the command is executed in the session container of the
+    project, see `generate_session_commands`. Otherwise, the jobserver is passed to
+    the container, if given. The compiler cache is mounted into the container.
+
+    With an assigned endpoint, the container executes on that endpoint. A remote
+    endpoint mounts the volume holding the copy of the codebase instead, without
+    the jobserver and compiler cache of the host.
+
     Args:
         options: set of options to take into account.
         cwd: the path to the codebase.
+        jobserver: optional jobserver to share with the container.
 
     Returns:
         List representing a single command, ready to be passed to subprocess.run.
     """
     try:
-        return [
-            "docker",
-            "run",
-            "--rm",
-            "-v",
-            f"{cwd}:/work/",
-            options["container"],
-        ]
+        image = options["container"]
     except KeyError:
         return []
+
+    variables = []
+    with contextlib.suppress(KeyError):
+        compiler_cache = options["compiler_cache"]
+        for key, value in compiler_cache.environment(CONTAINER_CACHE_DIR).items():
+            variables += ["-e", f"{key}={value}"]
+
+    volumes = _container_volumes(options)
+    if "container_session" in options:
+        name = session_name(image, cwd, volumes)
+        return ["docker", "exec", "-w", "/work/", *variables, name]
+
+    docker = ["docker"]
+    endpoint = options.get("container_endpoint")
+    if endpoint is not None:
+        docker = endpoint.docker()
+        if endpoint.remote:
+            volume = endpoint.volume(cwd, _build_folder(options))
+            return [*docker, "run", "--rm", "-v", f"{volume}:/work/", image]
+
+    shared = [*itertools.chain.from_iterable(["-v", x] for x in volumes), *variables]
+    if jobserver is not None and jobserver.path is not None:
+        shared += ["-v", f"{jobserver.path}:{CONTAINER_FIFO}"]
+        shared += ["-e", f"MAKEFLAGS={jobserver.makeflags(CONTAINER_FIFO)}"]
+
+    return [
+        *docker,
+        "run",
+        "--rm",
+        "-v",
+        f"{cwd}:/work/",
+        *shared,
+        image,
+    ]
+
+
+def generate_session_commands(options: OptionsMapT, cwd: pathlib.Path) -> CommandListT:
+    """Generate the commands preparing the session container of a project.
+
+    The commands start the session container if needed, or reset its idle timer.
+    They are executed right before the commands in the container.
+
+    Args:
+        options: set of options to take into account.
+        cwd: the path to the codebase.
+
+    Returns:
+        The commands, empty when not in session mode.
+    """
+    if "container" not in options or "container_session" not in options:
+        return []
+
+    timeout = options["container_session"]
+    return [
+        session_command(options["container"], cwd, timeout, _container_volumes(options))
+    ]
+
+
+def _container_volumes(options: OptionsMapT) -> typing.Tuple[str, ...]:
+    with contextlib.suppress(KeyError):
+        return (options["compiler_cache"].volume(),)
+    return ()
+
+
+def generate_sync_commands(
+    options: OptionsMapT, cwd: pathlib.Path
+) -> typing.Tuple[typing.List[typing.List[str]], typing.List[typing.List[str]]]:
+    """Generate the Docker commands synchronizing a codebase with a remote endpoint.
+
+    The codebase is copied into a volume on the endpoint, through a container which
+    is removed once the build folder is copied back. The files copied by the
+    previous build are removed first, except for the build folder, which is kept
+    for an incremental build. The folders in `SYNC_EXCLUDED` are not copied, the
+    dependencies in `external` are. Links are copied as the files they point to,
+    like the dependencies shared by the members of a workspace.
+
+    Args:
+        options: set of options to take into account.
+        cwd: the path to the codebase.
+
+    Returns:
+        The commands copying the codebase to the endpoint, and the commands copying
+        the build folder back. Both are empty without a remote endpoint.
+    """
+    endpoint = options.get("container_endpoint")
+    if endpoint is None or not endpoint.remote:
+        return [], []
+
+    folder = _build_folder(options)
+    name = endpoint.volume(cwd, folder)
+    docker = endpoint.docker()
+    image = options["container"]
+    clear = ["run", "--rm", "-v", f"{name}:/work/", "--entrypoint", "sh", image]
+    excluded = [f"--exclude=./{x}" for x in SYNC_EXCLUDED]
+    archive = ["tar", "-h", "-C", str(cwd), *excluded, "-cf", "-", "."]
+    copy = [*docker, "cp", "-", f"{name}:/work/"]
+    upload = [
+        [*docker, "rm", "--force", name],
+        [*docker, *clear, "-c", _CLEAR_VOLUME],
+        [*docker, "create", "--name", name, "-v", f"{name}:/work/", image],
+        ["sh", "-c", f"{shlex.join(archive)} | {shlex.join(copy)}"],
+    ]
+    download = [
+        [*docker, "cp", f"{name}:/work/{folder}/.", str(cwd / folder)],
+        [*docker, "rm", "--force", name],
+    ]
+    return upload, download
+
+
+def _build_folder(options: OptionsMapT) -> str:
+    return f"build/{determine_output_folder(options)}"
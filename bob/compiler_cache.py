@@ -0,0 +1,138 @@
+"""Compiler cache shared between builds.
+
+With ccache or sccache as compiler launcher, compiled objects are reused between
+builds, also after the build folder was removed. On the host, the tool uses its own
+configuration, like `CCACHE_DIR`, unless the location or size is set explicitly.
+For build containers, the cache lives in the user-wide cache by default and is
+mounted into each container, so builds in a new container do not start with an
+empty cache.
+"""
+import pathlib
+import shutil
+import typing
+
+from bob.cache import cache_dir, parse_size
+from bob.typehints import OptionsMapT
+
+COMPILER_CACHES = ("ccache", "sccache")
+CONTAINER_CACHE_DIR = "/tmp/bob-compiler-cache"  # noqa: S108
+
+# Environment variables configuring the location and size limit of each tool. The
+# size is given in megabytes, ccache 3 does not accept binary units like `Mi`.
+_VARIABLES = {
+    "ccache": ("CCACHE_DIR", "CCACHE_MAXSIZE"),
+    "sccache": ("SCCACHE_DIR", "SCCACHE_CACHE_SIZE"),
+}
+
+
+class CompilerCache(typing.NamedTuple):
+    """A compiler cache used as compiler launcher.
+
+    Attributes:
+        tool: the compiler cache, ccache or sccache.
+        path: location of the cache on the host, None to use the location the tool
+            is configured with.
+        size: maximum size of the cache in bytes, None to use the size the tool is
+            configured with.
+    """
+
+    tool: str
+    path: typing.Optional[pathlib.Path]
+    size: typing.Optional[int]
+
+    def launcher_options(self: "CompilerCache") -> typing.List[str]:
+        """Generate the CMake options using the compiler cache as launcher.
+
+        Returns:
+            A list of options for the configure command.
+        """
+        return [
+            f"-DCMAKE_C_COMPILER_LAUNCHER={self.tool}",
+            f"-DCMAKE_CXX_COMPILER_LAUNCHER={self.tool}",
+        ]
+
+    def environment(
+        self: "CompilerCache", path: typing.Optional[str] = None
+    ) -> typing.Dict[str, str]:
+        """Generate the environment variables configuring the compiler cache.
+
+        Args:
+            path: location of the cache as seen by the compiler, if different.
+
+        Returns:
+            A map of environment variables, without the settings the tool's own
+            configuration is used for.
+        """
+        folder, size = _VARIABLES[self.tool]
+        result = {}
+        if path is not None or self.path is not None:
+            result[folder] = path or str(self.path)
+        if self.size is not None:
+            result[size] = f"{max(1, self.size // 1024**2)}M"
+        return result
+
+    def volume(self: "CompilerCache") -> str:
+        """Generate the volume mounting the cache into a container.
+
+        The folder is created on the host, so it is not created by Docker.
+
+        Returns:
+            The volume in the format of `docker run -v`.
+        """
+        # The cache of a container always has a location, see determine_compiler_cache.
+        path = typing.cast("pathlib.Path", self.path)
+        path.mkdir(parents=True, exist_ok=True)
+        return f"{path}:{CONTAINER_CACHE_DIR}"
+
+
+def detect_compiler_cache() -> typing.Optional[str]:
+    """Find a compiler cache installed on the host.
+
+    Returns:
+        The name of the first compiler cache found, None if none is installed.
+    """
+    return next((x for x in COMPILER_CACHES if shutil.which(x)), None)
+
+
+def determine_compiler_cache(
+    options: OptionsMapT, container: bool  # noqa: FBT001
+) -> typing.Optional[CompilerCache]:
+    """Determine the compiler cache to use, based on the `[cache]` section.
+
+    By default, a compiler cache installed on the host is used. Its location and
+    size are only set when configured, otherwise the tool's own configuration, like
+    an existing `CCACHE_DIR`, applies. The tools in a container cannot be inspected,
+    the compiler cache has to be given explicitly. Containers usually run as root,
+    by default they use a cache separate from the host, which would otherwise fill
+    with files the host cannot write to.
+
+    Args:
+        options: set of options to take into account.
+        container: True when building in a container.
+
+    Returns:
+        The compiler cache, None when disabled or not available.
+
+    Raises:
+        ValueError: when the compiler cache is unknown or its size is invalid.
+    """
+    settings = options.get("cache", {})
+    tool = settings.get("compiler", "auto")
+    if tool in (False, "none"):
+        return None
+    if tool == "auto":
+        tool = None if container else detect_compiler_cache()
+        if tool is None:
+            return None
+    if tool not in COMPILER_CACHES:
+        raise ValueError(f"Invalid compiler cache: {tool}")
+
+    path = None
+    if "path" in settings:
+        path = pathlib.Path(settings["path"]).expanduser().absolute()
+    elif container:
+        path = cache_dir() / f"{tool}-container"
+    size = None
+    if "size" in settings:
+        size = parse_size(settings["size"])
+    return CompilerCache(tool, path, size)
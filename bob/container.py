@@ -0,0 +1,165 @@
+"""Long-lived build containers.
+
+In session mode, commands are executed in a single container per project and
+image using `docker exec`, instead of starting a new container for each command.
+The container stops itself once no command was executed for a while.
+
+The container is started, or its idle timer is reset, by a command executed right
+before the commands in the container:
+
+    python -m bob.container <image> <path> <idle timeout> [<volume>...]
+"""
+import hashlib
+import itertools
+import logging
+import pathlib
+import subprocess
+import sys
+import typing
+
+from bob.cache import cache_dir, locked
+
+DEFAULT_IDLE_TIMEOUT = 600
+
+KEEPALIVE_FILE = "/tmp/bob-keepalive"  # noqa: S108
+
+_POLL_INTERVAL = 5
+
+# Runs as the main process of the container. Every poll, the container is considered
+# busy when any other process exists or bob touched the keepalive file.
+_WATCHDOG = f"""
+idle=0
+while [ "$idle" -lt "$1" ]; do
+    sleep {_POLL_INTERVAL}
+    n=0
+    for p in /proc/[0-9]*; do n=$((n+1)); done
+    if [ -e {KEEPALIVE_FILE} ] || [ "$n" -gt 1 ]; then
+        rm -f {KEEPALIVE_FILE}
+        idle=0
+    else
+        idle=$((idle+{_POLL_INTERVAL}))
+    fi
+done
+"""
+
+
+def session_name(
+    image: str, cwd: pathlib.Path, volumes: typing.Tuple[str, ...] = ()
+) -> str:
+    """Determine the name of the session container for a project.
+
+    Args:
+        image: the container image.
+        cwd: the path to the codebase.
+        volumes: additional volumes mounted into the container.
+
+    Returns:
+        A container name, unique for the project, image and volumes.
+    """
+    key = "\n".join([str(cwd), image, *volumes])
+    key = hashlib.sha256(key.encode()).hexdigest()
+    return f"bob-{key[:16]}"
+
+
+def session_command(
+    image: str,
+    cwd: pathlib.Path,
+    idle_timeout: int,
+    volumes: typing.Tuple[str, ...] = (),
+) -> typing.List[str]:
+    """Generate the command ensuring the session container for a project is running.
+
+    Args:
+        image: the container image.
+        cwd: the path to the codebase, mounted as `/work/`.
+        idle_timeout: seconds without commands before the container stops.
+        volumes: additional volumes to mount, in the format of `docker run -v`.
+
+    Returns:
+        The command, which can be passed to `subprocess.run`.
+    """
+    arguments = [image, str(cwd), str(idle_timeout), *volumes]
+    return [sys.executable, "-m", "bob.container", *arguments]
+
+
+def start_session(
+    image: str,
+    cwd: pathlib.Path,
+    idle_timeout: int,
+    volumes: typing.Tuple[str, ...] = (),
+) -> str:
+    """Ensure the session container for a project is running.
+
+    A running container is reused and its idle timer is reset. Otherwise, a new
+    container is started. Concurrent calls for the same container are serialized.
+
+    Args:
+        image: the container image.
+        cwd: the path to the codebase, mounted as `/work/`.
+        idle_timeout: seconds without commands before the container stops.
+        volumes: additional volumes to mount, in the format of `docker run -v`.
+
+    Returns:
+        The name of the container.
+    """
+    name = session_name(image, cwd, volumes)
+    with locked(cache_dir() / "sessions" / f"{name}.lock"):
+        keepalive = ["docker", "exec", name, "touch", KEEPALIVE_FILE]
+        result = subprocess.run(keepalive, check=False, capture_output=True)
+        if result.returncode == 0:
+            logging.debug("Reusing session container: %s", name)
+            return name
+
+        _run_session(name, image, [f"{cwd}:/work/", *volumes], idle_timeout)
+    return name
+
+
+def _run_session(
+    name: str, image: str, mounts: typing.Sequence[str], idle_timeout: int
+) -> None:
+    logging.info("Starting session container %s for %s", name, image)
+    remove = ["docker", "rm", "-f", name]
+    subprocess.run(remove, check=False, capture_output=True)
+    subprocess.run(
+        [  # noqa: S607
+            "docker",
+            "run",
+            "--detach",
+            "--rm",
+            "--name",
+            name,
+            *itertools.chain.from_iterable(["-v", x] for x in mounts),
+            "--entrypoint",
+            "sh",
+            image,
+            "-c",
+            _WATCHDOG,
+            "watchdog",
+            str(idle_timeout),
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """Ensure a session container is running, as a command.
+
+    Args:
+        argv: the image, path to the codebase, idle timeout and volumes, defaults to
+            the arguments of the process.
+
+    Returns:
+        The exit status.
+    """
+    image, cwd, idle_timeout, *volumes = sys.argv[1:] if argv is None else argv
+    try:
+        start_session(image, pathlib.Path(cwd), int(idle_timeout), tuple(volumes))
+    except subprocess.CalledProcessError as ex:
+        sys.stderr.write(f"Unable to start session container for {image}\n")
+        return ex.returncode
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
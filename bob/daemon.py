@@ -0,0 +1,527 @@
+"""Background server executing the commands of the CLI.
+
+Each invocation of the CLI pays for starting Python, importing the modules, parsing
+`bob.toml` and probing the tools. The daemon does this once and keeps the result:
+the modules and tasks are imported, the configuration of each project and the tool
+versions are cached in memory.
+
+The CLI connects to the daemon over a Unix socket and sends its arguments, working
+directory and environment along with its standard streams. The daemon forks a
+process per request, which executes the command writing directly to the terminal
+of the CLI. Once it exits, its status is returned to the CLI. When the CLI goes
+away, for example with Ctrl-C, the command is terminated.
+
+The module itself is kept light, as it is imported by the CLI to forward a request.
+"""
+# pylint: disable=import-outside-toplevel
+import array
+import contextlib
+import json
+import os
+import pathlib
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+import typing
+
+from bob import __version__
+from bob.compat import EX_SOFTWARE
+
+PROTOCOL_VERSION = 1
+
+# Streams passed to the daemon: stdin, stdout and stderr.
+_STREAMS = (0, 1, 2)
+_HEADER = struct.Struct("!I")
+_MAX_MESSAGE = 16 * 1024**2
+
+# Time to receive a request, and to send a reply.
+_REQUEST_TIMEOUT = 5.0
+
+# Modules imported once a command executes, imported by the daemon up front.
+_WARM_MODULES = (
+    "bob.common",
+    "bob.executor",
+    "bob.history",
+    "bob.jobserver",
+    "bob.output",
+    "bob.trace",
+    "packaging.version",
+    "subprocess",
+    "toml",
+)
+
+MessageT = typing.Dict[str, typing.Any]
+RunT = typing.Callable[[typing.Sequence[str]], int]
+PrepareT = typing.Callable[[pathlib.Path], None]
+
+
+def socket_path() -> pathlib.Path:
+    """Determine the location of the socket of the daemon.
+
+    A daemon serves a single user by default. Setting `$BOB_DAEMON_SOCKET` gives a
+    workspace its own daemon.
+
+    Returns:
+        `$BOB_DAEMON_SOCKET`, or `bob/daemon.sock` in the user's runtime folder or
+        in the user-wide cache.
+    """
+    with_env = os.environ.get("BOB_DAEMON_SOCKET")
+    if with_env:
+        return pathlib.Path(with_env)
+
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return pathlib.Path(runtime) / "bob" / "daemon.sock"
+
+    from bob.cache import cache_dir
+
+    return cache_dir() / "daemon.sock"
+
+
+def forward(
+    argv: typing.Sequence[str], path: typing.Optional[pathlib.Path] = None
+) -> typing.Optional[int]:
+    """Execute a command in the daemon, if one is running.
+
+    Args:
+        argv: the arguments of the CLI.
+        path: the socket of the daemon, defaults to `socket_path()`.
+
+    Returns:
+        The exit status of the command, None when no daemon executed it.
+    """
+    request = {
+        "version": PROTOCOL_VERSION,
+        "bob": __version__,
+        "argv": list(argv),
+        "cwd": str(pathlib.Path.cwd()),
+        "env": dict(os.environ),
+    }
+    with _connect(path) as connection:
+        if connection is None:
+            return None
+        try:
+            _send(connection, request, _STREAMS)
+        except OSError:
+            # The daemon went away before receiving the command.
+            return None
+        try:
+            reply, _ = _receive(connection)
+        except KeyboardInterrupt:
+            return 130
+    if reply is None or reply.get("status") is None:
+        return None
+    return int(reply["status"])
+
+
+def stop(path: typing.Optional[pathlib.Path] = None) -> bool:
+    """Stop the daemon, commands which are executing complete first.
+
+    Args:
+        path: the socket of the daemon, defaults to `socket_path()`.
+
+    Returns:
+        True when a daemon was stopped.
+    """
+    with _connect(path) as connection:
+        if connection is None:
+            return False
+        _send(connection, {"version": PROTOCOL_VERSION, "stop": True})
+        reply, _ = _receive(connection)
+    return reply is not None and bool(reply.get("stopped"))
+
+
+@contextlib.contextmanager
+def _connect(
+    path: typing.Optional[pathlib.Path],
+) -> typing.Iterator[typing.Optional[socket.socket]]:
+    """Connect to the daemon, yields None when no daemon is listening."""
+    path = socket_path() if path is None else path
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        yield None
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(path))
+        except OSError:
+            yield None
+            return
+        yield connection
+
+
+def _send(
+    connection: socket.socket, message: MessageT, fds: typing.Sequence[int] = ()
+) -> None:
+    """Send a message, the file descriptors are passed along with the first part."""
+    data = json.dumps(message).encode()
+    data = _HEADER.pack(len(data)) + data
+    sent = 0
+    if fds:
+        rights = array.array("i", fds)
+        sent = connection.sendmsg(
+            [data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, rights)]
+        )
+    if sent < len(data):
+        connection.sendall(data[sent:])
+
+
+def _receive(
+    connection: socket.socket,
+) -> typing.Tuple[typing.Optional[MessageT], typing.List[int]]:
+    """Receive a message and the file descriptors passed along.
+
+    Returns:
+        The message, None when the connection closed before a complete message
+        was received, and the file descriptors received.
+    """
+    receiver = _Receiver()
+    message = None
+    try:
+        while message is None:
+            message = receiver.receive(connection)
+    except EOFError:
+        return None, list(receiver.fds)
+    return message, list(receiver.fds)
+
+
+class _Receiver:  # pylint: disable=too-few-public-methods
+    """Receives a message and the file descriptors passed along, in parts.
+
+    Attributes:
+        fds (array.array): the file descriptors received.
+        deadline (float): the time the message has to be received by, from
+            `time.monotonic`.
+    """
+
+    def __init__(self: "_Receiver") -> None:
+        """Initialize _Receiver."""
+        self.fds = array.array("i")
+        self.deadline = time.monotonic() + _REQUEST_TIMEOUT
+        self._data = b""
+
+    def receive(
+        self: "_Receiver", connection: socket.socket
+    ) -> typing.Optional[MessageT]:
+        """Receive the next part of the message.
+
+        Args:
+            connection: the connection to receive from.
+
+        Returns:
+            The message once complete, None while parts are missing.
+
+        Raises:
+            EOFError: when the connection closed, or the message is too large.
+        """
+        chunk, ancillary, _, _ = connection.recvmsg(
+            64 * 1024, socket.CMSG_LEN(len(_STREAMS) * self.fds.itemsize)
+        )
+        for level, kind, content in ancillary:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                size = len(content) - len(content) % self.fds.itemsize
+                self.fds.frombytes(content[:size])
+        if not chunk:
+            raise EOFError("Connection closed")
+        self._data += chunk
+
+        if len(self._data) < _HEADER.size:
+            return None
+        size = _HEADER.unpack_from(self._data)[0]
+        if size > _MAX_MESSAGE:
+            raise EOFError("Message too large")
+        if len(self._data) < _HEADER.size + size:
+            return None
+        return typing.cast(
+            "MessageT", json.loads(self._data[_HEADER.size : _HEADER.size + size])
+        )
+
+
+class Daemon:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Server executing the commands of the CLI.
+
+    Attributes:
+        path (pathlib.Path): the socket the daemon listens on.
+        children (dict): the connection of each process executing a command.
+    """
+
+    def __init__(
+        self: "Daemon",
+        run: RunT,
+        prepare: PrepareT,
+        path: typing.Optional[pathlib.Path] = None,
+    ) -> None:
+        """Initialize Daemon.
+
+        Args:
+            run: executes the arguments of a command, returning its exit status.
+            prepare: loads the state of the project in a folder, before forking.
+            path: the socket to listen on, defaults to `socket_path()`.
+        """
+        self.path = socket_path() if path is None else path
+        self._run = run
+        self._prepare = prepare
+        self.children: typing.Dict[int, socket.socket] = {}
+        self._listener: typing.Optional[socket.socket] = None
+        self._requests: typing.Dict[socket.socket, _Receiver] = {}
+        self._stopping = False
+        self._version = __version__
+
+    def serve(self: "Daemon") -> None:
+        """Accept requests, until stopped.
+
+        Raises:
+            RuntimeError: when another daemon is listening on the socket.
+        """
+        with _connect(self.path) as running:
+            if running is not None:
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+
+        _warm()
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Publish the socket once listening, clients connect or fall back.
+        partial = self.path.with_name(f"{self.path.name}.part")
+        partial.unlink(missing_ok=True)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(str(partial))
+        partial.chmod(0o600)
+        self._listener.listen()
+        partial.replace(self.path)
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._listener, selectors.EVENT_READ)
+            timeout = None
+            try:
+                while not self._stopping or self.children:
+                    for key, _ in selector.select(timeout):
+                        if key.fileobj is self._listener:
+                            self._accept(selector)
+                        elif key.fileobj in self._requests:
+                            self._receive(selector, key)
+                        elif isinstance(key.fileobj, int):
+                            self._reap(selector, key)
+                        else:
+                            self._hangup(selector, key)
+                    timeout = self._expire(selector)
+            finally:
+                self._listener.close()
+                self.path.unlink(missing_ok=True)
+                for connection in list(self._requests):
+                    self._drop(selector, connection)
+
+    def _accept(self: "Daemon", selector: selectors.BaseSelector) -> None:
+        """Accept a connection, its request is received as it arrives."""
+        listener = typing.cast("socket.socket", self._listener)
+        connection, _ = listener.accept()
+        try:
+            if _is_same_user(connection):
+                connection.settimeout(0.0)
+                selector.register(connection, selectors.EVENT_READ)
+                self._requests[connection] = _Receiver()
+                return
+        except OSError:
+            pass
+        connection.close()
+
+    def _receive(
+        self: "Daemon", selector: selectors.BaseSelector, key: selectors.SelectorKey
+    ) -> None:
+        """Receive the next part of a request, starting it once complete."""
+        connection = typing.cast("socket.socket", key.fileobj)
+        try:
+            request = self._requests[connection].receive(connection)
+        except BlockingIOError:
+            return
+        except (EOFError, OSError, ValueError):
+            self._drop(selector, connection)
+            return
+        if request is None:
+            return
+
+        selector.unregister(connection)
+        fds = list(self._requests.pop(connection).fds)
+        self._start(selector, connection, request, fds)
+
+    def _expire(
+        self: "Daemon", selector: selectors.BaseSelector
+    ) -> typing.Optional[float]:
+        """Drop the connections whose request did not arrive in time.
+
+        Returns:
+            The time until the next request expires, None without pending requests.
+        """
+        now = time.monotonic()
+        for connection, receiver in list(self._requests.items()):
+            if receiver.deadline <= now:
+                self._drop(selector, connection)
+        return min((x.deadline - now for x in self._requests.values()), default=None)
+
+    def _drop(
+        self: "Daemon", selector: selectors.BaseSelector, connection: socket.socket
+    ) -> None:
+        """Close a connection without executing its request."""
+        with contextlib.suppress(KeyError, ValueError):
+            selector.unregister(connection)
+        for fd in self._requests.pop(connection).fds:
+            os.close(fd)
+        connection.close()
+
+    def _start(
+        self: "Daemon",
+        selector: selectors.BaseSelector,
+        connection: socket.socket,
+        request: MessageT,
+        fds: typing.Sequence[int],
+    ) -> None:
+        """Start executing a request, or reply to it right away."""
+        listener = typing.cast("socket.socket", self._listener)
+        connection.settimeout(_REQUEST_TIMEOUT)
+        try:
+            if request.get("version") != PROTOCOL_VERSION:
+                _send(connection, {"status": None})
+            elif request.get("stop"):
+                self._stopping = True
+                selector.unregister(listener)
+                listener.close()
+                _send(connection, {"stopped": True})
+            elif request.get("bob") != self._version or len(fds) != len(_STREAMS):
+                _send(connection, {"status": None})
+            else:
+                pid, exited = self._fork(request, fds)
+                self.children[pid] = connection
+                connection.settimeout(0.0)
+                selector.register(connection, selectors.EVENT_READ, pid)
+                selector.register(exited, selectors.EVENT_READ, pid)
+                return
+        except (OSError, ValueError):
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+        connection.close()
+
+    def _fork(
+        self: "Daemon", request: MessageT, fds: typing.Sequence[int]
+    ) -> typing.Tuple[int, int]:
+        """Start a process executing the request, with the streams of the client.
+
+        Returns:
+            The process ID and a pipe which reaches its end once the process exits.
+        """
+        with contextlib.suppress(Exception):
+            self._prepare(pathlib.Path(request["cwd"]))
+        exited, alive = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(alive)
+            # Set in both processes, the group exists before either continues.
+            with contextlib.suppress(OSError):
+                os.setpgid(pid, pid)
+            return pid, exited
+
+        status = EX_SOFTWARE
+        try:
+            os.setpgid(0, 0)
+            os.close(exited)
+            connections = [*self.children.values(), *self._requests]
+            for connection in [self._listener, *connections]:
+                if connection is not None:
+                    connection.close()
+            status = _execute(self._run, request, fds)
+        finally:
+            os._exit(status)  # pylint: disable=protected-access
+
+    @staticmethod
+    def _hangup(selector: selectors.BaseSelector, key: selectors.SelectorKey) -> None:
+        """Terminate the command of a client which disconnected."""
+        connection = typing.cast("socket.socket", key.fileobj)
+        try:
+            if connection.recv(4096):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+
+        selector.unregister(connection)
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(key.data, signal.SIGTERM)
+
+    def _reap(
+        self: "Daemon", selector: selectors.BaseSelector, key: selectors.SelectorKey
+    ) -> None:
+        """Return the status of a finished command to its client."""
+        selector.unregister(key.fileobj)
+        os.close(typing.cast("int", key.fileobj))
+        _, status = os.waitpid(key.data, 0)
+        connection = self.children.pop(key.data)
+        if connection in selector.get_map():
+            selector.unregister(connection)
+        with contextlib.suppress(OSError):
+            connection.settimeout(None)
+            _send(connection, {"status": _exit_code(status)})
+        connection.close()
+
+
+def _is_same_user(connection: socket.socket) -> bool:
+    """Only accept requests of the user running the daemon, where supported."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _warm() -> None:
+    """Import the modules and tasks and probe the tools, once."""
+    import importlib
+
+    from bob.cache import tool_version
+    from bob.modules import get_task, list_tasks
+
+    for module in _WARM_MODULES:
+        importlib.import_module(module)
+    for name in list_tasks():
+        get_task(name)
+    for tool in ("cmake", "git"):
+        with contextlib.suppress(OSError, ValueError):
+            tool_version(tool)
+
+
+def _execute(run: RunT, request: MessageT, fds: typing.Sequence[int]) -> int:
+    """Execute a request, in the forked process."""
+    import traceback
+
+    for stream, fd in zip(_STREAMS, fds):
+        os.dup2(fd, stream)
+        os.close(fd)
+    for handled in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(handled, signal.SIG_DFL)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+
+    try:
+        return run(request["argv"])
+    except SystemExit as ex:
+        if isinstance(ex.code, str):
+            sys.stderr.write(f"{ex.code}\n")
+            return 1
+        return ex.code or 0
+    except BaseException:  # noqa: BLE001 # pylint: disable=broad-exception-caught
+        traceback.print_exc()
+        return EX_SOFTWARE
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
@@ -0,0 +1,163 @@
+"""Docker endpoints sharing the container builds of an invocation.
+
+A pool of Docker daemons is declared in the `[containers]` section, each endpoint
+is a `DOCKER_HOST` URL or the name of a Docker context:
+
+    [containers]
+    endpoints = ["unix:///var/run/docker.sock", "ssh://builder1", "builder2"]
+
+When several targets, build configurations or workspace members are processed,
+each combination building in a container is assigned to the least loaded
+endpoint. A remote endpoint cannot access the files of the host: the sources are
+copied into a volume on the endpoint before the combination is processed and the
+build folder is copied back afterwards.
+"""
+import concurrent.futures
+import hashlib
+import logging
+import pathlib
+import subprocess
+import typing
+
+from bob.typehints import OptionsMapT
+
+# Schemes of the `DOCKER_HOST` URLs of a daemon on the host.
+_LOCAL_SCHEMES = ("unix://", "npipe://")
+
+# Seconds to wait for an endpoint to report its load.
+_TIMEOUT = 10
+
+
+class Endpoint(typing.NamedTuple):
+    """A Docker daemon executing containers.
+
+    Attributes:
+        name: the `DOCKER_HOST` URL or the name of a Docker context.
+        remote: True when the daemon cannot access the files of the host.
+    """
+
+    name: str
+    remote: bool
+
+    def docker(self: "Endpoint") -> typing.List[str]:
+        """Generate the Docker command addressing the endpoint.
+
+        Returns:
+            The command, to be followed by a Docker subcommand.
+        """
+        if "://" in self.name:
+            return ["docker", "--host", self.name]
+        return ["docker", "--context", self.name]
+
+    def volume(self: "Endpoint", cwd: pathlib.Path, folder: str) -> str:
+        """Determine the name of the volume holding a build on a remote endpoint.
+
+        Args:
+            cwd: the path to the codebase.
+            folder: the build folder, relative to the codebase.
+
+        Returns:
+            A name, unique for the codebase, endpoint and build folder. The name is
+            used for the volume as well as the container copying files into it.
+        """
+        key = "\n".join([str(cwd), self.name, folder])
+        return f"bob-{hashlib.sha256(key.encode()).hexdigest()[:16]}"
+
+
+class Scheduler:  # pylint: disable=too-few-public-methods
+    """Assigns the combinations building in a container to the endpoints.
+
+    The load of an endpoint is the number of containers running on it once first
+    needed, increased by each combination assigned to it. An endpoint failing to
+    report its load is not used.
+
+    Attributes:
+        endpoints (list): the endpoints of the pool.
+    """
+
+    def __init__(self: "Scheduler", endpoints: typing.Sequence[Endpoint]) -> None:
+        """Initialize Scheduler.
+
+        Args:
+            endpoints: the endpoints of the pool.
+        """
+        self.endpoints = list(endpoints)
+        self._load: typing.Optional[typing.List[typing.Optional[int]]] = None
+
+    def assign(self: "Scheduler", options: OptionsMapT) -> None:
+        """Assign a combination to the least loaded endpoint.
+
+        Combinations building on the host, or in a session container, are not
+        assigned.
+
+        Args:
+            options: the parsed options of the combination, updated with the
+                assigned endpoint.
+
+        Raises:
+            RuntimeError: when none of the endpoints is available.
+        """
+        if "container" not in options or "container_session" in options:
+            return
+
+        if self._load is None:
+            with concurrent.futures.ThreadPoolExecutor() as workers:
+                self._load = list(workers.map(_running, self.endpoints))
+
+        load = {i: x for i, x in enumerate(self._load) if x is not None}
+        if not load:
+            raise RuntimeError("None of the Docker endpoints is available")
+        index = min(load, key=load.__getitem__)
+        self._load[index] = load[index] + 1
+        options["container_endpoint"] = self.endpoints[index]
+        logging.debug("Assigned %s to: %s", options["container"], self.endpoints[index])
+
+
+def scheduler(options: OptionsMapT) -> typing.Optional[Scheduler]:
+    """Create a scheduler for the configured endpoints.
+
+    Args:
+        options: set of options to take into account.
+
+    Returns:
+        The scheduler, None when no endpoints are configured.
+
+    Raises:
+        ValueError: when an endpoint is invalid.
+    """
+    names = options.get("containers", {}).get("endpoints", [])
+    if isinstance(names, str):
+        names = [names]
+    if not names:
+        return None
+    return Scheduler([_endpoint(str(x)) for x in names])
+
+
+def _endpoint(name: str) -> Endpoint:
+    """Determine if an endpoint is remote, resolving a context to its URL."""
+    host = name
+    if "://" not in name:
+        inspect = ["docker", "context", "inspect", "--format"]
+        try:
+            host = subprocess.run(
+                [*inspect, "{{.Endpoints.docker.Host}}", name],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError) as ex:
+            raise ValueError(f"Unknown Docker context: {name}") from ex
+    return Endpoint(name, not host.startswith(_LOCAL_SCHEMES))
+
+
+def _running(endpoint: Endpoint) -> typing.Optional[int]:
+    """Determine the number of containers running on an endpoint."""
+    info = [*endpoint.docker(), "info", "--format", "{{.ContainersRunning}}"]
+    try:
+        result = subprocess.run(
+            info, capture_output=True, text=True, check=True, timeout=_TIMEOUT
+        )
+        return int(result.stdout.strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        logging.warning("Docker endpoint not available: %s", endpoint.name)
+        return None
@@ -0,0 +1,542 @@
+"""Executes the commands generated by the tasks.
+
+The commands form a dependency graph: each command names the commands it waits on.
+Commands without pending dependencies are started as soon as a slot is available,
+up to a configurable number of commands at once. The graph is executed using a pool
+of threads, or in an asyncio event loop.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import logging
+import os
+import pathlib
+import signal
+import subprocess
+import time
+import types
+import typing
+
+from bob.typehints import CommandListT
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from bob.output import Output
+
+# Longest line of output read at once and the time a command gets to terminate
+# before it is killed, by `execute_async`. Each command executes in its own process
+# group, terminating a command terminates the processes it started as well.
+_LINE_LIMIT = 1024**2
+_TERMINATE_TIMEOUT = 5.0
+
+
+class ExecutionTimer(contextlib.AbstractContextManager):
+    """High resolution timer to capture the execution time of a block.
+
+    Attributes:
+        start_ns (int): start of the block, from `time.perf_counter_ns`.
+        duration (float): elapsed time in seconds.
+        duration_ns (int): elapsed time in whole nanoseconds.
+        duration_ms (float): elapsed time in miliseconds.
+    """
+
+    def __init__(self: "ExecutionTimer") -> None:
+        """Initialize ExecutionTimer."""
+        self.start_ns = 0
+        self.duration = 0.0
+        self.duration_ms = 0.0
+        self.duration_ns = 0
+
+    def __enter__(self: "ExecutionTimer") -> "ExecutionTimer":
+        """Start the timed context by recording the current time.
+
+        Returns:
+            The timed context.
+        """
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self: "ExecutionTimer",
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_value: typing.Optional[BaseException],
+        exc_traceback: typing.Optional[types.TracebackType],
+    ) -> typing.Literal[False]:
+        """Stop the timed context and calculate the elapsed time.
+
+        Args:
+            exc_type: optional exception type
+            exc_value: optional exception value
+            exc_traceback: optional exception traceback
+
+        Returns:
+            False, any captured exception will be propagated.
+        """
+        stop = time.perf_counter_ns()
+        self.duration_ns = stop - self.start_ns
+        self.duration_ms = self.duration_ns * 1e-6
+        self.duration = self.duration_ns * 1e-9
+        return False
+
+
+class Pool:  # pylint: disable=too-few-public-methods
+    """Limits the number of jobs of a kind executing at once.
+
+    Attributes:
+        name (str): name of the pool.
+        depth (int): maximum number of jobs from this pool executing at once.
+    """
+
+    def __init__(self: "Pool", name: str, depth: int) -> None:
+        """Initialize Pool.
+
+        Args:
+            name: name of the pool.
+            depth: maximum number of jobs executing at once.
+        """
+        self.name = name
+        self.depth = max(1, depth)
+
+
+class Job(typing.List[str]):  # pylint: disable=too-many-instance-attributes
+    """A single command and the commands it waits on.
+
+    A job is a list of strings and can be passed to `subprocess.run` like any other
+    command. Tasks may return jobs instead of plain commands to express which
+    commands can run concurrently.
+
+    Attributes:
+        name (str): unique name of the job, assigned by `link` if not given.
+        needs (list): names of the jobs to complete before this job starts. None
+            means the job waits on the preceding command of its task.
+        group (str): optional name to report the timing of related jobs under.
+        task (str): name of the task generating the job, assigned by `link`.
+        pool (Pool): optional pool limiting concurrent jobs of the same kind.
+        on_success (callable): optional function called once the command succeeded.
+        env (dict): optional environment variables to add for the command.
+        cwd (pathlib.Path): optional working directory of the command.
+        timeout (float): optional maximum duration of the command in seconds, only
+            applied by `execute_async`.
+        returncode (int): result code of the command, None until it finished.
+        started (int): start of the command from `time.perf_counter_ns`, None until
+            it started.
+        duration (float): execution time of the command in seconds.
+    """
+
+    def __init__(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self: "Job",
+        command: typing.Iterable[str],
+        name: typing.Optional[str] = None,
+        needs: typing.Optional[typing.Sequence[str]] = None,
+        *,
+        group: typing.Optional[str] = None,
+        pool: typing.Optional[Pool] = None,
+        on_success: typing.Optional[typing.Callable[[], None]] = None,
+        env: typing.Optional[typing.Mapping[str, str]] = None,
+        cwd: typing.Optional[pathlib.Path] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> None:
+        """Initialize Job.
+
+        Args:
+            command: the command to execute.
+            name: unique name of the job.
+            needs: names of the jobs this job waits on.
+            group: name to report the timing of related jobs under.
+            pool: pool limiting concurrent jobs of the same kind.
+            on_success: function to call once the command succeeded.
+            env: environment variables to add for the command.
+            cwd: working directory of the command.
+            timeout: maximum duration of the command in seconds.
+        """
+        super().__init__(command)
+        self.name = name
+        self.needs = None if needs is None else list(needs)
+        self.group = group
+        self.task: typing.Optional[str] = None
+        self.pool = pool
+        self.on_success = on_success
+        self.env = None if env is None else dict(env)
+        self.cwd = cwd
+        self.timeout = timeout
+        self.returncode: typing.Optional[int] = None
+        self.started: typing.Optional[int] = None
+        self.duration = 0.0
+
+
+class ExecutionError(subprocess.CalledProcessError):
+    """One or more commands failed.
+
+    Attributes:
+        failures (list): the failed jobs, in order of completion.
+    """
+
+    def __init__(self: "ExecutionError", failures: typing.Sequence[Job]) -> None:
+        """Initialize ExecutionError.
+
+        Args:
+            failures: the failed jobs.
+        """
+        super().__init__(failures[0].returncode or 1, list(failures[0]))
+        self.failures = list(failures)
+
+    def __str__(self: "ExecutionError") -> str:
+        """Convert an ExecutionError to string.
+
+        Returns:
+            A summary of the failed commands.
+        """
+        names = ", ".join(str(x.name) for x in self.failures)
+        return f"{len(self.failures)} command(s) failed: {names}"
+
+
+def link(
+    commands: CommandListT, prefix: str, after: typing.Sequence[str] = ()
+) -> typing.List[Job]:
+    """Convert the commands of a task into jobs.
+
+    Plain commands, and jobs without explicit dependencies, wait on the preceding
+    command. Every job also waits on the jobs given in `after`.
+
+    Args:
+        commands: the commands generated by a task.
+        prefix: prefix for the names of unnamed jobs.
+        after: names of the jobs to complete before any of the commands start.
+
+    Returns:
+        A list of jobs.
+    """
+    result: typing.List[Job] = []
+    for index, cmd in enumerate(commands):
+        job = cmd if isinstance(cmd, Job) else Job(cmd)
+        if job.name is None:
+            job.name = f"{prefix}:{index}"
+        if job.task is None:
+            job.task = prefix
+
+        needs = job.needs
+        if needs is None:
+            needs = [str(result[-1].name)] if result else []
+        job.needs = list(after) + [x for x in needs if x not in after]
+        result.append(job)
+
+    return result
+
+
+def execute(
+    jobs: typing.Sequence[Job],
+    max_jobs: int = 1,
+    output: typing.Optional["Output"] = None,
+) -> None:
+    """Execute a graph of jobs.
+
+    Jobs are started in the given order as soon as the jobs they need completed and
+    their pool has room. When a job fails, the jobs depending on it are skipped while
+    independent jobs continue.
+
+    Args:
+        jobs: the jobs to execute, linked by their names.
+        max_jobs: maximum number of jobs executing at once.
+        output: captures the output of the jobs, by default the output is not
+            captured.
+
+    Raises:
+        ExecutionError: when one or more jobs failed.
+    """
+    _validate(jobs)
+
+    pending = {str(x.name): x for x in jobs}
+    done: typing.Set[str] = set()
+    failures: typing.List[Job] = []
+    running: typing.Dict[concurrent.futures.Future, Job] = {}
+    occupied: typing.Counter[typing.Optional[Pool]] = collections.Counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_jobs)) as workers:
+        while pending or running:
+            slots = max_jobs - len(running)
+            for job in _start_ready(pending, done, occupied, slots):
+                running[workers.submit(_run, job, output)] = job
+
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                job = running.pop(future)
+                occupied[job.pool] -= 1
+                try:
+                    future.result()
+                    done.add(str(job.name))
+                except subprocess.CalledProcessError:
+                    logging.exception(
+                        "Command `%s` failed: %s", job.name, " ".join(job)
+                    )
+                    failures.append(job)
+                    _skip_dependents(pending, job)
+
+    _report_groups(jobs)
+    if failures:
+        raise ExecutionError(failures)
+
+
+async def execute_async(
+    jobs: typing.Sequence[Job],
+    max_jobs: int = 1,
+    output: typing.Optional["Output"] = None,
+    *,
+    cwd: typing.Optional[pathlib.Path] = None,
+    timeout: typing.Optional[float] = None,
+) -> None:
+    """Execute a graph of jobs in the running event loop.
+
+    The jobs are scheduled like `execute`. Cancelling the execution terminates the
+    executing commands, a command exceeding its timeout is terminated and fails.
+
+    Args:
+        jobs: the jobs to execute, linked by their names.
+        max_jobs: maximum number of jobs executing at once.
+        output: captures the output of the jobs, by default the output is not
+            captured.
+        cwd: working directory of the commands, unless the job specifies its own,
+            defaults to the current directory.
+        timeout: maximum duration of each job in seconds, unless the job specifies
+            its own timeout.
+
+    Raises:
+        ExecutionError: when one or more jobs failed.
+    """
+    _validate(jobs)
+
+    pending = {str(x.name): x for x in jobs}
+    done: typing.Set[str] = set()
+    failures: typing.List[Job] = []
+    running: typing.Dict[asyncio.Future, Job] = {}
+    occupied: typing.Counter[typing.Optional[Pool]] = collections.Counter()
+
+    try:
+        while pending or running:
+            slots = max_jobs - len(running)
+            for job in _start_ready(pending, done, occupied, slots):
+                limit = timeout if job.timeout is None else job.timeout
+                running[
+                    asyncio.ensure_future(_run_async(job, output, cwd, limit))
+                ] = job
+
+            finished, _ = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                job = running.pop(future)
+                occupied[job.pool] -= 1
+                try:
+                    future.result()
+                    done.add(str(job.name))
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+                    logging.exception(
+                        "Command `%s` failed: %s", job.name, " ".join(job)
+                    )
+                    failures.append(job)
+                    _skip_dependents(pending, job)
+    finally:
+        for future in running:
+            future.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    _report_groups(jobs)
+    if failures:
+        raise ExecutionError(failures)
+
+
+def _start_ready(
+    pending: typing.Dict[str, Job],
+    done: typing.Set[str],
+    occupied: typing.Counter[typing.Optional[Pool]],
+    slots: int,
+) -> typing.List[Job]:
+    """Take the jobs which can start from the pending jobs, in order."""
+    result: typing.List[Job] = []
+    for name, job in list(pending.items()):
+        if len(result) >= slots:
+            break
+        if job.pool and occupied[job.pool] >= job.pool.depth:
+            continue
+        if done.issuperset(job.needs or []):
+            del pending[name]
+            occupied[job.pool] += 1
+            result.append(job)
+    return result
+
+
+def _run(job: Job, output: typing.Optional["Output"]) -> None:
+    logging.debug(" ".join(job))
+    timer = ExecutionTimer()
+    try:
+        with timer:
+            if output is not None:
+                job.returncode = output.run(job)
+            elif job.env is None and job.cwd is None:
+                job.returncode = subprocess.run(job, check=True).returncode
+            else:
+                env = None if job.env is None else {**os.environ, **job.env}
+                job.returncode = subprocess.run(
+                    job, check=True, env=env, cwd=job.cwd
+                ).returncode
+    except subprocess.CalledProcessError as ex:
+        job.returncode = ex.returncode
+        raise
+    finally:
+        job.started = timer.start_ns
+        job.duration = timer.duration
+    logging.debug("Result code: `%d` in %f seconds", job.returncode, job.duration)
+    if job.on_success is not None:
+        job.on_success()
+
+
+async def _run_async(
+    job: Job,
+    output: typing.Optional["Output"],
+    cwd: typing.Optional[pathlib.Path],
+    timeout: typing.Optional[float],
+) -> None:
+    logging.debug(" ".join(job))
+    timer = ExecutionTimer()
+    try:
+        with timer:
+            job.returncode = await _spawn(job, output, cwd, timeout)
+    finally:
+        job.started = timer.start_ns
+        job.duration = timer.duration
+
+    logging.debug("Result code: `%d` in %f seconds", job.returncode, job.duration)
+    if job.returncode:
+        raise subprocess.CalledProcessError(job.returncode, job)
+    if job.on_success is not None:
+        job.on_success()
+
+
+async def _spawn(
+    job: Job,
+    output: typing.Optional["Output"],
+    cwd: typing.Optional[pathlib.Path],
+    timeout: typing.Optional[float],
+) -> int:
+    pipe = None if output is None else asyncio.subprocess.PIPE
+    process = await asyncio.create_subprocess_exec(
+        *job,
+        cwd=cwd if job.cwd is None else job.cwd,
+        env=None if job.env is None else {**os.environ, **job.env},
+        stdout=pipe,
+        stderr=pipe,
+        limit=_LINE_LIMIT,
+        start_new_session=True,
+    )
+
+    log = None if output is None else output.open(job)
+    try:
+        waiting: typing.Awaitable[typing.Any] = process.wait()
+        if log is not None:
+            waiting = asyncio.gather(
+                _read_lines(process.stdout, log.line, "stdout"),
+                _read_lines(process.stderr, log.line, "stderr"),
+                waiting,
+            )
+        await asyncio.wait_for(waiting, timeout)
+    except asyncio.TimeoutError:
+        logging.warning("Command `%s` timed out after %s seconds", job.name, timeout)
+        job.returncode = await _terminate(process)
+        raise subprocess.TimeoutExpired(list(job), float(timeout or 0)) from None
+    except asyncio.CancelledError:
+        logging.warning("Command `%s` cancelled", job.name)
+        job.returncode = await _terminate(process)
+        raise
+    finally:
+        if log is not None:
+            log.close(process.returncode if process.returncode is not None else -1)
+
+    return await process.wait()
+
+
+async def _read_lines(
+    stream: typing.Optional[asyncio.StreamReader],
+    sink: typing.Callable[[str, bytes], None],
+    name: str,
+) -> None:
+    if stream is None:  # pragma: no cover
+        return
+    while True:
+        try:
+            line = await stream.readline()
+        except ValueError:
+            line = await stream.read(_LINE_LIMIT)
+        if not line:
+            return
+        sink(name, line)
+
+
+async def _terminate(process: "asyncio.subprocess.Process") -> int:
+    if process.returncode is None:
+        _signal(process, signal.SIGTERM)
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(process.wait(), _TERMINATE_TIMEOUT)
+    # Kill whatever is left of the group, like a child ignoring SIGTERM.
+    _signal(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+    return await process.wait()
+
+
+def _signal(process: "asyncio.subprocess.Process", sig: int) -> None:
+    with contextlib.suppress(ProcessLookupError):
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)
+        elif process.returncode is None:  # pragma: no cover
+            process.send_signal(sig)
+
+
+def _report_groups(jobs: typing.Sequence[Job]) -> None:
+    groups: typing.Dict[str, typing.List[Job]] = {}
+    for job in jobs:
+        if job.group is not None:
+            groups.setdefault(job.group, []).append(job)
+
+    for group, members in groups.items():
+        duration = sum(x.duration for x in members)
+        if any(x.returncode for x in members):
+            status = "failed"
+        elif any(x.returncode is None for x in members):
+            status = "skipped"
+        else:
+            status = "done"
+        logging.info("%s: %s in %.2f seconds", group, status, duration)
+
+
+def _skip_dependents(pending: typing.Dict[str, Job], failed: Job) -> None:
+    blocked = {str(failed.name)}
+    while True:
+        skipped = [x for x, j in pending.items() if blocked.intersection(j.needs or [])]
+        if not skipped:
+            return
+        for name in skipped:
+            logging.warning("Skipping `%s`, depends on `%s`", name, failed.name)
+            del pending[name]
+        blocked.update(skipped)
+
+
+def _validate(jobs: typing.Sequence[Job]) -> None:
+    names = collections.Counter(str(x.name) for x in jobs)
+    duplicates = [x for x, n in names.items() if n > 1]
+    if duplicates:
+        raise ValueError(f"Duplicate job names: {duplicates}")
+
+    for job in jobs:
+        unknown = [x for x in job.needs or [] if x not in names]
+        if unknown:
+            raise ValueError(f"Job `{job.name}` depends on unknown jobs: {unknown}")
+
+    resolved: typing.Set[str] = set()
+    remaining = {str(x.name): x for x in jobs}
+    while remaining:
+        ready = [x for x, j in remaining.items() if resolved.issuperset(j.needs or [])]
+        if not ready:
+            raise ValueError(f"Dependency cycle between jobs: {list(remaining)}")
+        for name in ready:
+            del remaining[name]
+        resolved.update(ready)
@@ -0,0 +1,212 @@
+"""In-process inspection of git repositories.
+
+Reading the files of a repository directly answers simple questions, like the
+current revision, without starting a git process.
+"""
+import pathlib
+import re
+import typing
+import zlib
+
+_MAX_SYMBOLIC_DEPTH = 5
+_COMMIT = re.compile("[0-9a-fA-F]{40}")
+
+
+def git_dir(path: pathlib.Path) -> typing.Optional[pathlib.Path]:
+    """Locate the git folder of a working tree.
+
+    Args:
+        path: the root of the working tree.
+
+    Returns:
+        The git folder, None when the path is not a working tree.
+    """
+    dot_git = path / ".git"
+    if dot_git.is_dir():
+        return dot_git
+
+    try:
+        content = dot_git.read_text().strip()
+    except OSError:
+        return None
+
+    if not content.startswith("gitdir:"):
+        return None
+    result = pathlib.Path(content[len("gitdir:") :].strip())
+    return result if result.is_absolute() else path / result
+
+
+def head_revision(path: pathlib.Path) -> typing.Optional[str]:
+    """Determine the commit checked out in a working tree.
+
+    Args:
+        path: the root of the working tree.
+
+    Returns:
+        The commit hash, None when it cannot be determined.
+    """
+    folder = git_dir(path)
+    if folder is None:
+        return None
+    return resolve_ref(folder, "HEAD")
+
+
+def is_checked_out(path: pathlib.Path, revision: str) -> bool:
+    """Determine if a working tree has a revision checked out.
+
+    The revision is a commit hash, a tag or a branch. A branch only matches when it
+    is the current branch. When the revision cannot be resolved, for example an
+    annotated tag stored in a pack, it is not considered checked out.
+
+    Args:
+        path: the root of the working tree.
+        revision: the revision to compare with.
+
+    Returns:
+        True when the revision is checked out.
+    """
+    folder = git_dir(path)
+    if folder is None:
+        return False
+    head = resolve_ref(folder, "HEAD")
+    if head is None:
+        return False
+
+    if _COMMIT.fullmatch(revision):
+        return head == revision.lower()
+    if _read_loose_ref(folder, "HEAD") == f"ref: refs/heads/{revision}":
+        return True
+    return peel_ref(folder, f"refs/tags/{revision}") == head
+
+
+def sparse_paths(path: pathlib.Path) -> typing.Optional[typing.Set[str]]:
+    """Determine the paths of a sparse checkout.
+
+    Both the cone mode patterns and the plain patterns written by
+    `git sparse-checkout set` are understood.
+
+    Args:
+        path: the root of the working tree.
+
+    Returns:
+        The paths checked out, None when the working tree is not sparse.
+    """
+    folder = git_dir(path)
+    if folder is None:
+        return None
+    try:
+        content = (folder / "info" / "sparse-checkout").read_text()
+    except OSError:
+        return None
+
+    lines = [x.strip() for x in content.splitlines()]
+    lines = [x for x in lines if x and not x.startswith("#")]
+    if lines[:2] != ["/*", "!/*/"]:
+        return set(lines)
+
+    # In cone mode, the parents of each path are listed without their subfolders.
+    parents = {x[2:-3] for x in lines if x.startswith("!/") and x.endswith("/*/")}
+    return {x.strip("/") for x in lines[2:] if not x.startswith("!")} - parents
+
+
+def peel_ref(folder: pathlib.Path, ref: str) -> typing.Optional[str]:
+    """Resolve a reference to the commit it points to.
+
+    Annotated tags are peeled using the peeled entries of `packed-refs`, or by
+    reading loose tag objects.
+
+    Args:
+        folder: the git folder.
+        ref: the full name of the reference, e.g. `refs/tags/v1.0`.
+
+    Returns:
+        The object hash, after peeling the tags found, None when the reference
+        does not exist.
+    """
+    value = resolve_ref(folder, ref)
+    if value is None:
+        return None
+
+    packed = _packed_refs(folder)
+    if packed.get(ref) == value and f"{ref}^{{}}" in packed:
+        return packed[f"{ref}^{{}}"]
+
+    for _ in range(_MAX_SYMBOLIC_DEPTH):
+        target = _tag_target(folder, value)
+        if target is None:
+            break
+        value = target
+    return value
+
+
+def resolve_ref(folder: pathlib.Path, ref: str) -> typing.Optional[str]:
+    """Resolve a reference to the object it points to.
+
+    Loose references take precedence over packed references. Symbolic references,
+    like `HEAD`, are followed.
+
+    Args:
+        folder: the git folder.
+        ref: the full name of the reference, e.g. `refs/tags/v1.0`.
+
+    Returns:
+        The object hash, None when the reference does not exist.
+    """
+    for _ in range(_MAX_SYMBOLIC_DEPTH):
+        value = _read_loose_ref(folder, ref)
+        if value is None:
+            return _packed_refs(folder).get(ref)
+        if not value.startswith("ref:"):
+            return value
+        ref = value[len("ref:") :].strip()
+    return None
+
+
+def _common_dir(folder: pathlib.Path) -> pathlib.Path:
+    try:
+        common = pathlib.Path((folder / "commondir").read_text().strip())
+    except OSError:
+        return folder
+    return common if common.is_absolute() else folder / common
+
+
+def _read_loose_ref(folder: pathlib.Path, ref: str) -> typing.Optional[str]:
+    for base in (folder, _common_dir(folder)):
+        path = base / ref
+        if path.is_file():
+            return path.read_text().strip()
+    return None
+
+
+def _packed_refs(folder: pathlib.Path) -> typing.Dict[str, str]:
+    try:
+        lines = (_common_dir(folder) / "packed-refs").read_text().splitlines()
+    except OSError:
+        return {}
+
+    result = {}
+    name = None
+    for line in lines:
+        if line.startswith("^") and name is not None:
+            result[f"{name}^{{}}"] = line[1:].strip()
+            continue
+        if line.startswith(("#", "^")) or " " not in line:
+            continue
+        value, name = line.split(" ", 1)
+        name = name.strip()
+        result[name] = value
+    return result
+
+
+def _tag_target(folder: pathlib.Path, value: str) -> typing.Optional[str]:
+    """Read the object a loose tag object points to, None for any other object."""
+    path = _common_dir(folder) / "objects" / value[:2] / value[2:]
+    try:
+        data = zlib.decompress(path.read_bytes())
+    except (OSError, zlib.error):
+        return None
+
+    header, _, body = data.partition(b"\0")
+    if not header.startswith(b"tag ") or not body.startswith(b"object "):
+        return None
+    return body[len(b"object ") :].split(b"\n", 1)[0].decode()
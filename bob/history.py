@@ -0,0 +1,292 @@
+"""Local history of the executed commands.
+
+Each invocation is recorded in an SQLite database in the user-wide cache: the
+command, targets, build configurations, exit status, git revision, host and the
+duration of every phase, task and command. The history of a project provides a
+baseline for each step, steps which became slower than their baseline are flagged.
+"""
+import contextlib
+import logging
+import pathlib
+import platform
+import sqlite3
+import statistics
+import time
+import typing
+
+from bob.cache import cache_dir
+from bob.git import head_revision
+from bob.typehints import OptionsMapT
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from bob.trace import Tracer
+
+HISTORY_FILE = "history.sqlite"
+DEFAULT_MARGIN = 20.0
+DEFAULT_RUNS = 20
+
+# Steps are only flagged with enough history, and when the slowdown is noticeable.
+_MINIMUM_BASELINE = 3
+_MINIMUM_DIFFERENCE = 0.1
+
+_TREND_LEVELS = "_.,-=+*#"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    project TEXT NOT NULL,
+    command TEXT NOT NULL,
+    target TEXT NOT NULL,
+    config TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    revision TEXT,
+    host TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL,
+    returncode INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_project ON runs(project, command);
+CREATE INDEX IF NOT EXISTS steps_run ON steps(run);
+"""
+
+StepT = typing.Tuple[str, str, float, typing.Optional[int]]
+
+
+class StepStats(typing.NamedTuple):
+    """Statistics of a single step over the recorded runs.
+
+    Attributes:
+        kind: run, phase, task or command.
+        name: name of the step.
+        durations: durations in seconds of the successful earlier runs, oldest first.
+        last: duration in seconds during the last run.
+    """
+
+    kind: str
+    name: str
+    durations: typing.List[float]
+    last: float
+
+    @property
+    def baseline(self: "StepStats") -> typing.Optional[float]:
+        """The median duration of the earlier runs, None without history."""
+        return statistics.median(self.durations) if self.durations else None
+
+    def percentile(self: "StepStats", percent: float) -> float:
+        """Determine a percentile of the durations, including the last run.
+
+        Args:
+            percent: the percentile, from 0 to 100.
+
+        Returns:
+            The duration in seconds, using the nearest-rank method.
+        """
+        values = sorted([*self.durations, self.last])
+        rank = max(1, -(-len(values) * percent // 100))
+        return values[int(rank) - 1]
+
+    def is_slower(self: "StepStats", margin: float) -> bool:
+        """Determine if the last run was slower than the baseline.
+
+        Args:
+            margin: allowed slowdown in percent.
+
+        Returns:
+            True when the step is slower than its baseline by more than the margin.
+        """
+        baseline = self.baseline
+        if baseline is None or len(self.durations) < _MINIMUM_BASELINE:
+            return False
+        return (
+            self.last > baseline * (1 + margin / 100)
+            and self.last - baseline > _MINIMUM_DIFFERENCE
+        )
+
+
+def history_path() -> pathlib.Path:
+    """Determine the location of the history database.
+
+    Returns:
+        Path to the database in the user-wide cache.
+    """
+    return cache_dir() / HISTORY_FILE
+
+
+def record_run(  # pylint: disable=too-many-arguments
+    project: pathlib.Path,
+    command: str,
+    combinations: typing.Sequence[OptionsMapT],
+    tracer: "Tracer",
+    status: int,
+) -> None:
+    """Record an invocation in the history.
+
+    Failing to record the invocation is not an error, a warning is logged instead.
+
+    Args:
+        project: root folder of the project.
+        command: the executed command.
+        combinations: the parsed options of each target and build configuration.
+        tracer: the tracer holding the phases and executed jobs.
+        status: the exit status, 0 when successful.
+    """
+    targets = [x["build_target"].name.lower() for x in combinations]
+    configs = [str(x["build_config"]).lower() for x in combinations]
+    run = (
+        time.time(),
+        str(project),
+        command,
+        ",".join(dict.fromkeys(targets)),
+        ",".join(dict.fromkeys(configs)),
+        status,
+        tracer.elapsed,
+        head_revision(project),
+        platform.node(),
+    )
+
+    try:
+        with _connect() as db:
+            cursor = db.execute(
+                "INSERT INTO runs (started, project, command, target, config, status,"
+                " duration, revision, host) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                run,
+            )
+            db.executemany(
+                "INSERT INTO steps (run, kind, name, duration, returncode)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, *x) for x in _steps(tracer)],
+            )
+    except (OSError, sqlite3.Error):
+        logging.warning("Unable to record the build history", exc_info=True)
+
+
+def collect_stats(
+    project: pathlib.Path,
+    command: typing.Optional[str] = None,
+    runs: int = DEFAULT_RUNS,
+) -> typing.List[StepStats]:
+    """Collect the statistics of the steps of the last run of a project.
+
+    The baseline of a step are the earlier successful runs of the same command.
+
+    Args:
+        project: root folder of the project.
+        command: only take runs of this command into account, defaults to the
+            command of the last run.
+        runs: maximum number of runs to take into account.
+
+    Returns:
+        The statistics of each step of the last run, an empty list without history.
+    """
+    if not history_path().exists():
+        return []
+
+    with _connect() as db:
+        if command is None:
+            row = db.execute(
+                "SELECT command FROM runs WHERE project = ? ORDER BY id DESC LIMIT 1",
+                (str(project),),
+            ).fetchone()
+            if row is None:
+                return []
+            command = row[0]
+
+        rows = db.execute(
+            "SELECT id, status, duration FROM runs WHERE id IN"
+            " (SELECT id FROM runs WHERE project = ? AND command = ?"
+            " ORDER BY id DESC LIMIT ?) ORDER BY id DESC",
+            (str(project), command, runs),
+        ).fetchall()
+        steps = db.execute(
+            "SELECT run, kind, name, duration FROM steps WHERE run IN"
+            " (SELECT id FROM runs WHERE project = ? AND command = ?"
+            " ORDER BY id DESC LIMIT ?) ORDER BY rowid",
+            (str(project), command, runs),
+        ).fetchall()
+        if not rows:
+            return []
+
+    durations: typing.Dict[typing.Tuple[str, str], typing.Dict[int, float]] = {}
+    for run_id, _, duration in rows:
+        durations.setdefault(("run", command), {})[run_id] = duration
+    for run_id, kind, name, duration in steps:
+        durations.setdefault((kind, name), {})[run_id] = duration
+
+    last = rows[0][0]
+    earlier = [x[0] for x in reversed(rows[1:]) if x[1] == 0]
+    return [
+        StepStats(kind, name, [values[x] for x in earlier if x in values], values[last])
+        for (kind, name), values in durations.items()
+        if last in values
+    ]
+
+
+def format_stats(stats: typing.Sequence[StepStats], margin: float) -> str:
+    """Format the statistics as a table.
+
+    Args:
+        stats: the statistics to format.
+        margin: allowed slowdown in percent, before a step is flagged.
+
+    Returns:
+        The formatted table.
+    """
+    width = max([len(x.name) for x in stats] + [4])
+    lines = [
+        (
+            f"{'Kind':<8} {'Step':<{width}} {'Runs':>5} {'Last':>9} {'Median':>9}"
+            f" {'P90':>9} {'Change':>8}  Trend"
+        ),
+    ]
+    for step in stats:
+        baseline = step.baseline
+        change = "" if not baseline else f"{(step.last / baseline - 1) * 100:+.0f}%"
+        flag = "  SLOWER" if step.is_slower(margin) else ""
+        lines.append(
+            f"{step.kind:<8} {step.name:<{width}} {len(step.durations) + 1:>5}"
+            f" {step.last:>8.2f}s {step.percentile(50):>8.2f}s"
+            f" {step.percentile(90):>8.2f}s {change:>8}  {_trend(step):<8}{flag}"
+        )
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def _connect() -> typing.Iterator[sqlite3.Connection]:
+    path = history_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with contextlib.closing(sqlite3.connect(path, timeout=10)) as db:
+        db.executescript(_SCHEMA)
+        with db:
+            yield db
+
+
+def _steps(tracer: "Tracer") -> typing.List[StepT]:
+    result: typing.List[StepT] = [
+        ("phase", name, duration, None) for name, duration in tracer.phases
+    ]
+
+    spans: typing.Dict[str, typing.Tuple[int, int]] = {}
+    for job in tracer.jobs:
+        start = job.started or 0
+        stop = start + int(job.duration * 1e9)
+        first, last = spans.get(str(job.task), (start, stop))
+        spans[str(job.task)] = (min(first, start), max(last, stop))
+    result += [("task", x, (y[1] - y[0]) * 1e-9, None) for x, y in spans.items()]
+
+    result += [("command", str(x.name), x.duration, x.returncode) for x in tracer.jobs]
+    return result
+
+
+def _trend(step: StepStats) -> str:
+    values = [*step.durations[-7:], step.last]
+    low, high = min(values), max(values)
+    if high - low < _MINIMUM_DIFFERENCE:
+        return _TREND_LEVELS[0] * len(values)
+    scale = (len(_TREND_LEVELS) - 1) / (high - low)
+    return "".join(_TREND_LEVELS[round((x - low) * scale)] for x in values)
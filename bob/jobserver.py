@@ -0,0 +1,144 @@
+"""GNU make jobserver shared by the build tools executed at once.
+
+Build tools supporting the jobserver protocol take a token from the jobserver
+before starting an additional job and return it once done. Builds sharing one
+jobserver therefore stay within a single budget, instead of each build assuming it
+owns every core.
+"""
+import contextlib
+import logging
+import os
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import types
+import typing
+
+from packaging import version
+
+CONTAINER_FIFO = "/tmp/bob-jobserver"  # noqa: S108
+
+# The first versions understanding `--jobserver-auth=fifo:<path>`.
+_MINIMUM_VERSIONS = {"make": "4.4", "gmake": "4.4", "ninja": "1.13"}
+
+
+class Jobserver(contextlib.AbstractContextManager):
+    """Jobserver backed by a named pipe.
+
+    Each client implicitly owns one job slot, the remaining slots are available as
+    tokens. With a FIFO, the jobserver can be shared with processes executing in a
+    container.
+
+    Attributes:
+        slots (int): total number of jobs executing at once.
+        path (pathlib.Path): location of the FIFO, None when not available.
+    """
+
+    def __init__(self: "Jobserver", slots: int, clients: int = 1) -> None:
+        """Initialize Jobserver.
+
+        Args:
+            slots: total number of jobs executing at once.
+            clients: number of build tools executing at once.
+        """
+        self.slots = max(1, slots)
+        self.path: typing.Optional[pathlib.Path] = None
+        self._tokens = max(0, self.slots - max(1, clients))
+        self._folder: typing.Optional[str] = None
+        self._fd: typing.Optional[int] = None
+
+    def __enter__(self: "Jobserver") -> "Jobserver":
+        """Create the FIFO and fill it with the available tokens.
+
+        Returns:
+            The jobserver.
+        """
+        if not hasattr(os, "mkfifo"):  # pragma: no cover
+            logging.info("Jobserver not supported on this platform")
+            return self
+
+        self._folder = tempfile.mkdtemp(prefix="bob-jobserver-")
+        path = pathlib.Path(self._folder) / "fifo"
+        os.mkfifo(path, 0o600)
+        self._fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        os.write(self._fd, b"+" * self._tokens)
+        self.path = path
+        logging.debug("Started jobserver with %d slots: %s", self.slots, path)
+        return self
+
+    def __exit__(
+        self: "Jobserver",
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_value: typing.Optional[BaseException],
+        exc_traceback: typing.Optional[types.TracebackType],
+    ) -> typing.Literal[False]:
+        """Remove the FIFO.
+
+        Args:
+            exc_type: optional exception type
+            exc_value: optional exception value
+            exc_traceback: optional exception traceback
+
+        Returns:
+            False, any captured exception will be propagated.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._folder is not None:
+            shutil.rmtree(self._folder, ignore_errors=True)
+            self._folder = None
+        self.path = None
+        return False
+
+    def makeflags(self: "Jobserver", path: typing.Optional[str] = None) -> str:
+        """Generate the MAKEFLAGS passing the jobserver to a build tool.
+
+        Args:
+            path: location of the FIFO as seen by the build tool, if different.
+
+        Returns:
+            The value for the MAKEFLAGS environment variable.
+        """
+        return f"-j{self.slots} --jobserver-auth=fifo:{path or self.path}"
+
+
+def supports_jobserver(build_path: pathlib.Path) -> bool:
+    """Determine if the build tool of a configured build supports the jobserver.
+
+    Args:
+        build_path: the build folder.
+
+    Returns:
+        True when the build tool supports a FIFO jobserver, False when unknown.
+    """
+    from bob.cache import tool_version  # pylint: disable=import-outside-toplevel
+
+    program = _cache_entry(build_path, "CMAKE_MAKE_PROGRAM")
+    if program is None:
+        return False
+
+    name = pathlib.Path(program).stem.lower()
+    if name not in _MINIMUM_VERSIONS:
+        return False
+
+    try:
+        found = tool_version(program)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        logging.debug("Unable to determine the version of %s", program)
+        return False
+    return version.parse(found) >= version.parse(_MINIMUM_VERSIONS[name])
+
+
+def _cache_entry(build_path: pathlib.Path, name: str) -> typing.Optional[str]:
+    try:
+        lines = (build_path / "CMakeCache.txt").read_text().splitlines()
+    except OSError:
+        return None
+
+    for line in lines:
+        key, _, value = line.partition("=")
+        if key.split(":")[0] == name:
+            return value
+    return None
@@ -0,0 +1,345 @@
+"""Lock file pinning the state of a bootstrap.
+
+The lock file, `bob.lock` in the root of the project, records the commit each
+dependency resolved to and, for each toolchain, the digest of its archive and a
+manifest of the extracted tree. A later bootstrap validates the state on disk
+against the lock file by reading git references and the size, modification time and
+inode of each file, without starting a process or downloading anything. A dependency
+or toolchain which differs from the lock file, while its configuration did not
+change, is reported as drifted.
+"""
+import hashlib
+import os
+import pathlib
+import threading
+import typing
+
+import toml
+
+from bob.cache import cache_dir
+
+LOCK_FILE = "bob.lock"
+LOCK_VERSION = 1
+
+# Number of differences shown per drifted toolchain.
+_MAX_DIFFERENCES = 10
+
+_HEADER = "# Generated by bob during bootstrap, commit this file to pin the state.\n"
+
+EntryT = typing.Dict[str, typing.Any]
+
+
+class LockError(RuntimeError):
+    """The state on disk differs from the lock file.
+
+    Attributes:
+        differences (list): a description of each difference.
+    """
+
+    def __init__(self: "LockError", differences: typing.Sequence[str]) -> None:
+        """Initialize LockError.
+
+        Args:
+            differences: a description of each difference.
+        """
+        super().__init__("\n".join(["State differs from the lock file:", *differences]))
+        self.differences = list(differences)
+
+
+class Lock:
+    """The content of a lock file.
+
+    Updating the lock file is thread-safe, entries are updated while commands are
+    executing.
+
+    Attributes:
+        path (pathlib.Path): location of the lock file.
+        dependencies (dict): the entry of each dependency.
+        toolchains (dict): the entry of each toolchain.
+    """
+
+    def __init__(self: "Lock", path: pathlib.Path) -> None:
+        """Initialize Lock, loading the lock file if present.
+
+        Args:
+            path: location of the lock file.
+
+        Raises:
+            ValueError: when the lock file is invalid.
+        """
+        self.path = path
+        self.dependencies: typing.Dict[str, EntryT] = {}
+        self.toolchains: typing.Dict[str, EntryT] = {}
+        self._mutex = threading.Lock()
+        self._saved: typing.Optional[str] = None
+
+        try:
+            self._saved = path.read_text()
+        except FileNotFoundError:
+            return
+
+        try:
+            content = toml.loads(self._saved)
+        except toml.TomlDecodeError as ex:
+            raise ValueError(f"Invalid lock file: {path}") from ex
+        if content.get("version") != LOCK_VERSION:
+            raise ValueError(f"Unsupported lock file version: {content.get('version')}")
+        self.dependencies = dict(content.get("dependencies", {}))
+        self.toolchains = dict(content.get("toolchains", {}))
+
+    def dependency(
+        self: "Lock", name: str, options: typing.Mapping[str, typing.Any]
+    ) -> typing.Optional[str]:
+        """Find the commit a dependency is locked at.
+
+        Args:
+            name: name of the dependency.
+            options: the configuration of the dependency.
+
+        Returns:
+            The commit hash, None when not locked or the configuration changed.
+        """
+        entry = self.dependencies.get(name, {})
+        if entry.get("repository") != options.get("repository"):
+            return None
+        if entry.get("tag") != options.get("tag"):
+            return None
+        return entry.get("commit")
+
+    def lock_dependency(
+        self: "Lock",
+        name: str,
+        options: typing.Mapping[str, typing.Any],
+        commit: typing.Optional[str],
+    ) -> None:
+        """Record the commit of a dependency.
+
+        Args:
+            name: name of the dependency.
+            options: the configuration of the dependency.
+            commit: the commit checked out, nothing is recorded when None.
+        """
+        if commit is None:
+            return
+        with self._mutex:
+            self.dependencies[name] = {
+                "repository": options["repository"],
+                "tag": options["tag"],
+                "commit": commit,
+            }
+
+    def toolchain(
+        self: "Lock", name: str, url: str, sha256: typing.Optional[str] = None
+    ) -> typing.Optional[EntryT]:
+        """Find the locked state of a toolchain.
+
+        Args:
+            name: name of the toolchain.
+            url: the configured location of the archive.
+            sha256: the configured digest of the archive, if any.
+
+        Returns:
+            The entry of the toolchain, None when not locked or the configuration
+            changed.
+        """
+        entry = self.toolchains.get(name)
+        if entry is None or entry.get("url") != url:
+            return None
+        if sha256 and entry.get("sha256", "").lower() != sha256.lower():
+            return None
+        return entry
+
+    def lock_toolchain(  # pylint: disable=too-many-arguments
+        self: "Lock",
+        name: str,
+        url: str,
+        sha256: typing.Optional[str],
+        entries: typing.Sequence[str],
+        manifest: typing.Sequence[str],
+    ) -> None:
+        """Record the state of a toolchain.
+
+        Args:
+            name: name of the toolchain.
+            url: the location of the archive.
+            sha256: the digest of the archive, if known.
+            entries: the top level files and folders extracted from the archive.
+            manifest: the manifest of the extracted tree.
+        """
+        entry: EntryT = {"url": url}
+        if sha256:
+            entry["sha256"] = sha256
+        entry["entries"] = list(entries)
+        entry["files"] = len(manifest)
+        entry["manifest"] = manifest_digest(manifest)
+        with self._mutex:
+            self.toolchains[name] = entry
+
+    def retain(
+        self: "Lock",
+        dependencies: typing.Iterable[str],
+        toolchains: typing.Iterable[str],
+    ) -> None:
+        """Remove the entries no longer configured.
+
+        Args:
+            dependencies: names of the configured dependencies.
+            toolchains: names of the configured toolchains.
+        """
+        with self._mutex:
+            keep = set(dependencies)
+            self.dependencies = {
+                k: v for k, v in self.dependencies.items() if k in keep
+            }
+            keep = set(toolchains)
+            self.toolchains = {k: v for k, v in self.toolchains.items() if k in keep}
+
+    def save(self: "Lock") -> None:
+        """Write the lock file, when its content changed.
+
+        Without dependencies and toolchains, no lock file is created.
+        """
+        with self._mutex:
+            if self._saved is None and not self.dependencies and not self.toolchains:
+                return
+            content = _HEADER + toml.dumps(
+                {
+                    "version": LOCK_VERSION,
+                    "dependencies": dict(sorted(self.dependencies.items())),
+                    "toolchains": dict(sorted(self.toolchains.items())),
+                }
+            )
+            if content == self._saved:
+                return
+            partial = self.path.with_name(f"{self.path.name}.part")
+            partial.write_text(content)
+            partial.replace(self.path)
+            self._saved = content
+
+
+def tree_manifest(
+    folder: pathlib.Path, entries: typing.Iterable[str], *, local: bool = False
+) -> typing.List[str]:
+    """List the files and folders of a tree, with the size of each file.
+
+    Only the metadata of each file is read, not its content. Symbolic links are
+    listed with their target and not followed. The modification time and inode
+    detect a file rewritten with the same size, but differ between hosts. They are
+    only listed in the local manifest, the lock file holds the digest of the
+    manifest without them.
+
+    Args:
+        folder: folder holding the tree.
+        entries: the top level files and folders of the tree.
+        local: list the modification time and inode of each file as well.
+
+    Returns:
+        A sorted list with a line per file, folder and link. A missing entry is
+        left out.
+    """
+    result = []
+    pending = [str(x) for x in entries]
+    while pending:
+        relative = pending.pop()
+        path = folder / relative
+        try:
+            stat = path.lstat()
+        except FileNotFoundError:
+            continue
+
+        if path.is_symlink():
+            result.append(f"{relative} -> {os.readlink(path)}")
+        elif path.is_dir():
+            result.append(f"{relative}/")
+            with os.scandir(path) as it:
+                pending += [f"{relative}/{x.name}" for x in it]
+        elif local:
+            result.append(f"{relative} {stat.st_size} {stat.st_mtime_ns} {stat.st_ino}")
+        else:
+            result.append(f"{relative} {stat.st_size}")
+    return sorted(result)
+
+
+def manifest_digest(manifest: typing.Sequence[str]) -> str:
+    """Generate the digest of a manifest.
+
+    Args:
+        manifest: the manifest of a tree.
+
+    Returns:
+        The SHA-256 digest as a hexadecimal string.
+    """
+    return hashlib.sha256("\n".join(manifest).encode()).hexdigest()
+
+
+def manifest_path(folder: pathlib.Path, name: str) -> pathlib.Path:
+    """Determine where the manifest of a toolchain is stored.
+
+    Manifests are kept in the user-wide cache, outside of the toolchain folder.
+
+    Args:
+        folder: folder holding the toolchain.
+        name: name of the toolchain.
+
+    Returns:
+        Path to the manifest.
+    """
+    key = hashlib.sha256(str(folder.absolute()).encode()).hexdigest()[:16]
+    return cache_dir() / "manifests" / f"{name}-{key}.manifest"
+
+
+def write_manifest(
+    path: pathlib.Path, manifest: typing.Sequence[str], digest: str
+) -> None:
+    """Store the local manifest of a locked tree, to detect and describe changes.
+
+    Args:
+        path: location of the manifest.
+        manifest: the local manifest of the tree.
+        digest: the digest of the tree recorded in the lock file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(f"{x}\n" for x in [f"# {digest}", *manifest]))
+
+
+def read_manifest(path: pathlib.Path, digest: str) -> typing.Optional[typing.List[str]]:
+    """Load the local manifest of a locked tree.
+
+    Args:
+        path: location of the manifest.
+        digest: the digest of the tree recorded in the lock file.
+
+    Returns:
+        The local manifest, None when it is not stored or was stored for another
+        digest.
+    """
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return None
+    return lines[1:] if lines[:1] == [f"# {digest}"] else None
+
+
+def diff_manifest(
+    stored: typing.Optional[typing.Sequence[str]], manifest: typing.Sequence[str]
+) -> typing.List[str]:
+    """Describe the differences between a stored manifest and the current one.
+
+    Args:
+        stored: the stored manifest of the tree, if available.
+        manifest: the current manifest of the tree.
+
+    Returns:
+        A line per added (+) or removed (-) file, an empty list when the stored
+        manifest is not available.
+    """
+    if stored is None:
+        return []
+
+    current = set(manifest)
+    result = [f"+ {x}" for x in sorted(current - set(stored))]
+    result += [f"- {x}" for x in sorted(set(stored) - current)]
+    if len(result) > _MAX_DIFFERENCES:
+        remaining = len(result) - _MAX_DIFFERENCES
+        result = [*result[:_MAX_DIFFERENCES], f"... and {remaining} more"]
+    return result
@@ -0,0 +1,81 @@
+"""Update the bare mirrors of repositories in the user-wide cache.
+
+A mirror is shared by every project on the host, so updates are serialized using a
+lock file next to the mirror. A new mirror is cloned next to its final location
+and only moved into place once complete, an interrupted clone never looks like a
+mirror. The bootstrap executes the update as a command:
+
+    python -m bob.mirror <url> <path>
+"""
+import logging
+import pathlib
+import shutil
+import subprocess
+import sys
+import typing
+
+from bob.cache import locked
+
+
+def update_command(url: str, path: pathlib.Path) -> typing.List[str]:
+    """Generate the command updating a mirror.
+
+    Args:
+        url: the URL of the repository.
+        path: the location of the mirror.
+
+    Returns:
+        The command, which can be passed to `subprocess.run`.
+    """
+    return [sys.executable, "-m", "bob.mirror", url, str(path)]
+
+
+def update(url: str, path: pathlib.Path) -> None:
+    """Fetch a repository into its mirror, cloning the mirror when missing.
+
+    Args:
+        url: the URL of the repository.
+        path: the location of the mirror.
+
+    Raises:
+        CalledProcessError: when git fails.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with locked(path.with_name(f"{path.name}.lock")):
+        if path.exists():
+            logging.info("Updating mirror: %s", path)
+            fetch = ["git", "fetch", "--prune", "origin"]
+            subprocess.run(fetch, cwd=path, check=True)
+            return
+
+        logging.info("Creating mirror: %s", path)
+        partial = path.with_name(f"{path.name}.part")
+        shutil.rmtree(partial, ignore_errors=True)
+        try:
+            clone = ["git", "clone", "--mirror", url, str(partial)]
+            subprocess.run(clone, check=True)
+            partial.rename(path)
+        finally:
+            shutil.rmtree(partial, ignore_errors=True)
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """Update a mirror, as a command.
+
+    Args:
+        argv: the URL of the repository and the location of the mirror, defaults
+            to the arguments of the process.
+
+    Returns:
+        The exit status.
+    """
+    url, path = sys.argv[1:] if argv is None else argv
+    try:
+        update(url, pathlib.Path(path))
+    except subprocess.CalledProcessError as ex:
+        return ex.returncode
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
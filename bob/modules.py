@@ -2,23 +2,33 @@
 
 Each command Bob can execute has a corresponding module. These modules provide
 isoalted functionality solely for the specific command. Additionally, each module
-implement the same interface.
+implement the same interface. A module setting `SHARED` to True is executed once when
+processing several targets and build configurations.
+
+The available tasks are determined once per process. Besides the tasks shipped with
+Bob, other packages can provide tasks through the `bob.tasks` entry point group. A
+task module is only imported when it is first used.
 """
-import enum
+import functools
 import importlib
 import logging
 import pathlib
 import pkgutil
 import types
+import typing
 
 from bob.api import Command
 
+ENTRY_POINT_GROUP = "bob.tasks"
+
+LoaderT = typing.Callable[[], types.ModuleType]
+
 
-def get_task(command: Command) -> types.ModuleType:
+def get_task(command: typing.Union[Command, str]) -> types.ModuleType:
     """Get the module corresponding to the given task.
 
     Args:
-        command: a valid Command
+        command: a valid Command, or the name of a task.
 
     Returns:
         A module to execute the command.
@@ -26,21 +36,49 @@ def get_task(command: Command) -> types.ModuleType:
     Raises:
         ValueError: when the task has no corresponding module.
     """
-    for t in _list_tasks():  # type: ignore [attr-defined]
-        if t.name == command.name:
-            return _load_task(t)
+    name = command.name.lower() if isinstance(command, Command) else command.lower()
+    if name not in _registry():
+        raise ValueError(f"No corresponding task for {command}")
+    return _load_task(name)
 
-    raise ValueError(f"No corresponding task for {command}")  # pragma: no cover
+
+def list_tasks() -> typing.List[str]:
+    """List the names of the available tasks.
+
+    Returns:
+        The task names, without loading the tasks.
+    """
+    return list(_registry())
 
 
-def _list_tasks() -> enum.Enum:
+@functools.lru_cache(maxsize=None)
+def _registry() -> typing.Dict[str, LoaderT]:
     tasks_path = pathlib.Path(__file__).parent.resolve() / "tasks"
-    modules = [
-        name.capitalize() for _, name, _ in pkgutil.iter_modules([str(tasks_path)])
-    ]
-    logging.debug("Found the following modules: %s", modules)
-    return enum.Enum("Tasks", modules)
+    result: typing.Dict[str, LoaderT] = {
+        name: functools.partial(importlib.import_module, f".tasks.{name}", "bob")
+        for _, name, _ in pkgutil.iter_modules([str(tasks_path)])
+    }
+
+    for entry_point in _entry_points():
+        name = entry_point.name.lower()
+        if name in result:
+            logging.warning("Ignoring task `%s` from %s", name, entry_point.value)
+            continue
+        result[name] = entry_point.load
+
+    logging.debug("Found the following tasks: %s", list(result))
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _load_task(name: str) -> types.ModuleType:
+    return _registry()[name]()
+
 
+def _entry_points() -> typing.Iterable[typing.Any]:
+    from importlib import metadata  # pylint: disable=import-outside-toplevel
 
-def _load_task(task: enum.Enum) -> types.ModuleType:
-    return importlib.import_module(f".tasks.{task.name.lower()}", "bob")
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    return entry_points.get(ENTRY_POINT_GROUP, [])  # pragma: no cover
@@ -0,0 +1,249 @@
+"""Capture of the output of the executed commands.
+
+The output of each command is read line by line while it executes and written to
+the terminal and to a log file per command, with the time since the command started.
+Ninja reports its progress as `[x/y]`; with several builds executing at once, their
+progress is combined into one status line with an estimate of the remaining time.
+"""
+import logging
+import os
+import pathlib
+import re
+import subprocess
+import sys
+import threading
+import time
+import typing
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from bob.executor import Job
+
+_PROGRESS = re.compile(rb"^\[(\d+)/(\d+)\] ")
+
+# Minimum time between updates of the status, in seconds.
+_STATUS_INTERVAL = 0.1
+_STATUS_LOG_INTERVAL = 10.0
+
+
+class CommandLog:
+    """Log file of a single command.
+
+    Attributes:
+        path (pathlib.Path): location of the log file.
+    """
+
+    def __init__(self: "CommandLog", output: "Output", job: "Job") -> None:
+        """Initialize CommandLog, the log file is created.
+
+        Args:
+            output: the output the command belongs to.
+            job: the command to log.
+        """
+        self._output = output
+        self._name = str(job.name)
+        self._start = time.monotonic()
+        self.path = output.folder / (re.sub(r"[^\w.-]", "_", self._name) + ".log")
+        self._file = self.path.open("w", encoding="utf-8", errors="replace")
+        command = " ".join(job).replace("\n", "\\n")
+        self._file.write(f"# {command}\n")
+        self._file.write(f"# started {time.strftime('%Y-%m-%dT%H:%M:%S%z')}\n")
+
+    def line(self: "CommandLog", stream: str, data: bytes) -> None:
+        """Process a line of output.
+
+        Args:
+            stream: the stream the line was written to, stdout or stderr.
+            data: the line, including the line ending.
+        """
+        text = data.decode(errors="replace").rstrip("\r\n")
+        elapsed = time.monotonic() - self._start
+        with self._output.lock:
+            self._file.write(f"[{elapsed:10.3f}] {stream}: {text}\n")
+            match = _PROGRESS.match(data)
+            if match:
+                self._output.progress(self._name, int(match[1]), int(match[2]), text)
+            else:
+                self._output.echo(self._name, stream, text)
+
+    def close(self: "CommandLog", returncode: int) -> None:
+        """Close the log file.
+
+        Args:
+            returncode: the result code of the command.
+        """
+        elapsed = time.monotonic() - self._start
+        with self._output.lock:
+            self._file.write(f"# exit code {returncode} after {elapsed:.3f}s\n")
+            self._file.close()
+            self._output.finish(self._name)
+
+
+class Output:
+    """Captures the output of the executed commands.
+
+    Attributes:
+        folder (pathlib.Path): folder holding the log files.
+        lock (threading.Lock): serializes writing the output.
+    """
+
+    def __init__(
+        self: "Output",
+        folder: pathlib.Path,
+        *,
+        interactive: typing.Optional[bool] = None,
+    ) -> None:
+        """Initialize Output, the log folder is created.
+
+        Args:
+            folder: folder to write the log files to.
+            interactive: redraw a status line, defaults to True for a terminal.
+        """
+        folder.mkdir(parents=True, exist_ok=True)
+        self.folder = folder
+        self.lock = threading.Lock()
+        if interactive is None:
+            interactive = sys.stdout.isatty()
+        self._interactive = interactive
+        self._progress: typing.Dict[str, typing.Tuple[int, int]] = {}
+        self._start: typing.Optional[float] = None
+        self._status = ""
+        self._updated = 0.0
+
+    def open(self: "Output", job: "Job") -> CommandLog:
+        """Start the log of a command.
+
+        Args:
+            job: the command to log.
+
+        Returns:
+            The log of the command.
+        """
+        return CommandLog(self, job)
+
+    def run(self: "Output", job: "Job") -> int:
+        """Execute a command, capturing its output.
+
+        Args:
+            job: the command to execute.
+
+        Returns:
+            The result code of the command.
+
+        Raises:
+            CalledProcessError: when the command failed.
+        """
+        env = None if job.env is None else {**os.environ, **job.env}
+        log = self.open(job)
+        with subprocess.Popen(
+            job, cwd=job.cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as process:
+            readers = [
+                threading.Thread(target=_read, args=(process.stdout, log, "stdout")),
+                threading.Thread(target=_read, args=(process.stderr, log, "stderr")),
+            ]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            returncode = process.wait()
+        log.close(returncode)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, job)
+        return returncode
+
+    def echo(self: "Output", name: str, stream: str, text: str) -> None:
+        """Write a line of a command to the terminal, the lock is held.
+
+        Args:
+            name: name of the command.
+            stream: the stream the line was written to.
+            text: the line.
+        """
+        target = sys.stderr if stream == "stderr" else sys.stdout
+        self._clear()
+        target.write(f"{name} | {text}\n")
+        target.flush()
+        self._draw()
+
+    def progress(self: "Output", name: str, done: int, total: int, text: str) -> None:
+        """Process the progress reported by a command, the lock is held.
+
+        Args:
+            name: name of the command.
+            done: number of completed steps.
+            total: total number of steps.
+            text: the line reporting the progress.
+        """
+        if self._start is None:
+            self._start = time.monotonic()
+        self._progress[name] = (done, total)
+
+        now = time.monotonic()
+        if not self._interactive:
+            self.echo(name, "stdout", text)
+            if len(self._progress) > 1 and now - self._updated >= _STATUS_LOG_INTERVAL:
+                self._updated = now
+                logging.info(self.status())
+            return
+
+        if now - self._updated >= _STATUS_INTERVAL:
+            self._updated = now
+            self._clear()
+            self._status = self.status()
+            self._draw()
+
+    def finish(self: "Output", name: str) -> None:
+        """Complete the progress of a command, the lock is held.
+
+        Args:
+            name: name of the command.
+        """
+        if name in self._progress:
+            total = self._progress[name][1]
+            self._progress[name] = (total, total)
+        if self._interactive and self._status:
+            self._clear()
+            self._status = self.status()
+            self._draw()
+
+    def status(self: "Output") -> str:
+        """Combine the progress of the commands.
+
+        Returns:
+            A status line with the progress of each command, in total and the
+            estimated remaining time.
+        """
+        done = sum(x[0] for x in self._progress.values())
+        total = sum(x[1] for x in self._progress.values())
+        if not total:
+            return ""
+
+        parts = [f"{x} {y[0]}/{y[1]}" for x, y in self._progress.items() if y[0] < y[1]]
+        result = f"[{done}/{total} {done * 100 // total}%]"
+        elapsed = time.monotonic() - (self._start or time.monotonic())
+        if 0 < done < total and elapsed > 0:
+            remaining = int((total - done) * elapsed / done)
+            result += f" ETA {remaining // 60}:{remaining % 60:02d}"
+        return f"{result} {', '.join(parts)}"
+
+    def close(self: "Output") -> None:
+        """End the status line, if shown."""
+        with self.lock:
+            if self._interactive and self._status:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+            self._status = ""
+
+    def _clear(self: "Output") -> None:
+        if self._interactive and self._status:
+            sys.stdout.write("\r\x1b[K")
+
+    def _draw(self: "Output") -> None:
+        if self._interactive and self._status:
+            sys.stdout.write(self._status)
+            sys.stdout.flush()
+
+
+def _read(pipe: typing.IO[bytes], log: CommandLog, stream: str) -> None:
+    for line in iter(pipe.readline, b""):
+        log.line(stream, line)
@@ -1,20 +1,70 @@
 """The bootstrap task prepares the codebase for building.
 
 Bootstrapping ensures all dependencies and toolchains are avaialble. Actual building of
-dependencies is out of scope due to the project to project variation.
+dependencies is out of scope due to the project to project variation. The resulting
+state is recorded in `bob.lock`, later bootstraps validate the state against it.
 """
 import collections.abc
+import concurrent.futures
 import contextlib
+import contextvars
+import functools
+import hashlib
 import logging
 import pathlib
 import platform
+import re
 import shutil
+import tarfile
+import tempfile
+import threading
 import typing
 import urllib.request
 
 from bob.api import Command
+from bob.cache import (
+    DEFAULT_CACHE_SIZE,
+    DownloadCache,
+    cache_dir,
+    file_digest,
+    mirror_path,
+    parse_size,
+)
+from bob.executor import Job, Pool
+from bob.git import git_dir, head_revision, is_checked_out, sparse_paths
+from bob.lock import (
+    LOCK_FILE,
+    Lock,
+    LockError,
+    diff_manifest,
+    manifest_digest,
+    manifest_path,
+    read_manifest,
+    tree_manifest,
+    write_manifest,
+)
+from bob.mirror import update_command
 from bob.typehints import CommandListT, EnvMapT, OptionsMapT
 
+SHARED = True
+"""The bootstrap is executed once for all targets and build configurations."""
+
+DEFAULT_FETCH_JOBS = 8
+CHUNK_SIZE = 1024 * 1024
+
+ArchiveStoreT = typing.Union[  # pylint: disable=invalid-name
+    pathlib.Path, DownloadCache, None
+]
+
+# Serializes extracting archives into the toolchain folder, the new top level
+# entries identify the content of an archive.
+_EXTRACTING = threading.Lock()
+
+cancelled: "contextvars.ContextVar[threading.Event]" = contextvars.ContextVar(
+    "cancelled"
+)
+"""Once set, toolchains are no longer downloaded, see `bob.bob_async`."""
+
 
 def depends_on() -> typing.List[Command]:
     """Generate a list of task names this task depends on.
@@ -36,12 +86,12 @@ def parse_env(env: EnvMapT, options: OptionsMapT) -> EnvMapT:
         An updated env map.
     """
     try:
-        env["dependencies_path"] = pathlib.Path(options["dependencies"]["folder"])
+        env["dependencies_path"] = env["root_path"] / options["dependencies"]["folder"]
     except KeyError:
         env["dependencies_path"] = env["root_path"] / "external"
 
     try:
-        env["toolchains_path"] = pathlib.Path(options["toolchains"]["folder"])
+        env["toolchains_path"] = env["root_path"] / options["toolchains"]["folder"]
     except KeyError:
         env["toolchains_path"] = env["root_path"] / "toolchains"
 
@@ -67,13 +117,44 @@ def parse_options(options: OptionsMapT, parsed: OptionsMapT) -> None:
                 deps[k] = v
     parsed["bootstrap"]["dependencies"] = deps
 
+    with contextlib.suppress(KeyError):
+        parsed["bootstrap"]["mirror"] = bool(options["dependencies"]["mirror"])
+
+    try:
+        parsed["bootstrap"]["jobs"] = int(options["dependencies"]["jobs"])
+    except KeyError:
+        parsed["bootstrap"]["jobs"] = DEFAULT_FETCH_JOBS
+    except (TypeError, ValueError) as ex:
+        raise ValueError("Invalid number of dependency jobs") from ex
+
     tools = {}
+    digests = {}
     with contextlib.suppress(KeyError):
         os = platform.system().lower()
         for k, v in options["toolchains"].items():
             with contextlib.suppress(TypeError, KeyError):
                 tools[k] = v[os]
+                digests[k] = _select_digest(v.get("sha256"), os)
     parsed["bootstrap"]["toolchains"] = tools
+    parsed["bootstrap"]["digests"] = digests
+
+    settings = options.get("toolchains", {})
+    parsed["bootstrap"]["pipeline"] = bool(settings.get("pipeline", False))
+    parsed["bootstrap"]["cache"] = bool(settings.get("cache", True))
+    parsed["bootstrap"]["shared_cache"] = bool(settings.get("shared_cache", False))
+    parsed["bootstrap"]["cache_size"] = parse_size(
+        settings.get("cache_size", DEFAULT_CACHE_SIZE)
+    )
+
+    parsed["bootstrap"]["lock"] = bool(options.get("lock", {}).get("enabled", True))
+
+
+def _select_digest(
+    digest: typing.Union[str, typing.Mapping[str, str], None], os: str
+) -> typing.Optional[str]:
+    if isinstance(digest, collections.abc.Mapping):
+        return digest.get(os)
+    return digest
 
 
 def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
@@ -87,25 +168,123 @@ def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
         A list of commands, each command is a list of strings which can be
         passed to `subprocess.run`.
     """
-    result = []
+    result: typing.List[Job] = []
     result += _setup_bob(env["root_path"])
 
+    lock = None
+    current: typing.Set[str] = set()
+    if options.get("bootstrap", {}).get("lock", False):
+        lock = Lock(env["root_path"] / LOCK_FILE)
+        current = _check_lock(lock, options["bootstrap"], env)
+
     with contextlib.suppress(KeyError):
         result += _gather_dependencies(
             options["bootstrap"]["dependencies"],
             env["dependencies_path"],
+            Pool("dependencies", options["bootstrap"].get("jobs", DEFAULT_FETCH_JOBS)),
+            [str(x.name) for x in result],
+            mirror=options["bootstrap"].get("mirror", False),
+            lock=lock,
         )
 
     with contextlib.suppress(KeyError):
         _gather_toolchain(
-            options["bootstrap"]["toolchains"],
+            {
+                k: v
+                for k, v in options["bootstrap"]["toolchains"].items()
+                if k not in current
+            },
             env["toolchains_path"],
+            options["bootstrap"],
+            lock,
         )
 
+    if lock is not None:
+        lock.save()
     return result
 
 
-def _setup_bob(root_path: pathlib.Path) -> CommandListT:
+def _check_lock(
+    lock: Lock, settings: typing.Mapping[str, typing.Any], env: EnvMapT
+) -> typing.Set[str]:
+    """Validate the state on disk against the lock file.
+
+    Entries whose configuration changed are dropped, they are locked again. A missing
+    dependency or toolchain is retrieved, anything else differing from the lock file
+    is reported.
+
+    Returns:
+        The names of the toolchains matching the lock file.
+
+    Raises:
+        LockError: when a dependency or toolchain differs from the lock file.
+    """
+    deps = settings.get("dependencies", {})
+    toolchains = settings.get("toolchains", {})
+    lock.retain(deps, toolchains)
+
+    differences = []
+    for name, options in deps.items():
+        commit = lock.dependency(name, options)
+        path = env["dependencies_path"] / name
+        if commit is None or not path.exists():
+            continue
+        head = head_revision(path) if git_dir(path) is not None else None
+        if head != commit:
+            differences.append(
+                f"dependency {name}: locked at {commit}, found {head or 'no checkout'}"
+            )
+
+    current = set()
+    for name, url in toolchains.items():
+        entry = lock.toolchain(name, url, settings.get("digests", {}).get(name))
+        if entry is None:
+            continue
+        drift = _check_toolchain(env["toolchains_path"], name, entry)
+        if drift is None:
+            logging.info("Toolchain %s matches the lock file", name)
+            current.add(name)
+        differences += drift or []
+
+    if differences:
+        raise LockError(differences)
+    return current
+
+
+def _check_toolchain(
+    folder: pathlib.Path, name: str, entry: typing.Mapping[str, typing.Any]
+) -> typing.Optional[typing.List[str]]:
+    """Compare the files of a toolchain against the local manifest stored when locked.
+
+    Without a stored manifest, like after clearing the user-wide cache, the tree is
+    compared against the digest in the lock file and the local manifest is stored.
+
+    Returns:
+        None when the toolchain matches the lock file, otherwise the differences. A
+        missing toolchain has no differences, it is retrieved.
+    """
+    manifest = tree_manifest(folder, entry["entries"], local=True)
+    stored = read_manifest(manifest_path(folder, name), entry["manifest"])
+    if stored is not None and manifest == stored:
+        return None
+    if stored is None and (
+        manifest_digest(tree_manifest(folder, entry["entries"])) == entry["manifest"]
+    ):
+        write_manifest(manifest_path(folder, name), manifest, entry["manifest"])
+        return None
+    if not manifest:
+        return []
+
+    return [
+        (
+            f"toolchain {name}: extracted tree changed, {len(manifest)} files,"
+            f" locked {entry['files']}"
+        ),
+        *[f"  {x}" for x in diff_manifest(stored, manifest)],
+    ]
+
+
+def _setup_bob(root_path: pathlib.Path) -> typing.List[Job]:
     """Install Bob into the cmake folder.
 
     Todo:
@@ -120,15 +299,34 @@ def _setup_bob(root_path: pathlib.Path) -> CommandListT:
     )
 
     return [
-        ["cmake", "-E", "make_directory", str(output_folder)],
-        ["cmake", "-E", "copy", str(base_file), str(output_folder)],
+        Job(["cmake", "-E", "make_directory", str(output_folder)], "bob:cmake"),
+        Job(["cmake", "-E", "copy", str(base_file), str(output_folder)], "bob:find"),
     ]
 
 
-def _gather_dependencies(
+def _gather_dependencies(  # noqa: PLR0913 # pylint: disable=too-many-arguments
     deps: typing.Mapping[str, typing.Mapping[str, typing.Any]],
     output_path: pathlib.Path,
-) -> CommandListT:
+    pool: Pool,
+    after: typing.Sequence[str],
+    *,
+    mirror: bool = False,
+    lock: typing.Optional[Lock] = None,
+) -> typing.List[Job]:
+    """Fetch each dependency, concurrently with the other dependencies.
+
+    The dependencies wait on the jobs in `after`, keeping the output of a bootstrap
+    in a predictable order. With `mirror` enabled, each repository is fetched into a
+    bare mirror in the user-wide cache first. The dependency is cloned using the
+    mirror as reference, only retrieving objects missing from the mirror. Shallow and
+    partial clones bypass the mirror, as it would hold the full history.
+
+    A dependency which already has its tag checked out is not checked out again,
+    and its sparse paths are only set again when they changed. This is determined
+    by reading the git folder instead of starting git. With a
+    `lock`, the commit recorded in the lock file is checked out instead of the tag
+    and the checked out commit is recorded.
+    """
     if len(deps) == 0:
         return []
 
@@ -136,38 +334,462 @@ def _gather_dependencies(
     output_path.mkdir(parents=True, exist_ok=True)
 
     result = []
+    mirrors: typing.Optional[typing.Dict[str, str]] = {} if mirror else None
     for name, options in deps.items():
         logging.info("Found external dependecy: %s", name)
         rep_path = output_path / name
 
-        if not rep_path.exists():
-            result.append(["git", "clone", options["repository"], str(rep_path)])
+        needs = list(after)
+        cloned = not rep_path.exists()
+        if cloned:
+            result += _clone_jobs(
+                name, options, rep_path, mirrors, needs=needs, pool=pool
+            )
+            needs = [f"clone:{name}"]
 
-        result.append(
-            ["cmake", "-E", "chdir", str(rep_path), "git", "checkout", options["tag"]]
+        sparse = _sparse_job(
+            name, options, rep_path, cloned=cloned, needs=needs, pool=pool
         )
+        if sparse is not None:
+            result.append(sparse)
+            needs = [f"sparse:{name}"]
+
+        result += _checkout_job(name, options, rep_path, lock, needs=needs, pool=pool)
 
     return result
 
 
-def _get_package(url: str, output_path: pathlib.Path) -> pathlib.Path:
-    path = output_path / pathlib.Path(url).name
-    logging.info("Retrieving: %s", pathlib.Path(url).name)
+def _clone_jobs(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    name: str,
+    options: typing.Mapping[str, typing.Any],
+    rep_path: pathlib.Path,
+    mirrors: typing.Optional[typing.Dict[str, str]],
+    *,
+    needs: typing.Sequence[str],
+    pool: Pool,
+) -> typing.List[Job]:
+    """Generate the jobs cloning a dependency, updating its mirror first if used.
+
+    `mirrors` maps each repository to the job updating its mirror, None without
+    mirrors, so that a mirror is only updated once.
+    """
+    url = options["repository"]
+    mirror_repo = None
+    result = []
+    if mirrors is not None and not _is_partial(name, options):
+        mirror_repo = mirror_path(url)
+        if url not in mirrors:
+            mirrors[url] = f"mirror:{name}"
+            cmd = update_command(url, mirror_repo)
+            result.append(Job(cmd, mirrors[url], needs, group=name, pool=pool))
+        needs = [mirrors[url]]
+
+    cmd = _clone_command(name, options, rep_path, mirror_repo)
+    result.append(Job(cmd, f"clone:{name}", needs, group=name, pool=pool))
+    return result
+
+
+def _checkout_job(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    name: str,
+    options: typing.Mapping[str, typing.Any],
+    rep_path: pathlib.Path,
+    lock: typing.Optional[Lock],
+    *,
+    needs: typing.Sequence[str],
+    pool: Pool,
+) -> typing.List[Job]:
+    """Generate the job checking out the tag, or the locked commit, of a dependency.
+
+    Returns:
+        The job, none when the revision is already checked out.
+    """
+    revision = (lock and lock.dependency(name, options)) or options["tag"]
+    store = None
+    if lock is not None:
+        store = functools.partial(_lock_dependency, lock, name, options, rep_path)
+
+    if is_checked_out(rep_path, revision):
+        logging.debug("Dependency %s is at %s", name, revision)
+        if store is not None:
+            store()
+        return []
+
+    cmd = ["cmake", "-E", "chdir", str(rep_path), "git", "checkout", revision]
+    return [
+        Job(cmd, f"checkout:{name}", needs, group=name, pool=pool, on_success=store)
+    ]
+
+
+def _lock_dependency(
+    lock: Lock,
+    name: str,
+    options: typing.Mapping[str, typing.Any],
+    rep_path: pathlib.Path,
+) -> None:
+    lock.lock_dependency(name, options, head_revision(rep_path))
+    lock.save()
+
+
+def _clone_command(
+    name: str,
+    options: typing.Mapping[str, typing.Any],
+    rep_path: pathlib.Path,
+    mirror_repo: typing.Optional[pathlib.Path],
+) -> typing.List[str]:
+    """Generate the command to clone a dependency.
+
+    A depth or single branch clone only fetches the pinned tag, a filter skips
+    objects until they are needed and a sparse clone defers the checkout until the
+    sparse paths are set.
+    """
+    cmd = ["git", "clone"]
+    if mirror_repo is not None:
+        cmd += ["--reference", str(mirror_repo), "--dissociate"]
+
+    with contextlib.suppress(KeyError):
+        depth = options["depth"]
+        if isinstance(depth, bool) or not isinstance(depth, int) or depth < 1:
+            raise ValueError(f"Invalid depth for dependency {name}: {depth}")
+        cmd += ["--depth", str(depth)]
+
+    with contextlib.suppress(KeyError):
+        cmd += [f"--filter={options['filter']}"]
+
+    if "depth" in options or options.get("single_branch", False):
+        if re.fullmatch("[0-9a-fA-F]{40}", options["tag"]):
+            raise ValueError(
+                f"Dependency {name} pins a commit, a single branch clone requires a tag"
+            )
+        cmd += ["--branch", options["tag"], "--single-branch"]
 
-    if not path.exists():
-        logging.info("Downloading: %s", url)
+    if "sparse" in options:
+        cmd += ["--no-checkout"]
+
+    return [*cmd, options["repository"], str(rep_path)]
+
+
+def _is_partial(name: str, options: typing.Mapping[str, typing.Any]) -> bool:
+    if "depth" in options or "filter" in options:
+        logging.debug("Partial clone of %s, not using the mirror", name)
+        return True
+    return False
+
+
+def _sparse_job(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    name: str,
+    options: typing.Mapping[str, typing.Any],
+    rep_path: pathlib.Path,
+    *,
+    cloned: bool,
+    needs: typing.Sequence[str],
+    pool: Pool,
+) -> typing.Optional[Job]:
+    """Generate the job setting the sparse paths of a dependency.
+
+    Returns:
+        The job, None when the dependency is not sparse or its existing checkout
+        already has the paths set.
+    """
+    if "sparse" not in options:
+        return None
+    cmd = _sparse_command(name, options["sparse"], rep_path)
+    paths = {x.strip("/") for x in options["sparse"]}
+    if not cloned and sparse_paths(rep_path) == paths:
+        logging.debug("Dependency %s has its sparse paths set", name)
+        return None
+    return Job(cmd, f"sparse:{name}", needs, group=name, pool=pool)
+
+
+def _sparse_command(
+    name: str, paths: typing.Sequence[str], rep_path: pathlib.Path
+) -> typing.List[str]:
+    if isinstance(paths, str) or not all(isinstance(x, str) for x in paths):
+        raise ValueError(f"Invalid sparse paths for dependency {name}: {paths}")
+    cmd = ["cmake", "-E", "chdir", str(rep_path), "git", "sparse-checkout", "set"]
+    return [*cmd, *paths]
+
+
+@contextlib.contextmanager
+def _package(
+    url: str,
+    archives: typing.Union[pathlib.Path, DownloadCache],
+    sha256: typing.Optional[str] = None,
+) -> typing.Iterator[pathlib.Path]:
+    """Provide an archive, found in `archives` or downloaded.
+
+    An archive found in the shared cache is held for the duration of the block. A
+    downloaded archive is only moved into the shared cache once the block completed,
+    so it is not evicted while it is extracted.
+    """
+    name = pathlib.Path(url).name
+    logging.info("Retrieving: %s", name)
 
-        #
-        # Yes, using urllib.request but limiting the protocols beforehand.
-        #
-        if not url.startswith(("http:", "https:")):
-            raise ValueError("URL must start with 'http:' or 'https:'")
+    with _found_archive(url, archives, sha256) as found:
+        if found is not None:
+            yield found
+            return
 
-        urllib.request.urlretrieve(url, path)  # noqa: S310
+    if isinstance(archives, DownloadCache):
+        path = archives.temporary(name)
     else:
+        path = archives / name
+    logging.info("Downloading: %s", url)
+    _check_url(url)
+    try:
+        urllib.request.urlretrieve(url, path, reporthook=_check_cancelled)  # noqa: S310
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    if not isinstance(archives, DownloadCache):
+        if sha256:
+            _check_download(path, name, sha256)
+        yield path
+        return
+
+    try:
+        digest = _check_download(path, name, sha256)
+        yield path
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    archives.put(url, path, digest)
+
+
+def _check_download(path: pathlib.Path, name: str, sha256: typing.Optional[str]) -> str:
+    """Verify the digest of a downloaded file, removing it when it does not match."""
+    digest = file_digest(path)
+    try:
+        _verify_digest(name, sha256, digest)
+    except ValueError:
+        path.unlink()
+        raise
+    return digest
+
+
+def _found_archive(
+    url: str, archives: ArchiveStoreT, sha256: typing.Optional[str]
+) -> typing.ContextManager[typing.Optional[pathlib.Path]]:
+    if isinstance(archives, DownloadCache):
+        return archives.hold(url, sha256)
+
+    path = None
+    if archives is not None and (archives / pathlib.Path(url).name).exists():
+        path = archives / pathlib.Path(url).name
         logging.info("Archive found: %s", path)
+    return contextlib.nullcontext(path)
+
+
+def _verify_digest(name: str, expected: typing.Optional[str], actual: str) -> None:
+    if expected and expected.lower() != actual:
+        raise ValueError(
+            f"Digest mismatch for {name}: expected {expected}, got {actual}"
+        )
 
-    return path
+
+def _check_cancelled(*_: object) -> None:
+    """Stop a download once cancelled, usable as `urlretrieve` report hook."""
+    event = cancelled.get(None)
+    if event is not None and event.is_set():
+        raise RuntimeError("Cancelled")
+
+
+def _check_url(url: str) -> None:
+    #
+    # Yes, using urllib.request but limiting the protocols beforehand.
+    #
+    if not url.startswith(("http:", "https:")):
+        raise ValueError("URL must start with 'http:' or 'https:'")
+
+
+@contextlib.contextmanager
+def _partial_file(
+    path: typing.Optional[pathlib.Path],
+) -> typing.Iterator[typing.Optional[typing.BinaryIO]]:
+    """Open a file which only appears at `path` once it is completely written."""
+    if path is None:
+        yield None
+        return
+
+    part = path.with_name(f"{path.name}.part")
+    try:
+        with part.open("wb") as f:
+            yield f
+        part.replace(path)
+    finally:
+        part.unlink(missing_ok=True)
+
+
+class _TeeReader:
+    """Reads from a stream while copying the data read into a file."""
+
+    def __init__(
+        self: "_TeeReader",
+        source: typing.BinaryIO,
+        sink: typing.Optional[typing.BinaryIO],
+    ) -> None:
+        self._source = source
+        self._sink = sink
+        self._digest = hashlib.sha256()
+
+    def read(self: "_TeeReader", size: int = -1) -> bytes:
+        """Read from the stream.
+
+        Args:
+            size: maximum number of bytes to read, -1 to read until the end.
+
+        Returns:
+            The data read.
+        """
+        _check_cancelled()
+        data = self._source.read(size)
+        self._digest.update(data)
+        if self._sink is not None:
+            self._sink.write(data)
+        return data
+
+    def drain(self: "_TeeReader") -> None:
+        """Read the remainder of the stream."""
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def hexdigest(self: "_TeeReader") -> str:
+        """Generate the SHA-256 digest of the data read.
+
+        Returns:
+            The digest as a hexadecimal string.
+        """
+        return self._digest.hexdigest()
+
+
+def _stream_package(
+    url: str,
+    output_path: pathlib.Path,
+    archives: ArchiveStoreT,
+    sha256: typing.Optional[str] = None,
+    previous: typing.Collection[str] = (),
+) -> typing.Tuple[typing.List[str], typing.Optional[str]]:
+    """Download and extract an archive at the same time.
+
+    Zip archives keep their index at the end of the file and are downloaded before
+    extracting.
+
+    Returns:
+        The top level entries extracted and the digest of the archive, if known.
+    """
+    entries = _extracted(url, output_path)
+    if entries is not None:
+        return entries, sha256
+
+    with _found_archive(url, archives, sha256) as found:
+        if found is not None:
+            entries = _extract_package(found, output_path, previous)
+            return entries, sha256 or file_digest(found)
+
+    name = pathlib.Path(url).name
+    if name.endswith(".zip"):
+        with tempfile.TemporaryDirectory(dir=output_path) as tmp, _package(
+            url, archives or pathlib.Path(tmp), sha256
+        ) as archive:
+            entries = _extract_package(archive, output_path, previous)
+            return entries, file_digest(archive)
+
+    _check_url(url)
+    logging.info("Streaming: %s", url)
+    target: typing.Optional[pathlib.Path] = None
+    if isinstance(archives, DownloadCache):
+        target = archives.temporary(name)
+    elif archives is not None:
+        target = archives / name
+
+    with _partial_file(target) as sink:
+        entries, digest = _stream_into(url, output_path, sink, sha256, previous)
+
+    if isinstance(archives, DownloadCache) and target is not None:
+        archives.put(url, target, digest)
+    logging.info("Extracted: %s to %s", name, output_path)
+    return entries, digest
+
+
+def _stream_into(
+    url: str,
+    output_path: pathlib.Path,
+    sink: typing.Optional[typing.BinaryIO],
+    sha256: typing.Optional[str],
+    previous: typing.Collection[str],
+) -> typing.Tuple[typing.List[str], str]:
+    """Extract an archive while downloading it, optionally saving it into `sink`.
+
+    The archive is extracted into a staging folder first. Only when the download
+    completed and matches the expected digest, the content is moved into place.
+    The entries in `previous`, extracted for the toolchain before, are replaced.
+
+    Returns:
+        The top level entries extracted and the digest of the archive.
+    """
+    with tempfile.TemporaryDirectory(dir=output_path) as tmp:
+        with urllib.request.urlopen(url) as response:  # noqa: S310
+            reader = _TeeReader(response, sink)
+            stream = typing.cast("typing.BinaryIO", reader)
+            with tarfile.open(fileobj=stream, mode="r|*") as tar:
+                _extract_all(tar, pathlib.Path(tmp))
+            reader.drain()
+
+        _verify_digest(pathlib.Path(url).name, sha256, reader.hexdigest())
+        entries = _move_into(pathlib.Path(tmp), output_path, previous)
+
+    return entries, reader.hexdigest()
+
+
+def _move_into(
+    staging: pathlib.Path, output_path: pathlib.Path, previous: typing.Collection[str]
+) -> typing.List[str]:
+    """Move the extracted content from the staging folder into place.
+
+    The entries in `previous`, extracted for the same toolchain before, are replaced.
+    Other existing folders, like a `bin` folder shared by several toolchains, are
+    merged with the extracted content.
+
+    Returns:
+        The top level entries moved.
+    """
+    entries = sorted(x.name for x in staging.iterdir())
+    with _EXTRACTING:
+        for entry in entries:
+            if entry in previous:
+                _remove(output_path / entry)
+            _merge(staging / entry, output_path / entry)
+    return entries
+
+
+def _merge(source: pathlib.Path, target: pathlib.Path) -> None:
+    """Move a file or folder, merging a folder into an existing folder."""
+    if _is_folder(source) and _is_folder(target):
+        for x in source.iterdir():
+            _merge(x, target / x.name)
+        return
+    _remove(target)
+    source.replace(target)
+
+
+def _is_folder(path: pathlib.Path) -> bool:
+    return path.is_dir() and not path.is_symlink()
+
+
+def _remove(path: pathlib.Path) -> None:
+    """Remove a file or folder, like the files of a previous extraction."""
+    if _is_folder(path):
+        logging.info("Replacing: %s", path)
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _extract_all(tar: tarfile.TarFile, output_path: pathlib.Path) -> None:
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(output_path, filter="data")
+    else:  # pragma: no cover
+        tar.extractall(output_path)  # noqa: S202
 
 
 def _remove_suffix_from_archive_name(name: str) -> str:
@@ -185,16 +807,49 @@ def _remove_suffix_from_archive_name(name: str) -> str:
     raise ValueError("Unsupported archive type")
 
 
-def _extract_package(archive: pathlib.Path, output_path: pathlib.Path) -> None:
-    logging.info("Extracting: %s to %s", archive, output_path)
-    expected = output_path / _remove_suffix_from_archive_name(archive.name)
+def _extracted(
+    url: str, output_path: pathlib.Path
+) -> typing.Optional[typing.List[str]]:
+    """Determine the top level entries of a toolchain, when its folder exists.
+
+    Returns:
+        The folder named after the archive, None when the toolchain is not extracted.
+    """
+    expected = output_path / _remove_suffix_from_archive_name(pathlib.Path(url).name)
     if not expected.exists():
-        shutil.unpack_archive(archive, output_path)
+        return None
+    logging.info("Toolchain found: %s", expected)
+    return [expected.name]
+
+
+def _extract_package(
+    archive: pathlib.Path, output_path: pathlib.Path, previous: typing.Collection[str]
+) -> typing.List[str]:
+    """Extract an archive into a staging folder and move its content into place.
+
+    Returns:
+        The top level entries extracted.
+    """
+    logging.info("Extracting: %s to %s", archive, output_path)
+    with tempfile.TemporaryDirectory(dir=output_path) as tmp:
+        shutil.unpack_archive(archive, tmp)
+        return _move_into(pathlib.Path(tmp), output_path, previous)
 
 
 def _gather_toolchain(
-    toolchains: typing.Mapping[str, str], output_path: pathlib.Path
+    toolchains: typing.Mapping[str, str],
+    output_path: pathlib.Path,
+    settings: typing.Mapping[str, typing.Any],
+    lock: typing.Optional[Lock] = None,
 ) -> None:
+    """Retrieve and extract the toolchains.
+
+    In pipeline mode the toolchains are retrieved concurrently and each archive is
+    extracted while it is downloaded. Archives are kept in the project's download
+    folder, in the shared cache or, with caching disabled, not at all. With a
+    `lock`, the digest recorded in the lock file is verified when none is configured
+    and the extracted tree is recorded.
+    """
     if len(toolchains) == 0:
         return
 
@@ -203,7 +858,140 @@ def _gather_toolchain(
     archive_path = output_path / "download"
     archive_path.mkdir(parents=True, exist_ok=True)
 
-    for name, url in toolchains.items():
-        logging.info("Found toolchain dependency: %s", name)
-        archive = _get_package(url, archive_path)
-        _extract_package(archive, output_path)
+    archives: ArchiveStoreT = archive_path if settings.get("cache", True) else None
+    if settings.get("shared_cache", False):
+        archives = DownloadCache(
+            cache_dir() / "downloads",
+            settings.get("cache_size", DEFAULT_CACHE_SIZE),
+        )
+    digests = {
+        name: _locked_digest(lock, name, url, settings.get("digests", {}).get(name))
+        for name, url in toolchains.items()
+    }
+
+    extracted = {}
+    if not settings.get("pipeline", False):
+        for name, url in toolchains.items():
+            logging.info("Found toolchain dependency: %s", name)
+            _check_cancelled()
+            extracted[name] = _retrieve_package(
+                url, output_path, archives, digests[name], _locked_entries(lock, name)
+            )
+    else:
+        with concurrent.futures.ThreadPoolExecutor(len(toolchains)) as workers:
+            futures = {
+                name: workers.submit(
+                    contextvars.copy_context().run,
+                    _stream_package,
+                    url,
+                    output_path,
+                    archives,
+                    digests[name],
+                    _locked_entries(lock, name),
+                )
+                for name, url in toolchains.items()
+            }
+
+        for name, future in futures.items():
+            logging.info("Found toolchain dependency: %s", name)
+            extracted[name] = future.result()
+
+    if isinstance(archives, DownloadCache):
+        archives.evict()
+
+    if lock is not None:
+        for name, url in toolchains.items():
+            _lock_toolchain(lock, name, url, extracted[name], output_path)
+        _lock_sharing_toolchains(lock, toolchains, output_path)
+
+
+def _retrieve_package(
+    url: str,
+    output_path: pathlib.Path,
+    archives: ArchiveStoreT,
+    sha256: typing.Optional[str],
+    previous: typing.Collection[str],
+) -> typing.Tuple[typing.List[str], typing.Optional[str]]:
+    """Download an archive and extract it, unless the toolchain is extracted.
+
+    Returns:
+        The top level entries extracted and the digest of the archive, if known.
+    """
+    entries = _extracted(url, output_path)
+    if entries is not None:
+        return entries, sha256
+
+    with tempfile.TemporaryDirectory(dir=output_path) as tmp, _package(
+        url, archives or pathlib.Path(tmp), sha256
+    ) as archive:
+        entries = _extract_package(archive, output_path, previous)
+        if entries and not sha256:
+            sha256 = file_digest(archive)
+    return entries, sha256
+
+
+def _locked_digest(
+    lock: typing.Optional[Lock], name: str, url: str, sha256: typing.Optional[str]
+) -> typing.Optional[str]:
+    """Determine the expected digest of an archive, the configured or locked one."""
+    if sha256 or lock is None:
+        return sha256
+    return (lock.toolchain(name, url) or {}).get("sha256")
+
+
+def _locked_entries(lock: typing.Optional[Lock], name: str) -> typing.List[str]:
+    """Determine the top level entries a toolchain owns according to the lock file.
+
+    The entries are kept when the configuration of the toolchain changed, so that a
+    new version of the toolchain replaces the files of the previous one. Entries
+    shared with other toolchains, like a `bin` folder, are not owned by either.
+    """
+    if lock is None:
+        return []
+    shared = {
+        x
+        for other, entry in lock.toolchains.items()
+        if other != name
+        for x in entry.get("entries", [])
+    }
+    entries = lock.toolchains.get(name, {}).get("entries", [])
+    return [x for x in entries if x not in shared]
+
+
+def _lock_sharing_toolchains(
+    lock: Lock, toolchains: typing.Collection[str], output_path: pathlib.Path
+) -> None:
+    """Lock the toolchains sharing an entry with the extracted toolchains again.
+
+    Extracting a toolchain into a shared folder changes the tree of the other
+    toolchains using that folder.
+    """
+    changed = {
+        x
+        for name in toolchains
+        for x in lock.toolchains.get(name, {}).get("entries", [])
+    }
+    for name, entry in list(lock.toolchains.items()):
+        if name not in toolchains and changed.intersection(entry["entries"]):
+            extracted = (entry["entries"], entry.get("sha256"))
+            _lock_toolchain(lock, name, entry["url"], extracted, output_path)
+
+
+def _lock_toolchain(
+    lock: Lock,
+    name: str,
+    url: str,
+    extracted: typing.Tuple[typing.List[str], typing.Optional[str]],
+    output_path: pathlib.Path,
+) -> None:
+    entries, sha256 = extracted
+    if not entries:
+        logging.warning("Unable to determine the content of toolchain %s", name)
+        return
+    manifest = tree_manifest(output_path, entries)
+    lock.lock_toolchain(name, url, sha256, entries, manifest)
+    write_manifest(
+        manifest_path(output_path, name),
+        tree_manifest(output_path, entries, local=True),
+        manifest_digest(manifest),
+    )
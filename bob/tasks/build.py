@@ -1,9 +1,12 @@
 """The build task builds the codebase."""
+import contextlib
 import pathlib
 import typing
 
 from bob.api import Command
-from bob.common import generate_container_command
+from bob.common import generate_container_command, generate_session_commands
+from bob.executor import Job
+from bob.jobserver import Jobserver, supports_jobserver
 from bob.typehints import CommandListT, EnvMapT, OptionsMapT
 
 
@@ -27,14 +30,58 @@ def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
         A list of commands, each command is a list of strings which can be
         passed to `subprocess.run`.
 
+    When processing several builds at once, the build tool uses the shared jobserver
+    if it supports it. Otherwise, the jobs are split using `--parallel`. On the host,
+    the compiler cache is configured using environment variables.
+
     Todo:
         - split target and compiler (should be a matrix [target vs compiler])
     """
+    jobserver = _select_jobserver(options, env["root_path"] / env["build_path"])
+
     steps = []
-    steps += generate_container_command(options, env["root_path"])
+    steps += generate_container_command(options, env["root_path"], jobserver)
     steps += _generate_build_project_command(env["build_path"])
 
-    return [steps]
+    variables = {}
+    if "container" not in options:
+        with contextlib.suppress(KeyError):
+            variables.update(options["compiler_cache"].environment())
+
+    if jobserver is None:
+        with contextlib.suppress(KeyError):
+            steps += ["--parallel", str(options["parallel"])]
+    elif "container" not in options:
+        variables["MAKEFLAGS"] = jobserver.makeflags()
+
+    session = generate_session_commands(options, env["root_path"])
+    return [*session, Job(steps, env=variables or None)]
+
+
+def _select_jobserver(
+    options: OptionsMapT, build_path: pathlib.Path
+) -> typing.Optional[Jobserver]:
+    """Determine if the build tool can use the shared jobserver.
+
+    The build tool in a container cannot be inspected, the toolchain has to declare
+    jobserver support. The jobserver is not available in a session container, nor
+    on a remote endpoint.
+    """
+    jobserver = options.get("jobserver")
+    if jobserver is None or jobserver.path is None:
+        return None
+
+    if "container" in options:
+        if not options.get("container_jobserver") or "container_session" in options:
+            return None
+        endpoint = options.get("container_endpoint")
+        if endpoint is not None and endpoint.remote:
+            return None
+        return jobserver
+
+    if supports_jobserver(build_path):
+        return jobserver
+    return None
 
 
 def _generate_build_project_command(output_path: pathlib.Path) -> typing.List[str]:
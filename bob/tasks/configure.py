@@ -1,16 +1,27 @@
 """Module focussing on the `configure` command.
 
-Contains the task and helpers to configure a build.
+Contains the task and helpers to configure a build. The inputs of a successful
+configuration are fingerprinted, the configuration is skipped when they did not
+change since, unless the `reconfigure` option is set.
 """
 import contextlib
+import hashlib
+import json
 import logging
 import pathlib
 import typing
 
 from bob.api import Command
-from bob.common import determine_output_folder, generate_container_command
+from bob.common import (
+    determine_output_folder,
+    generate_container_command,
+    generate_session_commands,
+)
+from bob.executor import Job
 from bob.typehints import CommandListT, EnvMapT, OptionsMapT
 
+FINGERPRINT_FILE = "bob_configure.sha256"
+
 
 def depends_on() -> typing.List[Command]:
     """Generate a list of task names this task depends on.
@@ -59,6 +70,7 @@ def parse_options(options: OptionsMapT, parsed: OptionsMapT) -> None:
         addopts += config.split(" ")
 
     parsed["configure"]["additional_options"] = addopts
+    parsed["configure"]["reconfigure"] = bool(options.get("reconfigure", False))
 
     with contextlib.suppress(KeyError):
         toolchain = options["targets"][target]["toolchain"]
@@ -80,9 +92,7 @@ def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
         A list of commands, each command is a list of strings which can be
         passed to `subprocess.run`.
     """
-    steps = []
-    steps += generate_container_command(options, env["root_path"])
-    steps += _generate_build_system_command(
+    steps = _generate_build_system_command(
         options, env["build_path"], env["source_path"]
     )
 
@@ -92,7 +102,59 @@ def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
     with contextlib.suppress(KeyError):
         steps += options["configure"]["additional_options"]
 
-    return [steps]
+    with contextlib.suppress(KeyError):
+        steps += options["compiler_cache"].launcher_options()
+
+    build_path = env["root_path"] / env["build_path"]
+    fingerprint = _fingerprint(steps, options, env)
+    reconfigure = options.get("configure", {}).get("reconfigure", False)
+    if not reconfigure and _is_configured(build_path, fingerprint):
+        logging.info("Configuration unchanged, skipping configure")
+        return []
+
+    def store() -> None:
+        if (build_path / "CMakeCache.txt").exists():
+            (build_path / FINGERPRINT_FILE).write_text(fingerprint)
+
+    session = generate_session_commands(options, env["root_path"])
+    container = generate_container_command(options, env["root_path"])
+    return [*session, Job([*container, *steps], on_success=store)]
+
+
+def _fingerprint(command: typing.List[str], options: OptionsMapT, env: EnvMapT) -> str:
+    """Fingerprint the inputs of the configuration.
+
+    The CMake command is fingerprinted without the Docker command executing it in a
+    container, which changes with the endpoint and environment of the container.
+    Only the image and, on a remote endpoint, the volume holding the build matter.
+    """
+    toolchain = None
+    with contextlib.suppress(KeyError, OSError):
+        path = env["root_path"] / options["configure"]["toolchain_file"]
+        toolchain = hashlib.sha256(path.read_bytes()).hexdigest()
+
+    volume = None
+    endpoint = options.get("container_endpoint")
+    if "container" in options and endpoint is not None and endpoint.remote:
+        volume = endpoint.volume(env["root_path"], env["build_path"].as_posix())
+
+    inputs = {
+        "command": command,
+        "toolchain_file": toolchain,
+        "container": options.get("container"),
+        "volume": volume,
+    }
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def _is_configured(build_path: pathlib.Path, fingerprint: str) -> bool:
+    if not (build_path / "CMakeCache.txt").exists():
+        return False
+
+    try:
+        return (build_path / FINGERPRINT_FILE).read_text() == fingerprint
+    except FileNotFoundError:
+        return False
 
 
 def _generate_build_system_command(
@@ -6,7 +6,7 @@ import pathlib
 import typing
 
 from bob.api import Command
-from bob.common import generate_container_command
+from bob.common import generate_container_command, generate_session_commands
 from bob.typehints import CommandListT, EnvMapT, OptionsMapT
 
 
@@ -34,7 +34,7 @@ def generate_commands(options: OptionsMapT, env: EnvMapT) -> CommandListT:
     steps += generate_container_command(options, env["root_path"])
     steps += _generare_install_command(env["build_path"])
 
-    return [steps]
+    return [*generate_session_commands(options, env["root_path"]), steps]
 
 
 def _generare_install_command(output_path: pathlib.Path) -> typing.List[str]:
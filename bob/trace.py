@@ -0,0 +1,134 @@
+"""Timeline of an execution in the Chrome trace event format.
+
+The trace holds the phases of bob itself and every executed command, it can be
+viewed using Perfetto or `chrome://tracing`. Commands executing at the same time are
+placed on separate tracks.
+"""
+import contextlib
+import json
+import os
+import pathlib
+import time
+import typing
+
+from bob.executor import Job
+
+EventT = typing.Dict[str, typing.Any]
+
+
+class Tracer:
+    """Records the phases of an execution and the executed jobs."""
+
+    def __init__(self: "Tracer") -> None:
+        """Initialize Tracer."""
+        self._origin = time.perf_counter_ns()
+        self._phases: typing.List[typing.Tuple[str, int, int]] = []
+        self._jobs: typing.List[Job] = []
+
+    @contextlib.contextmanager
+    def phase(self: "Tracer", name: str) -> typing.Iterator[None]:
+        """Record the duration of a phase.
+
+        Args:
+            name: name of the phase.
+
+        Yields:
+            None, the phase lasts until the context is left.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._phases.append((name, start, time.perf_counter_ns()))
+
+    def add_jobs(self: "Tracer", jobs: typing.Iterable[Job]) -> None:
+        """Add jobs to the trace, jobs which did not execute are left out.
+
+        Args:
+            jobs: the jobs to add.
+        """
+        self._jobs += jobs
+
+    @property
+    def elapsed(self: "Tracer") -> float:
+        """Time since the tracer was created, in seconds."""
+        return (time.perf_counter_ns() - self._origin) * 1e-9
+
+    @property
+    def phases(self: "Tracer") -> typing.List[typing.Tuple[str, float]]:
+        """The recorded phases and their duration in seconds."""
+        return [(name, (stop - start) * 1e-9) for name, start, stop in self._phases]
+
+    @property
+    def jobs(self: "Tracer") -> typing.List[Job]:
+        """The executed jobs."""
+        return [x for x in self._jobs if x.started is not None]
+
+    def events(self: "Tracer") -> typing.List[EventT]:
+        """Generate the trace events.
+
+        Returns:
+            A list of trace events.
+        """
+        pid = os.getpid()
+        result = [
+            _metadata(pid, 0, "process_name", "bob"),
+            _metadata(pid, 0, "thread_name", "bob"),
+        ]
+        for name, start, stop in self._phases:
+            result.append(self._complete(pid, 0, name, (start, stop), "phase"))
+
+        executed = [(x.started or 0, x) for x in self.jobs]
+        executed.sort(key=lambda x: x[0])
+        lanes: typing.List[int] = []
+        for start, job in executed:
+            stop = start + int(job.duration * 1e9)
+            lane = next((i for i, x in enumerate(lanes) if x <= start), len(lanes))
+            if lane == len(lanes):
+                lanes.append(stop)
+                track = f"commands {lane + 1}"
+                result.append(_metadata(pid, lane + 1, "thread_name", track))
+            lanes[lane] = stop
+
+            event = self._complete(
+                pid, lane + 1, str(job.name), (start, stop), "command"
+            )
+            event["args"] = {
+                "command": " ".join(job),
+                "returncode": job.returncode,
+                "task": job.task,
+            }
+            result.append(event)
+
+        return result
+
+    def write(self: "Tracer", path: pathlib.Path) -> None:
+        """Write the trace to a file.
+
+        Args:
+            path: the file to write.
+        """
+        trace = {"traceEvents": self.events(), "displayTimeUnit": "ms"}
+        path.write_text(json.dumps(trace, indent=1))
+
+    def _complete(  # pylint: disable=too-many-arguments
+        self: "Tracer",
+        pid: int,
+        tid: int,
+        name: str,
+        span: typing.Tuple[int, int],
+        category: str,
+    ) -> EventT:
+        return {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (span[0] - self._origin) / 1000,
+            "dur": (span[1] - span[0]) / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+
+
+def _metadata(pid: int, tid: int, kind: str, name: str) -> EventT:
+    return {"name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
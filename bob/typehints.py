@@ -4,7 +4,7 @@ import typing
 
 OptionsMapT = typing.MutableMapping[str, typing.Any]
 EnvMapT = typing.MutableMapping[str, pathlib.Path]
-CommandListT = typing.List[typing.List[str]]
+CommandListT = typing.Sequence[typing.List[str]]
 
 
 class BuildTargetT(typing.Protocol):  # pylint: disable=too-few-public-methods
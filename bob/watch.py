@@ -0,0 +1,476 @@
+"""Rebuild a project each time its sources change.
+
+The source tree is watched through inotify and each burst of changes, like saving
+several files or switching branches, is debounced into a single rebuild. A rebuild
+only executes the steps affected by the changes:
+
+- a change to a `bob.toml`, also of a workspace member, executes all steps;
+- a change to a CMake input configures the project again before building it;
+- any other change only builds the project.
+
+A change arriving while the project builds cancels the build, a rebuild which also
+bootstraps or configures the project completes first. Either way, the next rebuild
+includes the steps of the interrupted one. Files ignored by git and the folders bob
+writes to are not watched.
+"""
+import asyncio
+import contextlib
+import ctypes
+import ctypes.util
+import enum
+import hashlib
+import logging
+import os
+import pathlib
+import struct
+import subprocess
+import types
+import typing
+
+from bob.api import Command
+from bob.bob import bob_async
+from bob.typehints import OptionsMapT
+
+# Seconds without changes, before a burst of changes is considered complete.
+DEBOUNCE = 0.2
+
+# Folders and files bob writes to, relative to each folder holding a bob.toml: the
+# root of the project and the members of a workspace.
+IGNORED = ("build", "external", "toolchains", ".git", "bob.lock", "bob.lock.part")
+
+_CONFIG_FILE = "bob.toml"
+_CMAKE_FILES = ("CMakeLists.txt", "CMakePresets.json", "CMakeUserPresets.json")
+_CMAKE_SUFFIX = ".cmake"
+
+# See inotify(7).
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_CHANGES = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+EventT = typing.Tuple[pathlib.Path, int]
+
+
+class Scope(enum.IntEnum):
+    """The steps executed by a rebuild, each scope includes the smaller ones."""
+
+    Build = 1
+    Configure = 2
+    Bootstrap = 3
+
+
+# Options passed to the command, for each scope.
+_SCOPE_OPTIONS: typing.Dict[Scope, OptionsMapT] = {
+    Scope.Build: {"skip_tasks": [Command.Bootstrap, Command.Configure]},
+    Scope.Configure: {"skip_tasks": [Command.Bootstrap], "reconfigure": True},
+    Scope.Bootstrap: {},
+}
+
+
+class Inotify(contextlib.AbstractContextManager):
+    """Watches folders for changes to their content, through inotify.
+
+    Attributes:
+        folders (dict): the watched folder of each watch descriptor.
+    """
+
+    def __init__(self: "Inotify") -> None:
+        """Initialize Inotify.
+
+        Raises:
+            RuntimeError: when inotify is not available.
+        """
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as ex:
+            raise RuntimeError("Watching for changes requires inotify") from ex
+        if fd < 0:
+            raise RuntimeError(
+                f"Unable to initialize inotify: {os.strerror(ctypes.get_errno())}"
+            )
+
+        self._fd = fd
+        self.folders: typing.Dict[int, pathlib.Path] = {}
+
+    def __exit__(
+        self: "Inotify",
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_value: typing.Optional[BaseException],
+        exc_traceback: typing.Optional[types.TracebackType],
+    ) -> typing.Literal[False]:
+        """Stop watching.
+
+        Args:
+            exc_type: optional exception type
+            exc_value: optional exception value
+            exc_traceback: optional exception traceback
+
+        Returns:
+            False, any captured exception will be propagated.
+        """
+        os.close(self._fd)
+        self.folders = {}
+        return False
+
+    def fileno(self: "Inotify") -> int:
+        """Provide the file descriptor, readable once events are available.
+
+        Returns:
+            The file descriptor.
+        """
+        return self._fd
+
+    def add(self: "Inotify", folder: pathlib.Path) -> None:
+        """Watch a folder, not including its subfolders.
+
+        Args:
+            folder: the folder to watch.
+
+        Raises:
+            OSError: when the folder cannot be watched.
+        """
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(folder), _IN_CHANGES | _IN_ONLYDIR
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(folder))
+        self.folders[wd] = folder
+
+    def read(self: "Inotify") -> typing.List[EventT]:
+        """Read the available events, without blocking.
+
+        Returns:
+            The path and mask of each event.
+        """
+        events: typing.List[EventT] = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, size = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset : offset + size].rstrip(b"\0"))
+                offset += size
+                if mask & _IN_IGNORED:
+                    self.folders.pop(wd, None)
+                elif mask & _IN_Q_OVERFLOW:
+                    events.append((pathlib.Path(), mask))
+                elif wd in self.folders:
+                    events.append((self.folders[wd] / name, mask))
+
+
+class SourceTree:
+    """The watched source tree of a project.
+
+    The digest of each CMake input is kept, rewriting a file with the same content,
+    like the bootstrap does, is not a change. The folders bob writes to are ignored
+    next to each `bob.toml` found, like in the members of a workspace.
+
+    Attributes:
+        root (pathlib.Path): root folder of the project.
+    """
+
+    def __init__(
+        self: "SourceTree",
+        root: pathlib.Path,
+        inotify: Inotify,
+        ignored: typing.Iterable[pathlib.Path] = (),
+    ) -> None:
+        """Initialize SourceTree.
+
+        Args:
+            root: root folder of the project.
+            inotify: watches the folders of the tree.
+            ignored: additional files and folders not to watch.
+        """
+        self.root = root
+        self._inotify = inotify
+        self._ignored = {root / x for x in IGNORED} | {root / x for x in ignored}
+        self._digests: typing.Dict[pathlib.Path, typing.Optional[str]] = {}
+
+    def add(self: "SourceTree", folder: pathlib.Path) -> typing.List[pathlib.Path]:
+        """Watch a folder and its subfolders, except for the ignored ones.
+
+        Args:
+            folder: the folder to watch.
+
+        Returns:
+            The files found in the folders.
+        """
+        files = []
+        level = [folder]
+        while level:
+            folders = []
+            for path in level:
+                with contextlib.suppress(FileNotFoundError, NotADirectoryError):
+                    self._inotify.add(path)
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                folders.append(pathlib.Path(entry.path))
+                            else:
+                                files.append(pathlib.Path(entry.path))
+                            if entry.name == _CONFIG_FILE:
+                                self._ignored |= {path / x for x in IGNORED}
+            level = self._keep(folders, folders=True)
+
+        files = self._keep(files)
+        for path in files:
+            if self._is_input(path):
+                self._digests[path] = _digest(path)
+        return files
+
+    def changes(
+        self: "SourceTree", events: typing.Sequence[EventT]
+    ) -> typing.Optional[Scope]:
+        """Determine the scope of a rebuild for a series of events.
+
+        New folders are watched, their files are considered changed.
+
+        Args:
+            events: the events read from inotify.
+
+        Returns:
+            The scope of the rebuild, None when nothing relevant changed.
+        """
+        if any(mask & _IN_Q_OVERFLOW for _, mask in events):
+            logging.warning("Missed changes to the sources, configuring again")
+            return Scope.Configure
+
+        folders = {x: mask for x, mask in events if mask & _IN_ISDIR}
+        files = {x for x, mask in events if not mask & _IN_ISDIR}
+        scopes: typing.List[typing.Optional[Scope]] = []
+        for folder in self._keep(list(folders), folders=True):
+            if folders[folder] & (_IN_CREATE | _IN_MOVED_TO):
+                scopes.append(self._added(folder))
+            else:
+                scopes.append(self._removed(folder))
+
+        scopes += [self._changed(x) for x in self._keep(list(files))]
+        return max((x for x in scopes if x is not None), default=None)
+
+    def _is_input(self: "SourceTree", path: pathlib.Path) -> bool:
+        return (
+            path.name == _CONFIG_FILE
+            or path.name in _CMAKE_FILES
+            or path.suffix == _CMAKE_SUFFIX
+        )
+
+    def _changed(self: "SourceTree", path: pathlib.Path) -> typing.Optional[Scope]:
+        if not self._is_input(path):
+            return Scope.Build
+
+        digest = _digest(path)
+        if self._digests.get(path) == digest:
+            return None
+        self._digests[path] = digest
+        if path.name == _CONFIG_FILE:
+            self._ignored |= {path.parent / x for x in IGNORED}
+            return Scope.Bootstrap
+        return Scope.Configure
+
+    def _added(self: "SourceTree", folder: pathlib.Path) -> typing.Optional[Scope]:
+        files = self.add(folder)
+        if any(self._is_input(x) for x in files):
+            return Scope.Configure
+        return Scope.Build if files else None
+
+    def _removed(self: "SourceTree", folder: pathlib.Path) -> Scope:
+        inputs = [x for x in self._digests if folder in x.parents]
+        for path in inputs:
+            del self._digests[path]
+        return Scope.Configure if inputs else Scope.Build
+
+    def _keep(
+        self: "SourceTree", paths: typing.List[pathlib.Path], *, folders: bool = False
+    ) -> typing.List[pathlib.Path]:
+        """Remove the ignored paths."""
+        paths = [
+            x
+            for x in paths
+            if x.name != ".git" and not self._ignored.intersection([x, *x.parents])
+        ]
+        ignored = _git_ignored(self.root, paths, folders=folders)
+        return [x for x in paths if x not in ignored]
+
+
+async def watch(
+    command: Command,
+    load_options: typing.Callable[[], OptionsMapT],
+    root: typing.Optional[pathlib.Path] = None,
+) -> None:
+    """Execute a command each time the sources of a project change, until cancelled.
+
+    The command is executed once up front.
+
+    Args:
+        command: the command to execute.
+        load_options: provides the options of each rebuild, a change to `bob.toml`
+            is taken into account.
+        root: the root folder of the project, defaults to the working directory.
+
+    Raises:
+        RuntimeError: when inotify is not available.
+    """
+    root = pathlib.Path.cwd() if root is None else root
+    loop = asyncio.get_running_loop()
+    events: typing.List[EventT] = []
+    arrived = asyncio.Event()
+
+    with Inotify() as inotify:
+        tree = SourceTree(root, inotify, _outputs(load_options()))
+        tree.add(root)
+        logging.info("Watching %d folders for changes", len(inotify.folders))
+
+        def read() -> None:
+            events.extend(inotify.read())
+            arrived.set()
+
+        loop.add_reader(inotify.fileno(), read)
+        rebuilds = _Rebuilds(command, load_options, root)
+        try:
+            while True:
+                await arrived.wait()
+                await _settle(arrived)
+                scope = tree.changes(events)
+                events.clear()
+                if scope is not None:
+                    rebuilds.request(scope)
+        finally:
+            loop.remove_reader(inotify.fileno())
+            await rebuilds.close()
+
+
+class _Rebuilds:
+    """Executes the requested rebuilds, one at a time."""
+
+    def __init__(
+        self: "_Rebuilds",
+        command: Command,
+        load_options: typing.Callable[[], OptionsMapT],
+        root: pathlib.Path,
+    ) -> None:
+        self._command = command
+        self._load_options = load_options
+        self._root = root
+        self._pending: typing.Optional[Scope] = Scope.Bootstrap
+        self._requested = asyncio.Event()
+        self._requested.set()
+        self._running: typing.Optional[typing.Tuple[asyncio.Future, Scope]] = None
+        self._task = asyncio.ensure_future(self._execute())
+
+    def request(self: "_Rebuilds", scope: Scope) -> None:
+        """Request a rebuild, a running build is cancelled."""
+        self._pending = max(scope, self._pending or scope)
+        self._requested.set()
+        if self._running is not None and self._running[1] == Scope.Build:
+            logging.info("Sources changed, cancelling the running build")
+            self._running[0].cancel()
+
+    async def close(self: "_Rebuilds") -> None:
+        """Cancel the running rebuild."""
+        self._task.cancel()
+        await asyncio.wait([self._task])
+
+    async def _execute(self: "_Rebuilds") -> None:
+        # The scope of a failed rebuild is included in the next one.
+        failed = Scope.Build
+        while True:
+            await self._requested.wait()
+            self._requested.clear()
+            if self._pending is None:
+                continue
+
+            scope = max(self._pending, failed)
+            self._pending = None
+            rebuild = asyncio.ensure_future(self._rebuild(scope))
+            self._running = (rebuild, scope)
+            try:
+                await asyncio.wait([rebuild])
+            finally:
+                self._running = None
+                if not rebuild.done():
+                    rebuild.cancel()
+                    await asyncio.wait([rebuild])
+
+            if rebuild.cancelled():
+                self._pending = max(scope, self._pending or scope)
+            elif rebuild.result():
+                failed = Scope.Build
+            else:
+                failed = scope
+
+    async def _rebuild(self: "_Rebuilds", scope: Scope) -> bool:
+        logging.info("Rebuilding, starting from: %s", scope.name.lower())
+        try:
+            options = {**self._load_options(), **_SCOPE_OPTIONS[scope]}
+            await bob_async(self._command, options, root=self._root)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Any failure, like a missing tool, must not end the watch.
+            logging.exception("Rebuild failed, watching for changes")
+            return False
+        logging.info("Rebuild succeeded, watching for changes")
+        return True
+
+
+async def _settle(arrived: asyncio.Event) -> None:
+    """Wait until no events arrived for `DEBOUNCE` seconds."""
+    while arrived.is_set():
+        arrived.clear()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(arrived.wait(), DEBOUNCE)
+
+
+def _outputs(options: OptionsMapT) -> typing.List[pathlib.Path]:
+    """Determine the files and folders written by a command, besides the build."""
+    result = []
+    with contextlib.suppress(KeyError):
+        result.append(pathlib.Path(options["trace_file"]))
+    with contextlib.suppress(KeyError):
+        result.append(
+            pathlib.Path(options.get("log_dir") or options["output"]["log_dir"])
+        )
+    return result
+
+
+def _digest(path: pathlib.Path) -> typing.Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def _git_ignored(
+    root: pathlib.Path, paths: typing.Sequence[pathlib.Path], *, folders: bool
+) -> typing.Set[pathlib.Path]:
+    """Determine which paths are ignored by git, nothing is when not in a repository."""
+    if not paths:
+        return set()
+
+    suffix = "/" if folders else ""
+    names = [f"{os.path.relpath(x, root)}{suffix}" for x in paths]
+    try:
+        result = subprocess.run(
+            ["git", "check-ignore", "-z", "--stdin"],  # noqa: S607
+            cwd=root,
+            input="\0".join(names),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except FileNotFoundError:
+        return set()
+    return {root / x.rstrip("/") for x in result.stdout.split("\0") if x}
@@ -0,0 +1,283 @@
+"""Workspaces of several projects, processed together.
+
+A workspace is declared in the `bob.toml` of its root folder, listing the folders of
+its members as glob patterns:
+
+    [workspace]
+    members = ["libs/*", "app"]
+
+Each member is a project with its own `bob.toml`. A member is named after its
+folder, unless it sets a `name` in its own `[workspace]` section. There it also
+lists the members it depends on:
+
+    [workspace]
+    depends = ["core"]
+
+The other options of the root are the defaults of each member. A member is
+configured once the members it depends on are built, independent members are
+processed at the same time. An external dependency used by several members, with
+the same configuration, is retrieved once into the root and linked into each member.
+"""
+import collections
+import collections.abc
+import contextlib
+import copy
+import os
+import pathlib
+import typing
+
+import toml
+
+from bob.executor import Job
+from bob.typehints import OptionsMapT
+
+CONFIG_FILE = "bob.toml"
+
+# Prefix of the jobs processing the root of the workspace.
+ROOT_PREFIX = "workspace/"
+
+
+class Member(typing.NamedTuple):
+    """A project in a workspace.
+
+    Attributes:
+        name: unique name of the member.
+        path: root folder of the member.
+        depends: names of the members it depends on.
+        options: the options of the member, including the defaults of the root.
+    """
+
+    name: str
+    path: pathlib.Path
+    depends: typing.List[str]
+    options: OptionsMapT
+
+
+def is_workspace(options: OptionsMapT) -> bool:
+    """Determine if the options declare a workspace.
+
+    Args:
+        options: the options of the root.
+
+    Returns:
+        True when the options list the members of a workspace.
+    """
+    return bool(options.get("workspace", {}).get("members"))
+
+
+def discover(root: pathlib.Path, options: OptionsMapT) -> typing.List[Member]:
+    """Find the members of a workspace.
+
+    Args:
+        root: root folder of the workspace.
+        options: the options of the root.
+
+    Returns:
+        The members, each member follows the members it depends on.
+
+    Raises:
+        ValueError: when a member is invalid, or the members depend on each other.
+    """
+    patterns = options["workspace"]["members"]
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    defaults = {k: v for k, v in options.items() if k != "workspace"}
+
+    members: typing.Dict[str, Member] = {}
+    for pattern in patterns:
+        folders = [x for x in sorted(root.glob(pattern)) if (x / CONFIG_FILE).is_file()]
+        if not folders:
+            raise ValueError(f"No workspace members match: {pattern}")
+
+        for folder in folders:
+            if any(x.path == folder for x in members.values()):
+                continue
+            try:
+                config = toml.load(folder / CONFIG_FILE)
+            except toml.TomlDecodeError as ex:
+                raise ValueError(
+                    f"Invalid configuration: {folder / CONFIG_FILE}"
+                ) from ex
+
+            settings = config.pop("workspace", {})
+            name = str(settings.get("name", folder.name))
+            if f"{name}/" == ROOT_PREFIX:
+                raise ValueError(f"Reserved workspace member name: {name}")
+            if name in members:
+                raise ValueError(f"Duplicate workspace member: {name}")
+            members[name] = Member(
+                name,
+                folder,
+                [str(x) for x in settings.get("depends", [])],
+                _resolve(folder, _merge(defaults, config)),
+            )
+
+    return _sort(members)
+
+
+def width(members: typing.Sequence[Member]) -> int:
+    """Determine how many members can be processed at once.
+
+    Args:
+        members: the members, each member follows the members it depends on.
+
+    Returns:
+        The largest number of members not depending on each other.
+    """
+    levels: typing.Dict[str, int] = {}
+    for member in members:
+        levels[member.name] = 1 + max((levels[x] for x in member.depends), default=0)
+    return max(collections.Counter(levels.values()).values(), default=1)
+
+
+def share_dependencies(
+    members: typing.Sequence[Member],
+) -> typing.Dict[str, OptionsMapT]:
+    """Find the external dependencies shared by the members.
+
+    Args:
+        members: the members of the workspace.
+
+    Returns:
+        The configuration of each dependency used by several members, all of them
+        configuring it the same way.
+    """
+    found: typing.Dict[str, typing.List[OptionsMapT]] = {}
+    for member in members:
+        for name, config in _dependencies(member.options).items():
+            found.setdefault(name, []).append(config)
+
+    return {
+        name: configs[0]
+        for name, configs in found.items()
+        if len(configs) > 1 and all(x == configs[0] for x in configs)
+    }
+
+
+def shared_options(
+    root: pathlib.Path, options: OptionsMapT, shared: typing.Mapping[str, OptionsMapT]
+) -> OptionsMapT:
+    """Determine the options retrieving the shared dependencies into the root.
+
+    Args:
+        root: root folder of the workspace.
+        options: the options of the root.
+        shared: the shared dependencies.
+
+    Returns:
+        The options of the root, without any toolchains or dependencies of its own.
+    """
+    result = {k: v for k, v in options.items() if k not in ("workspace", "toolchains")}
+    settings = {
+        k: v
+        for k, v in options.get("dependencies", {}).items()
+        if not isinstance(v, collections.abc.Mapping)
+    }
+    result["dependencies"] = {**settings, **shared}
+    return _resolve(root, result)
+
+
+def link_dependencies(
+    member: Member,
+    shared: typing.Mapping[str, OptionsMapT],
+    folder: pathlib.Path,
+) -> typing.Tuple[OptionsMapT, typing.List[Job]]:
+    """Use the shared dependencies in a member, instead of its own checkouts.
+
+    A member keeps its own checkout of a dependency, when the checkout exists.
+
+    Args:
+        member: the member of the workspace.
+        shared: the shared dependencies.
+        folder: the folder holding the shared dependencies.
+
+    Returns:
+        The options of the member without the shared dependencies, and the jobs
+        linking them into the member.
+    """
+    options = copy.deepcopy(member.options)
+    target = dependencies_folder(member.path, options)
+    jobs = []
+    for name in sorted(set(shared).intersection(_dependencies(options))):
+        link = target / name
+        if link.exists() and not link.is_symlink():
+            continue
+
+        del options["dependencies"][name]
+        with contextlib.suppress(OSError):
+            if pathlib.Path(os.readlink(link)) == folder / name:
+                continue
+        jobs += [
+            Job(["cmake", "-E", "make_directory", str(target)]),
+            Job(["cmake", "-E", "create_symlink", str(folder / name), str(link)]),
+        ]
+    return options, jobs
+
+
+def dependencies_folder(root: pathlib.Path, options: OptionsMapT) -> pathlib.Path:
+    """Determine the folder holding the external dependencies of a project.
+
+    Args:
+        root: root folder of the project.
+        options: the options of the project.
+
+    Returns:
+        Path to the folder.
+    """
+    try:
+        return root / options["dependencies"]["folder"]
+    except (KeyError, TypeError):
+        return root / "external"
+
+
+def _dependencies(options: OptionsMapT) -> typing.Dict[str, OptionsMapT]:
+    return {
+        k: typing.cast("OptionsMapT", v)
+        for k, v in options.get("dependencies", {}).items()
+        if isinstance(v, collections.abc.Mapping)
+    }
+
+
+def _merge(defaults: OptionsMapT, options: OptionsMapT) -> OptionsMapT:
+    """Merge the options of a member into the defaults, section by section."""
+    result = copy.deepcopy(defaults)
+    for key, value in options.items():
+        if isinstance(value, collections.abc.Mapping) and isinstance(
+            result.get(key), collections.abc.Mapping
+        ):
+            result[key] = _merge(result[key], typing.cast("OptionsMapT", value))
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def _resolve(root: pathlib.Path, options: OptionsMapT) -> OptionsMapT:
+    """Resolve the folders in the options against the root of the project."""
+    for section in ("dependencies", "toolchains"):
+        with contextlib.suppress(KeyError, TypeError):
+            options[section]["folder"] = str(root / options[section]["folder"])
+    return options
+
+
+def _sort(members: typing.Mapping[str, Member]) -> typing.List[Member]:
+    """Order the members, each member follows the members it depends on."""
+    for member in members.values():
+        unknown = [x for x in member.depends if x not in members]
+        if unknown:
+            raise ValueError(
+                f"Workspace member {member.name} depends on unknown members: {unknown}"
+            )
+
+    result: typing.List[Member] = []
+    remaining = dict(members)
+    while remaining:
+        done = {x.name for x in result}
+        ready = [x for x in remaining.values() if done.issuperset(x.depends)]
+        if not ready:
+            raise ValueError(
+                f"Workspace members depend on each other: {sorted(remaining)}"
+            )
+        for member in ready:
+            del remaining[member.name]
+        result += ready
+    return result
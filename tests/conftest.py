@@ -0,0 +1,32 @@
+"""Shared fixtures."""
+import pathlib
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_path(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    """Fixture isolating the user-wide cache for each test."""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("BOB_CACHE_DIR", str(path))
+
+    return path
+
+
+@pytest.fixture(autouse=True)
+def no_compiler_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Fixture ignoring the compiler caches installed on the host."""
+    monkeypatch.setattr("bob.compiler_cache.detect_compiler_cache", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def no_daemon(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    """Fixture isolating the daemon socket for each test, no daemon is running."""
+    path = tmp_path_factory.mktemp("daemon") / "bob.sock"
+    monkeypatch.setenv("BOB_DAEMON_SOCKET", str(path))
+
+    return path
@@ -0,0 +1,151 @@
+"""Tests for selecting what the changes since a revision affect."""
+import pathlib
+import subprocess
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.affected import changed_files, select_combinations, select_members
+from bob.workspace import Member
+
+
+def _git(root: pathlib.Path, *args: str) -> None:
+    git = ["git", "-c", "user.name=bob", "-c", "user.email=bob@example.com", *args]
+    subprocess.run(git, cwd=root, check=True, capture_output=True)
+
+
+def _repository(root: pathlib.Path, files: dict) -> None:
+    _git(root, "init", "-q", "-b", "main")
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content)
+    _git(root, "add", ".")
+    _git(root, "commit", "-q", "-m", "initial")
+
+
+def test_changed_files(tmp_path: pathlib.Path) -> None:
+    """Verify committed, uncommitted and untracked changes are found."""
+    # 1. Prepare
+    _repository(
+        tmp_path,
+        {".gitignore": "*.o\n", "a.c": "a", "b.c": "b", "old.c": "old", "c.c": "c"},
+    )
+    _git(tmp_path, "checkout", "-q", "-b", "feature")
+    (tmp_path / "a.c").write_text("changed")
+    _git(tmp_path, "mv", "old.c", "new.c")
+    _git(tmp_path, "commit", "-q", "-am", "change")
+    _git(tmp_path, "checkout", "-q", "main")
+    (tmp_path / "c.c").write_text("main")
+    _git(tmp_path, "commit", "-q", "-am", "main")
+    _git(tmp_path, "checkout", "-q", "feature")
+    (tmp_path / "b.c").write_text("uncommitted")
+    (tmp_path / "d.c").write_text("untracked")
+    (tmp_path / "d.o").write_text("ignored")
+
+    # 2. Execute
+    result = changed_files(tmp_path, "main")
+
+    # 3. Verify
+    names = ["a.c", "b.c", "d.c", "new.c", "old.c"]
+    assert result == [tmp_path / x for x in names]
+    assert changed_files(tmp_path, "HEAD") == [tmp_path / "b.c", tmp_path / "d.c"]
+    with pytest.raises(ValueError, match="Unable to determine"):
+        changed_files(tmp_path, "missing")
+
+
+def test_select_members(tmp_path: pathlib.Path) -> None:
+    """Verify the members holding a change and their dependents are selected."""
+    # 1. Prepare
+    members = [
+        Member("core", tmp_path / "core", [], {}),
+        Member("util", tmp_path / "util", [], {}),
+        Member("net", tmp_path / "net", ["core"], {}),
+        Member("app", tmp_path / "app", ["net", "util"], {}),
+    ]
+
+    # 2. Execute
+    result = [
+        select_members(members, [tmp_path / "core" / "a.c"]),
+        select_members(members, [tmp_path / "util" / "a.c", tmp_path / "app" / "b"]),
+        select_members(members, []),
+        select_members(members, [tmp_path / "core" / "a.c", tmp_path / "README"]),
+    ]
+
+    # 3. Verify
+    assert [[x.name for x in names] for names in result] == [
+        ["core", "net", "app"],
+        ["util", "app"],
+        [],
+        ["core", "util", "net", "app"],
+    ]
+
+
+def test_select_combinations(tmp_path: pathlib.Path) -> None:
+    """Verify a change to the toolchain file of a target only affects that target."""
+    # 1. Prepare
+    _repository(tmp_path, {"main.c": "", "cmake/arm.cmake": "", "cmake/x86.cmake": ""})
+    options = {
+        "targets": {"stm32": {"toolchain": "arm"}, "linux": {"toolchain": "x86"}},
+        "toolchains": {
+            "arm": {"toolchain_file": "cmake/arm.cmake"},
+            "x86": {"toolchain_file": "cmake/x86.cmake"},
+        },
+    }
+    matrix = [
+        {**options, "target": target, "config": config}
+        for target in ["native", "stm32", "linux"]
+        for config in ["debug", "release"]
+    ]
+
+    # 2. Execute
+    result = [select_combinations(tmp_path, matrix, "HEAD")]
+    (tmp_path / "cmake" / "arm.cmake").write_text("# changed")
+    result.append(select_combinations(tmp_path, matrix, "HEAD"))
+    (tmp_path / "main.c").write_text("int main(void);")
+    result.append(select_combinations(tmp_path, matrix, "HEAD"))
+
+    # 3. Verify
+    assert [len(x) for x in result] == [0, 2, 6]
+    assert [x["target"] for x in result[1]] == ["stm32", "stm32"]
+
+
+def test_bob_affected(
+    mocker: pytest_mock.MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+) -> None:
+    """Verify only the affected workspace members are built."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    execute = mocker.patch("bob.executor.execute")
+    monkeypatch.chdir(tmp_path)
+    _repository(
+        tmp_path,
+        {
+            ".gitignore": "build/\ncmake/\n",
+            "core/bob.toml": "",
+            "core/main.c": "",
+            "app/bob.toml": '[workspace]\ndepends = ["core"]\n',
+            "tool/bob.toml": "",
+            "tool/main.c": "",
+        },
+    )
+    workspace = {"workspace": {"members": ["*"]}, "history": {"enabled": False}}
+    project = {"history": {"enabled": False}}
+    names = []
+
+    # 2. Execute
+    bob.bob(bob.Command.Build, {**workspace, "affected": "HEAD"})
+    names.append({str(x.name).split("/")[0] for x in execute.call_args.args[0]})
+    (tmp_path / "core" / "main.c").write_text("int main(void);")
+    bob.bob(bob.Command.Build, {**workspace, "affected": "HEAD"})
+    names.append({str(x.name).split("/")[0] for x in execute.call_args.args[0]})
+    bob.bob(bob.Command.Build, {**project, "affected": "HEAD"})
+    names.append({str(x.name).split(":")[0] for x in execute.call_args.args[0]})
+    monkeypatch.chdir(tmp_path / "tool")
+    bob.bob(bob.Command.Build, {**project, "affected": "HEAD"})
+    names.append({str(x.name).split(":")[0] for x in execute.call_args.args[0]})
+
+    # 3. Verify
+    assert names == [set(), {"core", "app"}, {"bob", "configure", "build"}, set()]
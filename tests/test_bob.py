@@ -1,10 +1,19 @@
 """Test the basic flow for each command."""
 
+import asyncio
+import pathlib
+import sqlite3
 import subprocess
+import threading
+import time
+import typing
 
+import pytest
 import pytest_mock
 
 import bob
+from bob.executor import ExecutionTimer
+from bob.history import history_path
 
 
 def test_bob_configure(mocker: pytest_mock.MockerFixture) -> None:
@@ -95,3 +104,283 @@ def test_bob_invalid_toolchain_url(mocker: pytest_mock.MockerFixture) -> None:
 
     # 3. Verify
     subprocess.run.assert_not_called()
+
+
+def test_bob_jobs(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify the number of jobs is passed to the executor."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    execute = mocker.patch("bob.executor.execute")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    cmd = bob.Command.Configure
+    options = {"target": "native", "jobs": "3"}
+
+    # 2. Execute
+    bob.bob(cmd, options)
+
+    # 3. Verify
+    nof_jobs = 3
+    assert execute.call_args.args[1] == nof_jobs
+
+
+@pytest.mark.parametrize("jobs", ["0", "many"])
+def test_bob_invalid_jobs(mocker: pytest_mock.MockerFixture, jobs: str) -> None:
+    """Verify an invalid number of jobs is rejected."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    cmd = bob.Command.Configure
+    options = {"target": "native", "jobs": jobs}
+
+    # 2. Execute
+    with pytest.raises(ValueError, match="Invalid number of jobs"):
+        bob.bob(cmd, options)
+
+    # 3. Verify
+    subprocess.run.assert_not_called()
+
+
+def test_bob_tool_versions_cached(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify the tool versions are only probed when a tool changes."""
+    # 1. Prepare
+    tools = {}
+    for name in ["cmake", "git"]:
+        tools[name] = tmp_path / name
+        tools[name].write_text(name)
+    mocker.patch("shutil.which", side_effect=lambda x: str(tools[x]))
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    cmd = bob.Command.Configure
+    options = {"target": "native"}
+
+    # 2. Execute
+    bob.bob(cmd, options)
+    bob.bob(cmd, options)
+    probes_before_update = subprocess.check_output.call_count
+    tools["git"].write_text("updated git")
+    bob.bob(cmd, options)
+
+    # 3. Verify
+    assert probes_before_update == 2  # noqa: PLR2004
+    assert subprocess.check_output.call_args_list[-1] == mocker.call(
+        ["git", "--version"], text=True
+    )
+    assert subprocess.check_output.call_count == 3  # noqa: PLR2004
+
+
+def test_bob_tool_versions_invalid_cache(
+    mocker: pytest_mock.MockerFixture, cache_path: pathlib.Path
+) -> None:
+    """Verify an unreadable cache falls back to probing the tools."""
+    # 1. Prepare
+    cache_path.mkdir(parents=True, exist_ok=True)
+    (cache_path / "tools.json").write_text("[")
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    # 2. Execute
+    bob.bob(bob.Command.Configure, {"target": "native"})
+
+    # 3. Verify
+    assert subprocess.check_output.call_count == 2  # noqa: PLR2004
+
+
+def test_bob_matrix(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify each combination of target and config is configured and built."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    cmd = bob.Command.Build
+    options = {
+        "target": "native,linux",
+        "configs": "debug,release",
+        "jobs": "4",
+        "targets": {"linux": {}},
+    }
+
+    # 2. Execute
+    bob.bob(cmd, options)
+
+    # 3. Verify
+    commands = [x.args[0] for x in subprocess.run.call_args_list]
+    assert [x[2] for x in commands if x[1] == "-E"].count("make_directory") == 1
+    folders = ["native-debug", "native-release", "linux-debug", "linux-release"]
+    for folder in folders:
+        assert ["cmake", "--build", f"build/{folder}", "--parallel", "1"] in commands
+        assert any(x[:3] == ["cmake", "-B", f"build/{folder}"] for x in commands)
+
+
+def test_bob_matrix_all(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify all targets are configured in all configs."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    execute = mocker.patch("bob.executor.execute")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    cmd = bob.Command.Configure
+    options = {"all": True, "jobs": "2", "targets": {"stm32": {}}}
+
+    # 2. Execute
+    bob.bob(cmd, options)
+
+    # 3. Verify
+    names = [x.name for x in execute.call_args.args[0]]
+    assert names[:2] == ["bob:cmake", "bob:find"]
+    assert names[2:] == [
+        "native-release:configure:0",
+        "native-debug:configure:0",
+        "stm32-release:configure:0",
+        "stm32-debug:configure:0",
+    ]
+    assert all(
+        x.needs == ["bob:cmake", "bob:find"] for x in execute.call_args.args[0][2:]
+    )
+
+
+def test_bob_matrix_invalid_configs(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify invalid build configs are rejected before executing commands."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    # 2. Execute
+    with pytest.raises(ValueError, match="Invalid build configs"):
+        bob.bob(bob.Command.Build, {"configs": "debug,fast"})
+
+    # 3. Verify
+    subprocess.run.assert_not_called()
+
+
+def test_bob_async(
+    mocker: pytest_mock.MockerFixture, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    """Verify several invocations execute at once, each in its own project."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    executed: typing.Dict[pathlib.Path, typing.List[str]] = {}
+
+    async def execute(
+        jobs: typing.List[typing.List[str]],
+        *_: object,
+        cwd: pathlib.Path,
+        timeout: float,
+    ) -> None:
+        await asyncio.sleep(0.1)
+        executed[cwd] = [" ".join(x) for x in jobs]
+        assert timeout == 60  # noqa: PLR2004
+
+    mocker.patch("bob.executor.execute_async", side_effect=execute)
+    roots = [tmp_path_factory.mktemp("one"), tmp_path_factory.mktemp("two")]
+    options = {"target": "native", "config": "debug", "trace_file": "trace.json"}
+
+    async def run() -> None:
+        await asyncio.gather(
+            *[
+                bob.bob_async(bob.Command.Configure, options, root=x, timeout=60)
+                for x in roots
+            ]
+        )
+
+    # 2. Execute
+    asyncio.run(run())
+
+    # 3. Verify
+    assert set(executed) == set(roots)
+    for root in roots:
+        assert (root / "cmake").is_dir()
+        assert executed[root][-1].startswith("cmake -B build/native-debug")
+        assert (root / "trace.json").is_file()
+
+
+def test_bob_async_cancelled(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify a cancelled invocation is recorded as failed."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    started = asyncio.Event()
+
+    async def execute(*_: object, **__: object) -> None:
+        started.set()
+        await asyncio.sleep(60)
+
+    mocker.patch("bob.executor.execute_async", side_effect=execute)
+
+    async def run() -> None:
+        task = asyncio.ensure_future(
+            bob.bob_async(bob.Command.Configure, {}, root=tmp_path)
+        )
+        await started.wait()
+        task.cancel()
+        await task
+
+    # 2. Execute
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+
+    # 3. Verify
+    with sqlite3.connect(history_path()) as db:
+        runs = db.execute("SELECT project, status FROM runs").fetchall()
+    assert runs == [(str(tmp_path), 1)]
+
+
+def test_bob_async_cancelled_download(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify cancelling an invocation stops downloading the toolchains."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    started = threading.Event()
+    blocks: typing.List[int] = []
+
+    def retrieve(
+        _: str, __: pathlib.Path, reporthook: typing.Callable[..., None]
+    ) -> None:
+        started.set()
+        for block in range(600):
+            time.sleep(0.1)
+            reporthook(block, 1024, -1)
+            blocks.append(block)
+
+    mocker.patch("urllib.request.urlretrieve", side_effect=retrieve)
+    url = "https://example.com/gcc.tar.gz"
+    options = {"toolchains": {"gcc": {"linux": url}}}
+
+    async def run() -> None:
+        task = asyncio.ensure_future(
+            bob.bob_async(bob.Command.Configure, options, root=tmp_path)
+        )
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        await task
+
+    # 2. Execute
+    with ExecutionTimer() as timer, pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+
+    # 3. Verify
+    assert timer.duration < 10  # noqa: PLR2004
+    count = len(blocks)
+    time.sleep(0.3)
+    assert len(blocks) == count
+    with sqlite3.connect(history_path()) as db:
+        runs = db.execute("SELECT project, status FROM runs").fetchall()
+    assert runs == [(str(tmp_path), 1)]
@@ -1,16 +1,92 @@
 """Tests specifically for the bootstrap command."""
+import functools
+import hashlib
+import http.server
 import os
 import pathlib
+import platform
 import shutil
+import subprocess
+import tarfile
+import threading
+import typing
 import urllib.request
+import zipfile
 
 import pytest
 import pytest_mock
 
 import bob
+from bob.cache import mirror_path
+from bob.executor import execute, link
+from bob.lock import LOCK_FILE, LockError, manifest_path
 from bob.tasks.bootstrap import depends_on, generate_commands, parse_env, parse_options
 
 
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self: "_QuietHandler", *_: typing.Any) -> None:  # noqa: ANN401
+        pass
+
+
+@pytest.fixture()
+def git_remote(tmp_path_factory: pytest.TempPathFactory) -> pathlib.Path:
+    """Fixture for a local bare repository with a tagged commit."""
+    root = tmp_path_factory.mktemp("remote")
+    work = root / "work"
+    work.mkdir()
+    (work / "README").write_text("v1")
+
+    def git(*args: str) -> None:
+        identity = ["-c", "user.name=bob", "-c", "user.email=bob@example.com"]
+        subprocess.run(
+            ["git", *identity, *args],  # noqa: S607
+            cwd=work,
+            check=True,
+            capture_output=True,
+        )
+
+    git("init")
+    git("add", "README")
+    git("commit", "-m", "initial")
+    for folder in ["a", "b"]:
+        (work / "lib" / folder).mkdir(parents=True)
+        (work / "lib" / folder / "file").write_text(folder)
+    git("add", "lib")
+    git("commit", "-m", "v1")
+    git("tag", "v1")
+    (work / "README").write_text("v2")
+    git("commit", "-am", "v2")
+    git("clone", "--bare", str(work), str(root / "remote.git"))
+
+    return root / "remote.git"
+
+
+@pytest.fixture()
+def archive_server(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> typing.Iterator[typing.Tuple[str, pathlib.Path]]:
+    """Fixture for a local HTTP server serving toolchain archives."""
+    root = tmp_path_factory.mktemp("server")
+    for name in ["tool-a", "tool-b"]:
+        content = root / name / "bin"
+        content.mkdir(parents=True)
+        (content / "cc").write_text(name)
+        with tarfile.open(root / f"{name}.tar.gz", "w:gz") as tar:
+            tar.add(root / name, arcname=name)
+    with zipfile.ZipFile(root / "tool-c.zip", "w") as archive:
+        archive.writestr("tool-c/bin/cc", "tool-c")
+
+    handler = functools.partial(_QuietHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}", root
+
+    server.shutdown()
+    server.server_close()
+
+
 def test_dependency() -> None:
     """Verify bootstraps's dependecies."""
     result = depends_on()
@@ -147,6 +223,38 @@ def test_bootstrap_external_git_repo_already_present(tmp_path: pathlib.Path) ->
     ]
 
 
+def test_bootstrap_external_git_repo_checked_out(tmp_path: pathlib.Path) -> None:
+    """Verify bootstrap skips the checkout when the tag is already checked out."""
+    # 1. Prepare
+    options = {
+        "dependencies": {
+            x: {"repository": "https://example.com/test.git", "tag": "v1"}
+            for x in ["current", "outdated"]
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+
+    for name in options["dependencies"]:
+        path = tmp_path / "external" / name
+        path.mkdir(parents=True)
+        git = ["git", "-C", str(path), "-c", "user.name=Bob", "-c", "user.email=b@b"]
+        subprocess.check_call([*git, "init", "-q"])
+        subprocess.check_call([*git, "commit", "-q", "--allow-empty", "-m", "First"])
+        subprocess.check_call([*git, "tag", "v1"])
+    subprocess.check_call(
+        [*git, "commit", "-q", "--allow-empty", "-m", "Second"]  # outdated
+    )
+
+    env = {"dependencies_path": tmp_path / "external", "root_path": tmp_path}
+
+    # 2. Execute
+    result = generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert [x.name for x in result] == ["bob:cmake", "bob:find", "checkout:outdated"]
+
+
 def test_bootstrap_custom_toolchain(
     mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
 ) -> None:
@@ -184,14 +292,17 @@ def test_bootstrap_custom_toolchain(
         / "toolchains"
         / "download"
         / "arm-gnu-toolchain-12.2.mpacbti-rel1-x86_64-arm-none-eabi.tar.xz",
+        reporthook=mocker.ANY,
     )
     shutil.unpack_archive.assert_called_once_with(
         cwd
         / "toolchains"
         / "download"
         / "arm-gnu-toolchain-12.2.mpacbti-rel1-x86_64-arm-none-eabi.tar.xz",
-        cwd / "toolchains",
+        mocker.ANY,
     )
+    staging = pathlib.Path(shutil.unpack_archive.call_args.args[1])
+    assert staging.parent == cwd / "toolchains"
 
 
 def test_bootstrap_custom_toolchain_already_downloaded(
@@ -241,8 +352,10 @@ def test_bootstrap_custom_toolchain_already_downloaded(
         / "toolchains"
         / "download"
         / "arm-gnu-toolchain-12.2.mpacbti-rel1-x86_64-arm-none-eabi.tar.xz",
-        cwd / "toolchains",
+        mocker.ANY,
     )
+    staging = pathlib.Path(shutil.unpack_archive.call_args.args[1])
+    assert staging.parent == cwd / "toolchains"
 
 
 def test_bootstrap_custom_toolchain_already_present(
@@ -317,3 +430,547 @@ def test_bootstrap_invalid_toolchain_url(tmp_path: pathlib.Path) -> None:
     # 2. Execute
     with pytest.raises(ValueError, match="URL must start with 'http:' or 'https:'"):
         generate_commands(parsed_options, env)
+
+
+def test_bootstrap_external_git_repos_concurrently(tmp_path: pathlib.Path) -> None:
+    """Verify each dependency is fetched independent of the other dependencies."""
+    # 1. Prepare
+    options = {
+        "dependencies": {
+            "jobs": 2,
+            "first": {"repository": "https://example.com/first.git", "tag": "v1"},
+            "second": {"repository": "https://example.com/second.git", "tag": "v2"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+    (env["dependencies_path"] / "second").mkdir(parents=True)
+
+    # 2. Execute
+    result = generate_commands(parsed_options, env)
+
+    # 3. Verify
+    setup = ["bob:cmake", "bob:find"]
+    assert [(x.name, x.needs, x.group) for x in result[2:]] == [
+        ("clone:first", setup, "first"),
+        ("checkout:first", ["clone:first"], "first"),
+        ("checkout:second", setup, "second"),
+    ]
+    nof_jobs = 2
+    assert all(x.pool.depth == nof_jobs for x in result[2:])
+
+
+def test_bootstrap_invalid_dependency_jobs() -> None:
+    """Verify the number of concurrent dependency fetches is validated."""
+    options = {"dependencies": {"jobs": "many"}}
+
+    with pytest.raises(ValueError, match="Invalid number of dependency jobs"):
+        parse_options(options, {})
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+@pytest.mark.parametrize("cache", [True, False])
+def test_bootstrap_toolchain_pipeline(
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    cache: bool,  # noqa: FBT001
+    pipeline: bool,  # noqa: FBT001
+) -> None:
+    """Verify toolchains are retrieved, keeping the archives only when caching."""
+    # 1. Prepare
+    url, root = archive_server
+    system = platform.system().lower()
+    options = {
+        "toolchains": {
+            "pipeline": pipeline,
+            "cache": cache,
+            "a": {system: f"{url}/tool-a.tar.gz"},
+            "b": {system: f"{url}/tool-b.tar.gz"},
+            "c": {system: f"{url}/tool-c.zip"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    generate_commands(parsed_options, env)
+
+    # 3. Verify
+    toolchains = tmp_path / "toolchains"
+    for name in ["tool-a", "tool-b", "tool-c"]:
+        assert (toolchains / name / "bin" / "cc").read_text() == name
+
+    archives = sorted(x.name for x in (toolchains / "download").iterdir())
+    if cache:
+        assert archives == ["tool-a.tar.gz", "tool-b.tar.gz", "tool-c.zip"]
+        cached = (toolchains / "download" / "tool-a.tar.gz").read_bytes()
+        assert cached == (root / "tool-a.tar.gz").read_bytes()
+    else:
+        assert archives == []
+    assert sorted(x.name for x in toolchains.iterdir()) == [
+        "download",
+        "tool-a",
+        "tool-b",
+        "tool-c",
+    ]
+
+
+def test_bootstrap_toolchain_pipeline_from_cache(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify the pipeline uses cached archives and skips extracted toolchains."""
+    # 1. Prepare
+    mocker.patch("urllib.request.urlopen")
+    system = platform.system().lower()
+    options = {
+        "toolchains": {
+            "pipeline": True,
+            "a": {system: "https://example.com/tool-a.tar.gz"},
+            "b": {system: "https://example.com/tool-b.tar.gz"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    toolchains = tmp_path / "toolchains"
+    (toolchains / "tool-a").mkdir(parents=True)
+    content = tmp_path / "tool-b"
+    content.mkdir()
+    (content / "cc").touch()
+    (toolchains / "download").mkdir()
+    with tarfile.open(toolchains / "download" / "tool-b.tar.gz", "w:gz") as tar:
+        tar.add(content, arcname="tool-b")
+
+    # 2. Execute
+    generate_commands(parsed_options, env)
+
+    # 3. Verify
+    urllib.request.urlopen.assert_not_called()
+    assert (toolchains / "tool-b" / "cc").exists()
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+def test_bootstrap_toolchain_replaces_previous_version(
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    pipeline: bool,  # noqa: FBT001
+) -> None:
+    """Verify a new version replaces its own files and merges shared folders."""
+    # 1. Prepare
+    url, root = archive_server
+    for name, files in {
+        "tool-d-1": ["bin/d-1", "tool-d/old"],
+        "tool-d-2": ["bin/d-2", "tool-d/new"],
+        "tool-e": ["bin/e"],
+    }.items():
+        with tarfile.open(root / f"{name}.tar.gz", "w:gz") as tar:
+            for file in files:
+                (root / name / file).parent.mkdir(parents=True, exist_ok=True)
+                (root / name / file).write_text(name)
+                tar.add(root / name / file, arcname=file)
+    system = platform.system().lower()
+    options = {
+        "toolchains": {
+            "pipeline": pipeline,
+            "d": {system: f"{url}/tool-d-1.tar.gz"},
+            "e": {system: f"{url}/tool-e.tar.gz"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    generate_commands(parsed_options, env)
+    options["toolchains"]["d"] = {system: f"{url}/tool-d-2.tar.gz"}
+    parse_options(options, parsed_options)
+    generate_commands(parsed_options, env)
+    repeated = generate_commands(parsed_options, env)
+
+    # 3. Verify
+    toolchains = tmp_path / "toolchains"
+    assert sorted(x.name for x in (toolchains / "tool-d").iterdir()) == ["new"]
+    assert sorted(x.name for x in (toolchains / "bin").iterdir()) == [
+        "d-1",
+        "d-2",
+        "e",
+    ]
+    assert [x.name for x in repeated] == ["bob:cmake", "bob:find"]
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"cache": False},
+        {"cache": False, "pipeline": True},
+        {"shared_cache": True, "cache_size": 0},
+    ],
+)
+def test_bootstrap_toolchain_downloaded_once(
+    mocker: pytest_mock.MockerFixture,
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    settings: typing.Dict[str, typing.Any],
+) -> None:
+    """Verify an extracted toolchain is not downloaded again, without the archive."""
+    # 1. Prepare
+    url, _ = archive_server
+    requests = mocker.spy(_QuietHandler, "do_GET")
+    system = platform.system().lower()
+    options = {
+        "lock": {"enabled": False},
+        "toolchains": {
+            **settings,
+            "a": {system: f"{url}/tool-a.tar.gz"},
+            "c": {system: f"{url}/tool-c.zip"},
+        },
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    generate_commands(parsed_options, env)
+    generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert requests.call_count == 2  # noqa: PLR2004
+    assert (tmp_path / "toolchains" / "tool-c" / "bin" / "cc").read_text() == "tool-c"
+
+
+def test_bootstrap_toolchain_pipeline_invalid_url(tmp_path: pathlib.Path) -> None:
+    """Verify the pipeline checks URLs."""
+    # 1. Prepare
+    options = {
+        "toolchains": {
+            "pipeline": True,
+            "a": {platform.system().lower(): "file:///tmp/tool-a.tar.gz"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    with pytest.raises(ValueError, match="URL must start with 'http:' or 'https:'"):
+        generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert not (tmp_path / "toolchains" / "download" / "tool-a.tar.gz.part").exists()
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+def test_bootstrap_toolchain_shared_cache(
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    pipeline: bool,  # noqa: FBT001
+) -> None:
+    """Verify projects share downloaded archives through the user-wide cache."""
+    # 1. Prepare
+    url, root = archive_server
+    system = platform.system().lower()
+    archive = root / "tool-a.tar.gz"
+    digest = hashlib.sha256(archive.read_bytes()).hexdigest()
+    options = {
+        "toolchains": {
+            "pipeline": pipeline,
+            "shared_cache": True,
+            "a": {system: f"{url}/tool-a.tar.gz", "sha256": {system: digest}},
+            "c": {system: f"{url}/tool-c.zip"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+
+    # 2. Execute
+    for project in ["one", "two"]:
+        env = parse_env({"root_path": tmp_path / project}, parsed_options)
+        generate_commands(parsed_options, env)
+        archive.unlink(missing_ok=True)
+        (root / "tool-c.zip").unlink(missing_ok=True)
+
+    # 3. Verify
+    for project in ["one", "two"]:
+        toolchains = tmp_path / project / "toolchains"
+        assert (toolchains / "tool-a" / "bin" / "cc").read_text() == "tool-a"
+        assert (toolchains / "tool-c" / "bin" / "cc").read_text() == "tool-c"
+        assert list((toolchains / "download").iterdir()) == []
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+def test_bootstrap_toolchain_digest_mismatch(
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    pipeline: bool,  # noqa: FBT001
+) -> None:
+    """Verify archives are checked against the expected digest."""
+    # 1. Prepare
+    url, _ = archive_server
+    options = {
+        "toolchains": {
+            "pipeline": pipeline,
+            "a": {platform.system().lower(): f"{url}/tool-a.tar.gz", "sha256": "0"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    with pytest.raises(ValueError, match="Digest mismatch for tool-a"):
+        generate_commands(parsed_options, env)
+
+    # 3. Verify
+    toolchains = tmp_path / "toolchains"
+    assert sorted(x.name for x in toolchains.iterdir()) == ["download"]
+    assert list((toolchains / "download").iterdir()) == []
+
+
+def test_bootstrap_external_git_repo_mirror(
+    git_remote: pathlib.Path, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Verify dependencies are cloned with a shared mirror as reference."""
+    # 1. Prepare
+    monkeypatch.setenv("PYTHONPATH", str(pathlib.Path(bob.__file__).parents[1]))
+    url = str(git_remote)
+    options = {
+        "dependencies": {
+            "mirror": True,
+            "first": {"repository": url, "tag": "v1"},
+            "second": {"repository": url, "tag": "v1"},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    mirror = mirror_path(url)
+
+    # 2. Execute
+    commands = []
+    for project in ["one", "two"]:
+        env = parse_env({"root_path": tmp_path / project}, parsed_options)
+        result = generate_commands(parsed_options, env)
+        execute(link(result, project), 2)
+        commands.append(result)
+
+    # 3. Verify
+    assert commands[0][2][1:] == ["-m", "bob.mirror", url, str(mirror)]
+    assert commands[1][2] == commands[0][2]
+    assert (mirror / "HEAD").exists()
+    for result in commands:
+        assert [x.name for x in result[2:]] == [
+            "mirror:first",
+            "clone:first",
+            "checkout:first",
+            "clone:second",
+            "checkout:second",
+        ]
+        assert result[3][:5] == [
+            "git",
+            "clone",
+            "--reference",
+            str(mirror),
+            "--dissociate",
+        ]
+
+    for project in ["one", "two"]:
+        for name in ["first", "second"]:
+            repo = tmp_path / project / "external" / name
+            assert (repo / "README").read_text() == "v1"
+            assert not (repo / ".git" / "objects" / "info" / "alternates").exists()
+
+
+def test_bootstrap_external_git_repo_shallow_sparse(
+    git_remote: pathlib.Path, tmp_path: pathlib.Path
+) -> None:
+    """Verify a dependency can be cloned at a single tag, with a subset of paths."""
+    # 1. Prepare
+    url = git_remote.as_uri()
+    options = {
+        "dependencies": {
+            "mirror": True,
+            "test": {
+                "repository": url,
+                "tag": "v1",
+                "depth": 1,
+                "filter": "blob:none",
+                "sparse": ["lib/a"],
+            },
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+    repo = env["dependencies_path"] / "test"
+
+    # 2. Execute
+    result = generate_commands(parsed_options, env)
+    execute(link(result, "bootstrap"), 2)
+    repeated = generate_commands(parsed_options, env)
+    parsed_options["bootstrap"]["dependencies"]["test"]["sparse"] = ["lib/b"]
+    changed = generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert [x.name for x in result[2:]] == [
+        "clone:test",
+        "sparse:test",
+        "checkout:test",
+    ]
+    assert [x.name for x in repeated[2:]] == []
+    assert [x.name for x in changed[2:]] == ["sparse:test"]
+    assert result[2] == [
+        "git",
+        "clone",
+        "--depth",
+        "1",
+        "--filter=blob:none",
+        "--branch",
+        "v1",
+        "--single-branch",
+        "--no-checkout",
+        url,
+        str(repo),
+    ]
+    assert result[3][-3:] == ["sparse-checkout", "set", "lib/a"]
+    assert (repo / "lib" / "a" / "file").read_text() == "a"
+    assert not (repo / "lib" / "b").exists()
+    history = subprocess.run(
+        ["git", "rev-list", "--count", "HEAD"],  # noqa: S607
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert history.stdout.strip() == "1"
+
+
+def test_bootstrap_external_git_repo_single_branch(tmp_path: pathlib.Path) -> None:
+    """Verify a single branch clone keeps using the mirror."""
+    # 1. Prepare
+    url = "https://github.com/renemoll/bob-cmake.git"
+    options = {
+        "dependencies": {
+            "mirror": True,
+            "test": {"repository": url, "tag": "v1", "single_branch": True},
+        }
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    result = generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert result[3] == [
+        "git",
+        "clone",
+        "--reference",
+        str(mirror_path(url)),
+        "--dissociate",
+        "--branch",
+        "v1",
+        "--single-branch",
+        url,
+        str(env["dependencies_path"] / "test"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("dependency", "message"),
+    [
+        ({"depth": 0}, "Invalid depth"),
+        ({"depth": "1"}, "Invalid depth"),
+        ({"sparse": "lib"}, "Invalid sparse paths"),
+        ({"tag": "0123456789abcdef0123456789abcdef01234567", "depth": 1}, "pins"),
+    ],
+)
+def test_bootstrap_external_git_repo_invalid_clone_options(
+    tmp_path: pathlib.Path, dependency: typing.Dict[str, typing.Any], message: str
+) -> None:
+    """Verify invalid clone options are reported."""
+    # 1. Prepare
+    test = {"repository": "https://github.com/renemoll/bob-cmake.git", "tag": "v1"}
+    options = {"dependencies": {"test": {**test, **dependency}}}
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute & 3. Verify
+    with pytest.raises(ValueError, match=message):
+        generate_commands(parsed_options, env)
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+def test_bootstrap_lock(
+    mocker: pytest_mock.MockerFixture,
+    git_remote: pathlib.Path,
+    archive_server: typing.Tuple[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    pipeline: bool,  # noqa: FBT001
+) -> None:
+    """Verify the bootstrap is locked and later validated against the lock file."""
+    # 1. Prepare
+    url, _ = archive_server
+    options = {
+        "dependencies": {"lib": {"repository": str(git_remote), "tag": "v1"}},
+        "toolchains": {
+            "pipeline": pipeline,
+            "a": {platform.system().lower(): f"{url}/tool-a.tar.gz"},
+        },
+    }
+    parsed_options = {}
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+    commit = subprocess.check_output(
+        ["git", "-C", str(git_remote), "rev-parse", "v1"], text=True  # noqa: S607
+    ).strip()
+
+    # 2. Execute
+    execute(link(generate_commands(parsed_options, env), "bootstrap"))
+    locked = (tmp_path / LOCK_FILE).read_text()
+
+    mocker.patch("urllib.request.urlopen", side_effect=AssertionError)
+    mocker.patch("urllib.request.urlretrieve", side_effect=AssertionError)
+    manifest_path(tmp_path / "toolchains", "a").unlink()
+    repeated = generate_commands(parsed_options, env)
+
+    (tmp_path / "toolchains" / "tool-a" / "bin" / "cc").write_text("changed")
+    git = ["git", "-C", str(tmp_path / "external" / "lib")]
+    subprocess.check_call([*git, "checkout", "-q", "HEAD~1"])
+    with pytest.raises(LockError) as drifted:
+        generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert f'commit = "{commit}"' in locked
+    assert 'entries = [ "tool-a",]' in locked
+    assert "sha256 = " in locked
+    assert [x.name for x in repeated] == ["bob:cmake", "bob:find"]
+    assert (tmp_path / LOCK_FILE).read_text() == locked
+    assert manifest_path(tmp_path / "toolchains", "a").is_file()
+    assert drifted.value.differences[0].startswith(
+        f"dependency lib: locked at {commit}"
+    )
+    assert drifted.value.differences[1] == (
+        "toolchain a: extracted tree changed, 3 files, locked 3"
+    )
+    assert drifted.value.differences[2].startswith("  + tool-a/bin/cc 7 ")
+    assert drifted.value.differences[3].startswith("  - tool-a/bin/cc 6 ")
+
+
+def test_bootstrap_lock_disabled(tmp_path: pathlib.Path) -> None:
+    """Verify no lock file is written when disabled."""
+    # 1. Prepare
+    parsed_options = {}
+    parse_options({"lock": {"enabled": False}}, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+
+    # 2. Execute
+    generate_commands(parsed_options, env)
+
+    # 3. Verify
+    assert not parsed_options["bootstrap"]["lock"]
+    assert not (tmp_path / LOCK_FILE).exists()
@@ -0,0 +1,172 @@
+"""Tests for the user-wide cache."""
+import concurrent.futures
+import hashlib
+import os
+import pathlib
+
+import pytest
+
+from bob.cache import DownloadCache, cache_dir, file_digest, locked, parse_size
+
+
+def _download(cache: DownloadCache, name: str, content: bytes) -> pathlib.Path:
+    path = cache.temporary(name)
+    path.write_bytes(content)
+    return path
+
+
+def test_cache_dir(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    """Verify the cache location can be configured."""
+    monkeypatch.setenv("BOB_CACHE_DIR", str(tmp_path / "bob"))
+    assert cache_dir() == tmp_path / "bob"
+
+    monkeypatch.delenv("BOB_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache_dir() == tmp_path / "bob"
+
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert cache_dir() == pathlib.Path.home() / ".cache" / "bob"
+
+
+def test_parse_size() -> None:
+    """Verify sizes with and without a unit."""
+    kilobyte = 1024
+    assert parse_size(kilobyte) == kilobyte
+    assert parse_size("1024") == kilobyte
+    assert parse_size("1k") == kilobyte
+    assert parse_size("1.5G") == int(1.5 * 1024**3)
+    assert parse_size("20GB") == 20 * 1024**3
+
+    with pytest.raises(ValueError, match="Invalid size"):
+        parse_size("lots")
+
+
+def test_file_digest(tmp_path: pathlib.Path) -> None:
+    """Verify the digest of a file."""
+    path = tmp_path / "file"
+    path.write_bytes(b"content")
+
+    assert file_digest(path) == hashlib.sha256(b"content").hexdigest()
+
+
+def test_cache_put_and_get(tmp_path: pathlib.Path) -> None:
+    """Verify files are found by URL and by digest."""
+    # 1. Prepare
+    cache = DownloadCache(tmp_path, 1024)
+    digest = hashlib.sha256(b"content").hexdigest()
+    url = "https://example.com/tool.tar.gz"
+
+    # 2. Execute
+    assert cache.get(url) is None
+    assert cache.get(url, digest) is None
+    stored = cache.put(url, _download(cache, "tool.tar.gz", b"content"), digest)
+
+    # 3. Verify
+    assert stored == tmp_path / "blobs" / digest / "tool.tar.gz"
+    assert cache.get(url) == stored
+    assert cache.get("https://mirror.com/tool.tar.gz", digest.upper()) == stored
+    assert cache.get("https://mirror.com/tool.tar.gz") == stored
+
+
+def test_cache_deduplicates(tmp_path: pathlib.Path) -> None:
+    """Verify identical files from different URLs are stored once."""
+    # 1. Prepare
+    cache = DownloadCache(tmp_path, 1024)
+    digest = hashlib.sha256(b"content").hexdigest()
+
+    # 2. Execute
+    first = cache.put(
+        "https://a.com/a.tar.gz", _download(cache, "a", b"content"), digest
+    )
+    second = cache.put(
+        "https://b.com/b.tar.gz", _download(cache, "b", b"content"), digest
+    )
+
+    # 3. Verify
+    assert first == second
+    assert cache.get("https://b.com/b.tar.gz") == first
+    assert list((tmp_path / "tmp").glob("*-[ab]")) == []
+
+
+def test_cache_evicts_least_recently_used(tmp_path: pathlib.Path) -> None:
+    """Verify the least recently used files are evicted beyond the budget."""
+    # 1. Prepare
+    cache = DownloadCache(tmp_path, 30)
+    files = {}
+    for index, name in enumerate(["a", "b", "c"]):
+        content = name.encode() * 10
+        digest = hashlib.sha256(content).hexdigest()
+        url = f"https://example.com/{name}.zip"
+        files[name] = cache.put(url, _download(cache, name, content), digest)
+        os.utime(files[name], (index, index))
+    cache.get("https://example.com/a.zip")
+
+    # 2. Execute
+    cache.max_size = 25
+    cache.evict()
+
+    # 3. Verify
+    assert files["a"].exists()
+    assert not files["b"].exists()
+    assert files["c"].exists()
+    assert cache.get("https://example.com/b.zip") is None
+
+
+def test_cache_does_not_evict_held_files(tmp_path: pathlib.Path) -> None:
+    """Verify a file in use is not evicted, until it is released."""
+    # 1. Prepare
+    cache = DownloadCache(tmp_path, 1024)
+    digest = hashlib.sha256(b"content").hexdigest()
+    url = "https://example.com/tool.tar.gz"
+    stored = cache.put(url, _download(cache, "tool.tar.gz", b"content"), digest)
+    cache.max_size = 0
+
+    # 2. Execute
+    with cache.hold(url) as held:
+        cache.evict()
+        kept = stored.exists()
+    with cache.hold("https://example.com/other.tar.gz") as missing:
+        pass
+    cache.evict()
+
+    # 3. Verify
+    assert held == stored
+    assert kept
+    assert missing is None
+    assert not stored.exists()
+
+
+def test_cache_concurrent_put(tmp_path: pathlib.Path) -> None:
+    """Verify an identical file added at the same time is stored once."""
+    # 1. Prepare
+    cache = DownloadCache(tmp_path, 1024)
+    digest = hashlib.sha256(b"content").hexdigest()
+    names = [f"tool-{x}.tar.gz" for x in range(16)]
+    downloads = [_download(cache, x, b"content") for x in names]
+
+    # 2. Execute
+    with concurrent.futures.ThreadPoolExecutor(len(names)) as workers:
+        stored = set(
+            workers.map(
+                lambda x: cache.put(f"https://example.com/{x[0]}", x[1], digest),
+                zip(names, downloads),
+            )
+        )
+
+    # 3. Verify
+    assert len(stored) == 1
+    assert list((tmp_path / "blobs" / digest).iterdir()) == list(stored)
+    assert list((tmp_path / "tmp").glob("*-tool-*")) == []
+
+
+def test_locked(tmp_path: pathlib.Path) -> None:
+    """Verify an exclusive lock excludes any other lock, shared locks do not."""
+    path = tmp_path / "lock"
+
+    with locked(path) as first, locked(path, blocking=False) as second:
+        assert (first, second) == (True, False)
+
+    with locked(path, shared=True) as first, locked(
+        path, shared=True, blocking=False
+    ) as second, locked(path, blocking=False) as third:
+        assert (first, second, third) == (True, True, False)
@@ -3,6 +3,7 @@ import os
 import pathlib
 import shutil
 import subprocess
+import sys
 import typing
 import unittest
 
@@ -12,6 +13,8 @@ import pytest_mock
 
 from bob.cli import main
 
+IMPORT_BUDGET_US = 250_000
+
 
 @pytest.fixture()
 def no_config_path(tmp_path_factory: pytest.TempPathFactory) -> pathlib.Path:
@@ -1096,3 +1099,265 @@ def test_cli_install_linux_default(
     )
     assert subprocess.run.call_count == len(calls)
     subprocess.run.assert_has_calls(calls)
+
+
+def test_cli_build_matrix(
+    mocker: pytest_mock.MockerFixture, no_config_path: pathlib.Path  # noqa: ARG001
+) -> None:
+    """Verify the CLI passes the matrix, trace and log arguments along."""
+    # 1. Prepare
+    run = mocker.patch("bob.cli.bob")
+    mocker.patch("docopt.docopt")
+
+    docopt.docopt.return_value = {
+        "--all": True,
+        "--configs": "debug",
+        "--trace-file": "trace.json",
+        "--log-dir": "logs",
+        "--help": False,
+        "--version": False,
+        "<target>": None,
+        "bootstrap": False,
+        "build": True,
+        "configure": False,
+        "install": False,
+        "debug": False,
+        "release": False,
+    }
+
+    # 2. Execute
+    result = main()
+
+    # 3. Verify
+    assert result == 0
+    options = run.call_args.args[1]
+    assert options["all"] is True
+    assert options["configs"] == "debug"
+    assert options["trace_file"] == "trace.json"
+    assert options["log_dir"] == "logs"
+
+
+@pytest.mark.parametrize("recorded", [True, False])
+def test_cli_stats(
+    mocker: pytest_mock.MockerFixture,
+    capsys: pytest.CaptureFixture,
+    no_config_path: pathlib.Path,
+    recorded: bool,  # noqa: FBT001
+) -> None:
+    """Verify the stats command reports the history of the project."""
+    # 1. Prepare
+    from bob.history import StepStats
+
+    stats = [StepStats("command", "build:0", [1.0, 1.0, 1.0], 2.0)]
+    collect = mocker.patch("bob.history.collect_stats", return_value=stats)
+    if not recorded:
+        collect.return_value = []
+    mocker.patch("docopt.docopt")
+
+    docopt.docopt.return_value = {
+        "--margin": "50",
+        "--help": False,
+        "--version": False,
+        "<target>": None,
+        "bootstrap": False,
+        "build": False,
+        "configure": False,
+        "install": False,
+        "stats": True,
+        "debug": False,
+        "release": False,
+    }
+
+    # 2. Execute
+    result = main()
+
+    # 3. Verify
+    assert result == 0
+    collect.assert_called_once_with(no_config_path)
+    output = capsys.readouterr().out
+    assert ("SLOWER" in output) == recorded
+    assert ("No history recorded" in output) != recorded
+
+
+def test_cli_stats_invalid_margin(
+    mocker: pytest_mock.MockerFixture,
+    no_config_path: pathlib.Path,  # noqa: ARG001
+) -> None:
+    """Verify an invalid margin is reported."""
+    # 1. Prepare
+    mocker.patch("docopt.docopt")
+    docopt.docopt.return_value = {
+        "--margin": "fast",
+        "<target>": None,
+        "stats": True,
+        "debug": False,
+        "release": False,
+    }
+
+    # 2. Execute
+    result = main()
+
+    # 3. Verify
+    invalid_arguments_code = 65
+    assert result == invalid_arguments_code
+
+
+def test_cli_startup_imports() -> None:
+    """Verify starting the CLI only imports what is needed to parse the arguments."""
+    # 1. Prepare
+    deferred = {
+        "bob.cache",
+        "bob.common",
+        "bob.executor",
+        "bob.history",
+        "bob.modules",
+        "concurrent.futures",
+        "packaging.version",
+        "sqlite3",
+        "subprocess",
+        "toml",
+    }
+
+    # 2. Execute
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bob.cli"],
+        cwd=pathlib.Path(__file__).parent.parent,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    # 3. Verify
+    imported = {}
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        imported[name.strip()] = int(cumulative)
+
+    assert deferred.isdisjoint(imported)
+    assert imported["bob.cli"] < IMPORT_BUDGET_US
+
+
+def test_cli_daemon_forward(
+    mocker: pytest_mock.MockerFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Verify a command is forwarded to the daemon, unless disabled."""
+    # 1. Prepare
+    forward = mocker.patch("bob.daemon.forward", return_value=3)
+    run = mocker.patch("bob.cli.run", return_value=0)
+    monkeypatch.setattr(sys, "argv", ["bob", "build"])
+
+    # 2. Execute
+    result = [main()]
+    monkeypatch.setenv("BOB_DAEMON", "0")
+    result.append(main())
+
+    # 3. Verify
+    assert result == [3, 0]
+    forward.assert_called_once_with(["build"])
+    run.assert_called_once_with(["build"])
+
+
+@pytest.mark.parametrize("argv", [["--version"], ["-h"], ["build", "--unknown"]])
+def test_cli_daemon_not_forwarded(
+    mocker: pytest_mock.MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    argv: typing.List[str],
+) -> None:
+    """Verify the help, the version and invalid usage are not forwarded."""
+    # 1. Prepare
+    forward = mocker.patch("bob.daemon.forward", return_value=3)
+    monkeypatch.setattr(sys, "argv", ["bob", *argv])
+
+    # 2. Execute
+    with pytest.raises(SystemExit):
+        main()
+
+    # 3. Verify
+    forward.assert_not_called()
+
+
+def test_cli_daemon(
+    mocker: pytest_mock.MockerFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Verify the daemon is started and stopped."""
+    # 1. Prepare
+    serve = mocker.patch("bob.daemon.Daemon.serve", side_effect=RuntimeError)
+    monkeypatch.setattr(sys, "argv", ["bob", "daemon"])
+
+    # 2. Execute
+    result = [main()]
+    serve.side_effect = KeyboardInterrupt
+    result.append(main())
+    monkeypatch.setattr(sys, "argv", ["bob", "daemon", "--stop"])
+    result.append(main())
+
+    # 3. Verify
+    software_error_code = 70
+    assert result == [software_error_code, 0, 0]
+    assert serve.call_count == 2  # noqa: PLR2004
+
+
+def test_cli_load_config(tmp_path: pathlib.Path) -> None:
+    """Verify a configuration is parsed again once changed."""
+    # 1. Prepare
+    from bob.cli import load_config
+
+    path = tmp_path / "bob.toml"
+    path.write_text('[build]\ntarget = "linux"\n')
+
+    # 2. Execute
+    first = load_config(path)
+    second = load_config(path)
+    path.write_text('[build]\ntarget = "native"\n')
+    third = load_config(path)
+
+    # 3. Verify
+    assert first is second
+    assert third == {"build": {"target": "native"}}
+
+
+def test_cli_build_watch(
+    mocker: pytest_mock.MockerFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Verify the build is repeated while watching the sources."""
+    # 1. Prepare
+    watch = mocker.patch(
+        "bob.watch.watch", side_effect=[None, RuntimeError, KeyboardInterrupt]
+    )
+    monkeypatch.setattr(sys, "argv", ["bob", "build", "linux", "--watch"])
+    monkeypatch.setenv("BOB_DAEMON", "0")
+
+    # 2. Execute
+    result = [main(), main(), main()]
+
+    # 3. Verify
+    software_error_code = 70
+    assert result == [0, software_error_code, 0]
+    assert watch.call_args.args[1]()["target"] == "linux"
+
+
+def test_cli_build_affected(
+    mocker: pytest_mock.MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    no_config_path: pathlib.Path,  # noqa: ARG001
+) -> None:
+    """Verify the revision to compare against is passed along."""
+    # 1. Prepare
+    run = mocker.patch("bob.cli.bob")
+    monkeypatch.setenv("BOB_DAEMON", "0")
+    argv = [
+        ["bob", "build"],
+        ["bob", "build", "--affected"],
+        ["bob", "build", "--affected", "--since", "origin/main"],
+    ]
+
+    # 2. Execute
+    result = []
+    for args in argv:
+        monkeypatch.setattr(sys, "argv", args)
+        result.append(main())
+
+    # 3. Verify
+    assert result == [0, 0, 0]
+    affected = [x.args[1].get("affected") for x in run.call_args_list]
+    assert affected == [None, "HEAD", "origin/main"]
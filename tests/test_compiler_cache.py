@@ -0,0 +1,211 @@
+"""Tests for the compiler cache integration."""
+import pathlib
+import shutil
+import types
+import typing
+
+import pytest
+import pytest_mock
+
+from bob.common import parse_options as common_parse_options
+from bob.compiler_cache import (
+    CONTAINER_CACHE_DIR,
+    CompilerCache,
+    detect_compiler_cache,
+    determine_compiler_cache,
+)
+from bob.container import session_name
+from bob.executor import Job
+from bob.tasks import build, configure
+
+_CONTAINER = {
+    "target": "linux",
+    "toolchains": {"linux": {"container": "builder"}},
+    "targets": {"linux": {"toolchain": "linux"}},
+}
+
+
+def _generate(
+    task: types.ModuleType,
+    options: typing.Dict[str, typing.Any],
+    root_path: pathlib.Path,
+) -> typing.List[Job]:
+    parsed = common_parse_options(options)
+    configure.parse_options(options, parsed)
+    env = configure.parse_env({"root_path": root_path}, parsed)
+    return task.generate_commands(parsed, env)
+
+
+def test_detect_compiler_cache(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify ccache is preferred over sccache."""
+    # 1. Prepare
+    installed: typing.List[str] = []
+    mocker.patch.object(shutil, "which", side_effect=lambda x: x in installed)
+
+    # 2. Execute
+    result = []
+    for tools in [[], ["sccache"], ["sccache", "ccache"]]:
+        installed[:] = tools
+        result.append(detect_compiler_cache())
+
+    # 3. Verify
+    assert result == [None, "sccache", "ccache"]
+
+
+@pytest.mark.parametrize(
+    ("settings", "container", "expected"),
+    [
+        ({}, False, "sccache"),
+        ({}, True, None),
+        ({"compiler": "none"}, False, None),
+        ({"compiler": False}, False, None),
+        ({"compiler": "ccache"}, True, "ccache"),
+    ],
+)
+def test_determine_compiler_cache(
+    mocker: pytest_mock.MockerFixture,
+    cache_path: pathlib.Path,
+    settings: typing.Dict[str, typing.Any],
+    container: bool,  # noqa: FBT001
+    expected: typing.Optional[str],
+) -> None:
+    """Verify the compiler cache is detected on the host, or given explicitly."""
+    # 1. Prepare
+    mocker.patch("bob.compiler_cache.detect_compiler_cache", return_value="sccache")
+
+    # 2. Execute
+    result = determine_compiler_cache({"cache": settings}, container)
+
+    # 3. Verify
+    if expected is None:
+        assert result is None
+    else:
+        path = cache_path / f"{expected}-container" if container else None
+        assert result == CompilerCache(expected, path, None)
+
+
+def test_determine_compiler_cache_settings(tmp_path: pathlib.Path) -> None:
+    """Verify the location and size of the cache can be configured."""
+    # 1. Prepare
+    settings = {"compiler": "ccache", "path": str(tmp_path), "size": "512M"}
+
+    # 2. Execute
+    result = determine_compiler_cache({"cache": settings}, container=False)
+
+    # 3. Verify
+    assert result is not None
+    assert result.environment() == {
+        "CCACHE_DIR": str(tmp_path),
+        "CCACHE_MAXSIZE": "512M",
+    }
+    assert result.environment("/cache") == {
+        "CCACHE_DIR": "/cache",
+        "CCACHE_MAXSIZE": "512M",
+    }
+    with pytest.raises(ValueError, match="Invalid compiler cache"):
+        determine_compiler_cache({"cache": {"compiler": "distcc"}}, container=False)
+
+
+def test_configure_with_compiler_cache(tmp_path: pathlib.Path) -> None:
+    """Verify the compiler cache is used as compiler launcher."""
+    # 1. Prepare
+    options = {"cache": {"compiler": "sccache"}}
+
+    # 2. Execute
+    result = _generate(configure, options, tmp_path)
+
+    # 3. Verify
+    assert result[0][-2:] == [
+        "-DCMAKE_C_COMPILER_LAUNCHER=sccache",
+        "-DCMAKE_CXX_COMPILER_LAUNCHER=sccache",
+    ]
+
+
+def test_build_with_compiler_cache(
+    tmp_path: pathlib.Path, cache_path: pathlib.Path
+) -> None:
+    """Verify the compiler cache is configured for builds on the host."""
+    # 1. Prepare
+    options = {"cache": {"compiler": "sccache", "size": "2G"}}
+
+    # 2. Execute
+    result = _generate(build, options, tmp_path)
+
+    # 3. Verify
+    assert result == [["cmake", "--build", "build/native-release"]]
+    assert result[0].env == {"SCCACHE_CACHE_SIZE": "2048M"}
+    assert not (cache_path / "sccache").exists()
+
+
+def test_build_with_compiler_cache_configured_by_tool(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    """Verify the configuration of the tool applies, unless set explicitly."""
+    # 1. Prepare
+    monkeypatch.setenv("CCACHE_DIR", str(tmp_path / "ccache"))
+    options = {"cache": {"compiler": "ccache"}}
+
+    # 2. Execute
+    result = _generate(build, options, tmp_path)
+
+    # 3. Verify
+    assert result[0].env is None
+
+
+def test_build_with_compiler_cache_in_container(
+    tmp_path: pathlib.Path, cache_path: pathlib.Path
+) -> None:
+    """Verify the compiler cache is mounted into the container."""
+    # 1. Prepare
+    options = {**_CONTAINER, "cache": {"compiler": "ccache"}}
+
+    # 2. Execute
+    result = _generate(build, options, tmp_path)
+
+    # 3. Verify
+    assert result[0] == [
+        "docker",
+        "run",
+        "--rm",
+        "-v",
+        f"{tmp_path}:/work/",
+        "-v",
+        f"{cache_path / 'ccache-container'}:{CONTAINER_CACHE_DIR}",
+        "-e",
+        f"CCACHE_DIR={CONTAINER_CACHE_DIR}",
+        "builder",
+        "cmake",
+        "--build",
+        "build/linux-release",
+    ]
+    assert result[0].env is None
+    assert (cache_path / "ccache-container").is_dir()
+
+
+def test_build_with_compiler_cache_in_session(
+    tmp_path: pathlib.Path,
+    cache_path: pathlib.Path,
+) -> None:
+    """Verify the session container is prepared with the compiler cache mounted."""
+    # 1. Prepare
+    options = {
+        **_CONTAINER,
+        "containers": {"session": True},
+        "cache": {"compiler": "ccache"},
+    }
+
+    # 2. Execute
+    result = _generate(build, options, tmp_path)
+
+    # 3. Verify
+    volume = f"{cache_path / 'ccache-container'}:{CONTAINER_CACHE_DIR}"
+    assert result[0][-4:] == ["builder", str(tmp_path), "600", volume]
+    assert result[1][:7] == [
+        "docker",
+        "exec",
+        "-w",
+        "/work/",
+        "-e",
+        f"CCACHE_DIR={CONTAINER_CACHE_DIR}",
+        session_name("builder", tmp_path, (volume,)),
+    ]
@@ -1,9 +1,12 @@
 """Tests specifically for the configure command."""
 import pathlib
+import typing
 
 from bob.api import Command
 from bob.common import parse_options as common_parse_options
+from bob.endpoints import Endpoint
 from bob.tasks.configure import depends_on, generate_commands, parse_env, parse_options
+from bob.typehints import CommandListT
 
 
 def test_dependency() -> None:
@@ -157,3 +160,82 @@ def test_configure_with_additional_target_options(tmp_path: pathlib.Path) -> Non
         "-DCMAKE_BUILD_TYPE=Release",
         "-DTOGGLE",
     ]
+
+
+def test_configure_skipped_when_unchanged(tmp_path: pathlib.Path) -> None:
+    """Verify the configuration is skipped until one of its inputs changes."""
+    # 1. Prepare
+    toolchain_file = tmp_path / "arm.cmake"
+    toolchain_file.write_text("set(CMAKE_SYSTEM_NAME Generic)")
+    options = {
+        "target": "stm32",
+        "toolchains": {"arm": {"toolchain_file": "arm.cmake"}},
+        "targets": {"stm32": {"toolchain": "arm"}},
+    }
+    parsed_options = common_parse_options(options)
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+    build_path = tmp_path / env["build_path"]
+
+    def configure() -> CommandListT:
+        result = generate_commands(parsed_options, env)
+        for job in result:
+            build_path.mkdir(parents=True, exist_ok=True)
+            (build_path / "CMakeCache.txt").touch()
+            job.on_success()
+        return result
+
+    # 2. Execute
+    first = configure()
+    second = configure()
+    toolchain_file.write_text("set(CMAKE_SYSTEM_NAME Linux)")
+    third = configure()
+    (build_path / "CMakeCache.txt").unlink()
+    fourth = configure()
+    parse_options({**options, "reconfigure": True}, parsed_options)
+    fifth = configure()
+
+    # 3. Verify
+    assert len(first) == 1
+    assert second == []
+    assert len(third) == 1
+    assert len(fourth) == 1
+    assert len(fifth) == 1
+
+
+def test_configure_fingerprint_container(tmp_path: pathlib.Path) -> None:
+    """Verify the Docker endpoint of a container does not change the fingerprint."""
+    # 1. Prepare
+    options = {
+        "target": "linux",
+        "toolchains": {"gcc": {"container": "gcc:13"}},
+        "targets": {"linux": {"toolchain": "gcc"}},
+    }
+    parsed_options = common_parse_options(options)
+    parse_options(options, parsed_options)
+    env = parse_env({"root_path": tmp_path}, parsed_options)
+    build_path = tmp_path / env["build_path"]
+
+    def configure(endpoint: typing.Optional[Endpoint]) -> CommandListT:
+        result = generate_commands(
+            {**parsed_options, "container_endpoint": endpoint}, env
+        )
+        for job in result:
+            build_path.mkdir(parents=True, exist_ok=True)
+            (build_path / "CMakeCache.txt").touch()
+            job.on_success()
+        return result
+
+    # 2. Execute
+    first = configure(None)
+    second = configure(Endpoint("unix:///var/run/docker.sock", remote=False))
+    third = configure(Endpoint("ssh://builder", remote=True))
+    fourth = configure(Endpoint("ssh://builder", remote=True))
+    fifth = configure(Endpoint("ssh://other", remote=True))
+
+    # 3. Verify
+    assert first[0][:3] == ["docker", "run", "--rm"]
+    assert second == []
+    assert third[0][:3] == ["docker", "--host", "ssh://builder"]
+    assert fourth == []
+    assert len(fifth) == 1
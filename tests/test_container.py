@@ -0,0 +1,138 @@
+"""Tests for the session containers."""
+import pathlib
+import subprocess
+import sys
+import typing
+
+import pytest
+import pytest_mock
+
+from bob.common import generate_session_commands, parse_options
+from bob.container import KEEPALIVE_FILE, main, session_name, start_session
+from bob.tasks import build
+
+
+def _docker(*, running: bool) -> typing.Callable[..., subprocess.CompletedProcess]:
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        failed = cmd[1] == "exec" and not running
+        return subprocess.CompletedProcess(cmd, 1 if failed else 0)
+
+    return run
+
+
+def test_session_commands(tmp_path: pathlib.Path) -> None:
+    """Verify the session is prepared by a command preceding the command in it."""
+    # 1. Prepare
+    options = parse_options(
+        {
+            "target": "linux",
+            "toolchains": {"linux": {"container": "builder"}},
+            "targets": {"linux": {"toolchain": "linux"}},
+            "containers": {"session": True, "idle_timeout": 60},
+        }
+    )
+    env = {"root_path": tmp_path, "build_path": pathlib.Path("build/linux-release")}
+
+    # 2. Execute
+    result = build.generate_commands(options, env)
+
+    # 3. Verify
+    name = session_name("builder", tmp_path)
+    assert result[0] == [
+        sys.executable,
+        "-m",
+        "bob.container",
+        "builder",
+        str(tmp_path),
+        "60",
+    ]
+    assert result[1][:5] == ["docker", "exec", "-w", "/work/", name]
+    assert generate_session_commands(parse_options({}), tmp_path) == []
+
+
+def test_session_started(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify a session container is started when it is not running."""
+    # 1. Prepare
+    mocker.patch("subprocess.run", side_effect=_docker(running=False))
+
+    # 2. Execute
+    result = main(["builder", str(tmp_path), "60", "/cache:/cache"])
+
+    # 3. Verify
+    assert result == 0
+    commands = [x.args[0] for x in subprocess.run.call_args_list]
+    assert [x[:2] for x in commands] == [
+        ["docker", "exec"],
+        ["docker", "rm"],
+        ["docker", "run"],
+    ]
+    assert commands[2][-2:] == ["watchdog", "60"]
+    assert f"{tmp_path}:/work/" in commands[2]
+    assert "/cache:/cache" in commands[2]
+
+
+def test_session_reused(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify a running session container is reused, resetting its idle timer."""
+    # 1. Prepare
+    mocker.patch("subprocess.run", side_effect=_docker(running=True))
+
+    # 2. Execute
+    names = [start_session("builder", tmp_path, 60) for _ in range(2)]
+
+    # 3. Verify
+    name = session_name("builder", tmp_path)
+    assert names == [name, name]
+    commands = [x.args[0] for x in subprocess.run.call_args_list]
+    assert commands == [["docker", "exec", name, "touch", KEEPALIVE_FILE]] * 2
+
+
+def test_session_failed(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify a session container failing to start fails the command."""
+
+    # 1. Prepare
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd[1] == "run":
+            raise subprocess.CalledProcessError(125, cmd)
+        return subprocess.CompletedProcess(cmd, 1)
+
+    mocker.patch("subprocess.run", side_effect=run)
+
+    # 2. Execute & 3. Verify
+    assert main(["builder", str(tmp_path), "60"]) == 125  # noqa: PLR2004
+
+
+def test_session_names() -> None:
+    """Verify each project, image and set of volumes has its own session container."""
+    names = {
+        session_name("a", pathlib.Path("/one")),
+        session_name("b", pathlib.Path("/one")),
+        session_name("a", pathlib.Path("/two")),
+        session_name("a", pathlib.Path("/one"), ("/cache:/cache",)),
+    }
+
+    assert len(names) == 4  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("timeout", ["0", "soon"])
+def test_session_invalid_idle_timeout(timeout: str) -> None:
+    """Verify an invalid idle timeout is rejected."""
+    options = {"containers": {"session": True, "idle_timeout": timeout}}
+
+    with pytest.raises(ValueError, match="Invalid container idle timeout"):
+        parse_options(options)
+
+
+def test_session_default_idle_timeout() -> None:
+    """Verify the session mode is opt-in, with a default idle timeout."""
+    assert "container_session" not in parse_options({})
+    assert "container_session" not in parse_options({"containers": {}})
+
+    result = parse_options({"containers": {"session": True}})
+
+    assert result["container_session"] > 0
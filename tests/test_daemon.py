@@ -0,0 +1,166 @@
+"""Tests for the daemon executing the commands of the CLI."""
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+import typing
+
+import pytest
+import pytest_mock
+
+from bob import __version__
+from bob.cli import prepare, run
+from bob.compat import EX_DATAERR
+from bob.daemon import Daemon, forward, socket_path, stop
+
+_TIMEOUT = 10.0
+
+
+def _wait(condition: typing.Callable[[], bool]) -> None:
+    deadline = time.monotonic() + _TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture()
+def daemon(no_daemon: pathlib.Path) -> typing.Iterator[Daemon]:
+    """Fixture for a daemon serving requests from a thread."""
+    server = Daemon(run, prepare, no_daemon)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    _wait(no_daemon.exists)
+
+    yield server
+
+    stop(no_daemon)
+    thread.join(_TIMEOUT)
+    assert not thread.is_alive()
+
+
+def test_daemon_forward(
+    daemon: Daemon,
+    capfd: pytest.CaptureFixture,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify a command is executed in the working folder of the client."""
+    # 1. Prepare
+    monkeypatch.chdir(tmp_path)
+
+    # 2. Execute
+    status = forward(["stats"])
+
+    # 3. Verify
+    assert status == 0
+    assert capfd.readouterr().out == f"No history recorded for {tmp_path}\n"
+    assert daemon.children == {}
+
+
+def test_daemon_forward_status(
+    mocker: pytest_mock.MockerFixture,
+    daemon: Daemon,  # noqa: ARG001
+    capfd: pytest.CaptureFixture,
+) -> None:
+    """Verify the exit status of the command is returned to the client."""
+    # 1. Prepare
+    mocker.patch("bob.cli.bob", side_effect=ValueError)
+
+    # 2. Execute
+    result = [forward(x) for x in [["build"], ["--version"], ["unknown"]]]
+
+    # 3. Verify
+    assert result == [EX_DATAERR, 0, 1]
+    captured = capfd.readouterr()
+    assert f"{__version__}\n" in captured.out
+    assert "Usage:" in captured.err
+
+
+def test_daemon_hangup(mocker: pytest_mock.MockerFixture, daemon: Daemon) -> None:
+    """Verify the command is terminated once the client disconnects."""
+    # 1. Prepare
+    mocker.patch("bob.cli.bob", side_effect=lambda *_: time.sleep(60))
+    client = subprocess.Popen(
+        [sys.executable, "-c", "from bob.daemon import forward; forward(['build'])"],
+        cwd=pathlib.Path(__file__).parent.parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # 2. Execute
+    _wait(lambda: len(daemon.children) == 1)
+    client.kill()
+    client.wait()
+    start = time.monotonic()
+    _wait(lambda: not daemon.children)
+
+    # 3. Verify
+    assert time.monotonic() - start < _TIMEOUT
+
+
+def test_daemon_idle_client(
+    daemon: Daemon,
+    capfd: pytest.CaptureFixture,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Verify a client which does not send its request does not hold up others."""
+    # 1. Prepare
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("bob.daemon._REQUEST_TIMEOUT", 3.0)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle:
+        idle.connect(str(daemon.path))
+        idle.settimeout(_TIMEOUT)
+
+        # 2. Execute
+        start = time.monotonic()
+        status = forward(["stats"])
+        duration = time.monotonic() - start
+        dropped = idle.recv(1)
+
+    # 3. Verify
+    assert status == 0
+    assert duration < 3.0  # noqa: PLR2004
+    assert dropped == b""
+    assert "No history recorded" in capfd.readouterr().out
+
+
+def test_daemon_incompatible(
+    daemon: Daemon, monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    """Verify a client falls back, when the daemon cannot execute its command."""
+    # 1. Prepare
+    monkeypatch.setattr("bob.daemon.__version__", "0.0.0")
+    stale = tmp_path / "stale.sock"
+    stale.touch()
+
+    # 2. Execute
+    result = [forward(["stats"]), forward(["stats"], stale)]
+
+    # 3. Verify
+    assert result == [None, None]
+    assert not stop(tmp_path / "missing.sock")
+    with pytest.raises(RuntimeError, match="already listening"):
+        Daemon(run, prepare, daemon.path).serve()
+
+
+def test_socket_path(
+    cache_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+) -> None:
+    """Verify the location of the socket."""
+    # 1. Prepare
+    monkeypatch.delenv("BOB_DAEMON_SOCKET")
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    # 2. Execute
+    result = [socket_path()]
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    result.append(socket_path())
+
+    # 3. Verify
+    assert result == [tmp_path / "bob" / "daemon.sock", cache_path / "daemon.sock"]
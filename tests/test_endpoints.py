@@ -0,0 +1,221 @@
+"""Tests for distributing container builds over Docker endpoints."""
+import io
+import pathlib
+import shlex
+import subprocess
+import tarfile
+import typing
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.common import generate_container_command, generate_sync_commands
+from bob.endpoints import Endpoint, scheduler
+from bob.jobserver import Jobserver
+
+_OPTIONS = {
+    "targets": {"linux": {"toolchain": "gcc"}, "stm32": {"toolchain": "arm"}},
+    "toolchains": {"gcc": {"container": "gcc:13"}, "arm": {"container": "arm:12"}},
+}
+
+
+def _docker(
+    load: typing.Mapping[str, str],
+) -> typing.Callable[..., subprocess.CompletedProcess]:
+    def run(cmd: typing.List[str], **_: object) -> subprocess.CompletedProcess:
+        if cmd[1:3] == ["context", "inspect"]:
+            hosts = {"local": "unix:///run/docker.sock", "fleet": "ssh://fleet"}
+            if cmd[-1] not in hosts:
+                raise subprocess.CalledProcessError(1, cmd)
+            return subprocess.CompletedProcess(cmd, 0, hosts[cmd[-1]])
+        if cmd[-3] == "info":
+            if cmd[2] not in load:
+                raise subprocess.CalledProcessError(1, cmd)
+            return subprocess.CompletedProcess(cmd, 0, load[cmd[2]])
+        return subprocess.CompletedProcess(cmd, 0)
+
+    return run
+
+
+def test_scheduler(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify combinations in a container are assigned to the least loaded endpoint."""
+    # 1. Prepare
+    mocker.patch("subprocess.run", side_effect=_docker({"local": "1", "fleet": "0"}))
+    endpoints = ["local", "fleet", "tcp://down:2376"]
+    pool = scheduler({"containers": {"endpoints": endpoints}})
+    assert pool is not None
+    combinations: typing.List[typing.Dict[str, object]] = [
+        {"container": "gcc:13"},
+        {"container": "gcc:13"},
+        {"container": "gcc:13"},
+        {"container": "gcc:13", "container_session": 600},
+        {},
+    ]
+
+    # 2. Execute
+    for options in combinations:
+        pool.assign(options)
+
+    # 3. Verify
+    assert pool.endpoints == [
+        Endpoint("local", remote=False),
+        Endpoint("fleet", remote=True),
+        Endpoint("tcp://down:2376", remote=True),
+    ]
+    assigned = [x.get("container_endpoint") for x in combinations]
+    remote, local = pool.endpoints[1], pool.endpoints[0]
+    assert assigned == [remote, local, remote, None, None]
+
+
+def test_scheduler_invalid(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify unknown contexts and unavailable endpoints are reported."""
+    # 1. Prepare
+    mocker.patch("subprocess.run", side_effect=_docker({}))
+    pool = scheduler({"containers": {"endpoints": "ssh://down"}})
+    assert pool is not None
+
+    # 2. Execute & 3. Verify
+    assert scheduler({}) is None
+    with pytest.raises(ValueError, match="Unknown Docker context: missing"):
+        scheduler({"containers": {"endpoints": ["local", "missing"]}})
+    with pytest.raises(RuntimeError, match="None of the Docker endpoints"):
+        pool.assign({"container": "gcc:13"})
+
+
+def test_container_command_endpoint() -> None:
+    """Verify a remote endpoint builds in a volume, a local one mounts the codebase."""
+    # 1. Prepare
+    cwd = pathlib.Path("/project")
+    options = bob.common.parse_options({**_OPTIONS, "target": "linux"})
+    local = {**options, "container_endpoint": Endpoint("unix:///b.sock", remote=False)}
+    remote = {**options, "container_endpoint": Endpoint("fleet", remote=True)}
+    volume = remote["container_endpoint"].volume(cwd, "build/linux-release")
+
+    # 2. Execute
+    with Jobserver(2, 2) as jobserver:
+        commands = [
+            generate_container_command(local, cwd, jobserver),
+            generate_container_command(remote, cwd, jobserver),
+        ]
+    sync = [generate_sync_commands(x, cwd) for x in [options, local, remote]]
+
+    # 3. Verify
+    assert commands[0][:7] == [
+        "docker",
+        "--host",
+        "unix:///b.sock",
+        "run",
+        "--rm",
+        "-v",
+        "/project:/work/",
+    ]
+    assert "MAKEFLAGS" in commands[0][-2]
+    assert commands[1] == [
+        "docker",
+        "--context",
+        "fleet",
+        "run",
+        "--rm",
+        "-v",
+        f"{volume}:/work/",
+        "gcc:13",
+    ]
+    assert sync[:2] == [([], []), ([], [])]
+    docker = ["docker", "--context", "fleet"]
+    mount = ["-v", f"{volume}:/work/"]
+    assert sync[2] == (
+        [
+            [*docker, "rm", "--force", volume],
+            [
+                *docker,
+                "run",
+                "--rm",
+                *mount,
+                "--entrypoint",
+                "sh",
+                "gcc:13",
+                "-c",
+                "find /work -mindepth 1 -maxdepth 1 ! -name build -exec rm -rf {} +",
+            ],
+            [*docker, "create", "--name", volume, *mount, "gcc:13"],
+            [
+                "sh",
+                "-c",
+                (
+                    "tar -h -C /project --exclude=./build --exclude=./toolchains"
+                    f" --exclude=./.git -cf - . | {' '.join(docker)} cp - {volume}:/work/"
+                ),
+            ],
+        ],
+        [
+            [
+                *docker,
+                "cp",
+                f"{volume}:/work/build/linux-release/.",
+                "/project/build/linux-release",
+            ],
+            [*docker, "rm", "--force", volume],
+        ],
+    )
+
+
+def test_sync_commands_archive(tmp_path: pathlib.Path) -> None:
+    """Verify the codebase is copied without the build and host-only folders."""
+    # 1. Prepare
+    for folder in ["src/build", "build/linux-release", "toolchains/gcc", ".git"]:
+        (tmp_path / "project" / folder).mkdir(parents=True)
+        (tmp_path / "project" / folder / "file").write_text(folder)
+    (tmp_path / "shared").mkdir()
+    (tmp_path / "shared" / "file").write_text("shared")
+    (tmp_path / "project" / "external").mkdir()
+    (tmp_path / "project" / "external" / "lib").symlink_to(tmp_path / "shared")
+    options = bob.common.parse_options({**_OPTIONS, "target": "linux"})
+    options["container_endpoint"] = Endpoint("fleet", remote=True)
+    upload, _ = generate_sync_commands(options, tmp_path / "project")
+
+    # 2. Execute
+    archive, _ = upload[-1][-1].split(" | ")
+    content = subprocess.run(shlex.split(archive), check=True, capture_output=True)
+    with tarfile.open(fileobj=io.BytesIO(content.stdout)) as tar:
+        names = tar.getnames()
+
+    # 3. Verify
+    assert sorted(names) == [
+        ".",
+        "./external",
+        "./external/lib",
+        "./external/lib/file",
+        "./src",
+        "./src/build",
+        "./src/build/file",
+    ]
+
+
+def test_bob_endpoints(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify a matrix build is distributed, syncing with the remote endpoint."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    mocker.patch("subprocess.run", side_effect=_docker({"local": "0", "fleet": "0"}))
+    execute = mocker.patch("bob.executor.execute")
+    options = {
+        **_OPTIONS,
+        "target": "linux,stm32",
+        "containers": {"endpoints": ["local", "fleet"]},
+        "history": {"enabled": False},
+    }
+
+    # 2. Execute
+    bob.bob(bob.Command.Build, options)
+
+    # 3. Verify
+    jobs = {x.name: x for x in execute.call_args.args[0]}
+    assert jobs["linux-release:configure:0"][:3] == ["docker", "--context", "local"]
+    assert jobs["linux-release:configure:0"].needs == ["bob:cmake", "bob:find"]
+    assert not any(x.startswith("linux-release:upload") for x in jobs)
+
+    assert jobs["stm32-release:build:0"][:3] == ["docker", "--context", "fleet"]
+    assert jobs["stm32-release:configure:0"].needs == ["stm32-release:upload:3"]
+    assert jobs["stm32-release:upload:0"].needs == ["bob:cmake", "bob:find"]
+    assert jobs["stm32-release:download:0"].needs == ["stm32-release:build:0"]
+    assert jobs["stm32-release:download:1"][3:5] == ["rm", "--force"]
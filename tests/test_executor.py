@@ -0,0 +1,376 @@
+"""Tests for the command executor."""
+import asyncio
+import logging
+import os
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+import typing
+
+import pytest
+import pytest_mock
+
+from bob.executor import (
+    ExecutionError,
+    ExecutionTimer,
+    Job,
+    Pool,
+    execute,
+    execute_async,
+    link,
+)
+from bob.output import Output
+
+
+def _python(code: str, name: str, needs: typing.Sequence[str] = ()) -> Job:
+    return Job([sys.executable, "-c", code], name, needs)
+
+
+def test_timer() -> None:
+    """Verify the timer captures the duration of a block."""
+    with ExecutionTimer() as timer:
+        pass
+
+    assert timer.duration_ns > 0
+    assert timer.duration == pytest.approx(timer.duration_ns * 1e-9)
+
+
+def test_job_is_a_command() -> None:
+    """Verify a job compares equal to the plain command."""
+    job = Job(["cmake", "--version"], name="probe", needs=["other"])
+
+    assert job == ["cmake", "--version"]
+    assert job.name == "probe"
+    assert job.needs == ["other"]
+
+
+def test_link_plain_commands() -> None:
+    """Verify plain commands are chained and wait on the previous task."""
+    # 1. Prepare
+    commands = [["a"], ["b"]]
+
+    # 2. Execute
+    result = link(commands, "task", ["earlier"])
+
+    # 3. Verify
+    assert [x.name for x in result] == ["task:0", "task:1"]
+    assert result[0].needs == ["earlier"]
+    assert result[1].needs == ["earlier", "task:0"]
+
+
+def test_link_explicit_needs() -> None:
+    """Verify jobs with explicit dependencies keep them."""
+    # 1. Prepare
+    commands = [Job(["a"], name="a", needs=[]), Job(["b"], name="b", needs=[])]
+
+    # 2. Execute
+    result = link(commands, "task")
+
+    # 3. Verify
+    assert [x.needs for x in result] == [[], []]
+
+
+def test_execute_in_order(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify a single job slot executes the jobs in the given order."""
+    # 1. Prepare
+    mocker.patch("subprocess.run")
+    jobs = link([Job(["a"], needs=[]), Job(["b"], needs=[]), ["c"]], "task")
+
+    # 2. Execute
+    execute(jobs, 1)
+
+    # 3. Verify
+    assert subprocess.run.call_args_list == [
+        mocker.call(["a"], check=True),
+        mocker.call(["b"], check=True),
+        mocker.call(["c"], check=True),
+    ]
+
+
+def test_execute_on_success(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify the success callback is only called for succeeding jobs."""
+
+    # 1. Prepare
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd == ["fail"]:
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.run", side_effect=run)
+    succeeded = []
+    jobs = [
+        Job(["ok"], "ok", [], on_success=lambda: succeeded.append("ok")),
+        Job(["fail"], "fail", [], on_success=lambda: succeeded.append("fail")),
+    ]
+
+    # 2. Execute
+    with pytest.raises(ExecutionError):
+        execute(jobs, 1)
+
+    # 3. Verify
+    assert succeeded == ["ok"]
+
+
+def test_execute_environment(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify a job can add environment variables for its command."""
+    # 1. Prepare
+    mocker.patch("subprocess.run")
+    mocker.patch.dict("os.environ", {"KEEP": "1"})
+
+    # 2. Execute
+    execute([Job(["make"], "make", [], env={"MAKEFLAGS": "-j2"})])
+
+    # 3. Verify
+    env = subprocess.run.call_args.kwargs["env"]
+    assert env["KEEP"] == "1"
+    assert env["MAKEFLAGS"] == "-j2"
+
+
+def test_execute_working_directory(tmp_path: pathlib.Path) -> None:
+    """Verify a job executes in its own working directory, when given."""
+    # 1. Prepare
+    write = "import pathlib; pathlib.Path('{0}').write_text('{0}')"
+    folders = [tmp_path / x for x in ["sync", "output", "async"]]
+    for folder in folders:
+        folder.mkdir()
+    jobs = [_python(write.format(x.name), x.name) for x in folders]
+    for job, folder in zip(jobs, folders):
+        job.cwd = folder
+
+    # 2. Execute
+    execute(jobs[:1])
+    execute(jobs[1:2], output=Output(tmp_path / "logs", interactive=False))
+    asyncio.run(execute_async(jobs[2:], cwd=tmp_path))
+
+    # 3. Verify
+    assert all((x / x.name).exists() for x in folders)
+
+
+def test_execute_concurrently(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify independent jobs execute at the same time."""
+    # 1. Prepare
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd != ["after"]:
+            barrier.wait()
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.run", side_effect=run)
+    jobs = [
+        Job(["one"], name="one", needs=[]),
+        Job(["two"], name="two", needs=[]),
+        Job(["after"], name="after", needs=["one", "two"]),
+    ]
+
+    # 2. Execute
+    execute(jobs, 2)
+
+    # 3. Verify
+    assert subprocess.run.call_args_list[-1] == mocker.call(["after"], check=True)
+    assert [x.returncode for x in jobs] == [0, 0, 0]
+
+
+def test_execute_reports_all_failures(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify independent jobs continue after a failure and dependents are skipped."""
+
+    # 1. Prepare
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd[0].startswith("fail"):
+            raise subprocess.CalledProcessError(2, cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.run", side_effect=run)
+    jobs = [
+        Job(["fail_a"], name="a", needs=[]),
+        Job(["a_next"], name="a_next", needs=["a"]),
+        Job(["a_last"], name="a_last", needs=["a_next"]),
+        Job(["fail_b"], name="b", needs=[]),
+        Job(["c"], name="c", needs=[]),
+    ]
+
+    # 2. Execute
+    with pytest.raises(ExecutionError, match="2 command") as ex:
+        execute(jobs, 1)
+
+    # 3. Verify
+    assert [x.name for x in ex.value.failures] == ["a", "b"]
+    assert ex.value.returncode == 2  # noqa: PLR2004
+    executed = [x.args[0] for x in subprocess.run.call_args_list]
+    assert executed == [["fail_a"], ["fail_b"], ["c"]]
+
+
+def test_execute_invalid_graph() -> None:
+    """Verify the graph is validated before executing any job."""
+    with pytest.raises(ValueError, match="Duplicate"):
+        execute([Job(["a"], name="a", needs=[]), Job(["b"], name="a", needs=[])])
+
+    with pytest.raises(ValueError, match="unknown"):
+        execute([Job(["a"], name="a", needs=["b"])])
+
+    with pytest.raises(ValueError, match="cycle"):
+        execute([Job(["a"], name="a", needs=["b"]), Job(["b"], name="b", needs=["a"])])
+
+
+def test_execute_pool_limit(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify a pool limits the number of its jobs executing at once."""
+    # 1. Prepare
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        with lock:
+            active.append(cmd)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.run", side_effect=run)
+    pool = Pool("fetch", 2)
+    jobs = [Job([str(x)], str(x), [], pool=pool) for x in range(6)]
+
+    # 2. Execute
+    execute(jobs, 6)
+
+    # 3. Verify
+    assert max(peak) <= pool.depth
+    assert len(peak) == len(jobs)
+
+
+def test_execute_reports_groups(
+    mocker: pytest_mock.MockerFixture, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Verify the timing and status is reported for each group of jobs."""
+
+    # 1. Prepare
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd == ["fail"]:
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.run", side_effect=run)
+    jobs = [
+        Job(["ok"], "ok", [], group="good"),
+        Job(["fail"], "fail", [], group="bad"),
+        Job(["next"], "next", ["fail"], group="bad"),
+        Job(["other"], "other", ["fail"], group="blocked"),
+    ]
+    caplog.set_level(logging.INFO)
+
+    # 2. Execute
+    with pytest.raises(ExecutionError):
+        execute(jobs, 1)
+
+    # 3. Verify
+    assert "good: done in" in caplog.text
+    assert "bad: failed in" in caplog.text
+    assert "blocked: skipped in" in caplog.text
+
+
+def test_execute_async(tmp_path: pathlib.Path) -> None:
+    """Verify the jobs execute in the event loop, in the given working directory."""
+    # 1. Prepare
+    write = "import pathlib; pathlib.Path('{0}').write_text('{0}')"
+    check = "import pathlib, sys; sys.exit(not pathlib.Path('a').exists())"
+    jobs = [
+        _python(write.format("a"), "a"),
+        _python(check, "check", ["a"]),
+        _python("import sys; sys.exit(2)", "fail"),
+        _python(write.format("skipped"), "skipped", ["fail"]),
+    ]
+    output = Output(tmp_path / "logs", interactive=False)
+
+    # 2. Execute
+    with pytest.raises(ExecutionError) as error:
+        asyncio.run(execute_async(jobs, 2, output, cwd=tmp_path))
+
+    # 3. Verify
+    assert [x.name for x in error.value.failures] == ["fail"]
+    assert [x.returncode for x in jobs] == [0, 0, 2, None]
+    assert (tmp_path / "a").exists()
+    assert not (tmp_path / "skipped").exists()
+    assert len(list((tmp_path / "logs").iterdir())) == 3  # noqa: PLR2004
+
+
+def test_execute_async_timeout() -> None:
+    """Verify a job exceeding its timeout is terminated and fails."""
+    # 1. Prepare
+    jobs = [
+        _python("import time; time.sleep(30)", "slow"),
+        _python("import time; time.sleep(1)", "limited"),
+    ]
+    jobs[1].timeout = 60
+
+    # 2. Execute
+    with ExecutionTimer() as timer, pytest.raises(ExecutionError) as error:
+        asyncio.run(execute_async(jobs, 2, timeout=0.5))
+
+    # 3. Verify
+    assert [x.name for x in error.value.failures] == ["slow"]
+    assert jobs[0].returncode is not None
+    assert jobs[0].returncode < 0
+    assert jobs[1].returncode == 0
+    assert timer.duration < 10  # noqa: PLR2004
+
+
+def test_execute_async_cancelled() -> None:
+    """Verify cancelling the execution terminates the executing commands."""
+
+    # 1. Prepare
+    async def cancel() -> None:
+        task = asyncio.ensure_future(execute_async(jobs, 2))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        await task
+
+    jobs = [
+        _python("import time; time.sleep(30)", "slow"),
+        _python("", "after", ["slow"]),
+    ]
+
+    # 2. Execute
+    with ExecutionTimer() as timer, pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+
+    # 3. Verify
+    assert jobs[0].returncode is not None
+    assert jobs[0].returncode < 0
+    assert jobs[1].returncode is None
+    assert timer.duration < 10  # noqa: PLR2004
+
+
+def test_execute_async_cancelled_group(tmp_path: pathlib.Path) -> None:
+    """Verify cancelling the execution terminates the processes a command started."""
+
+    # 1. Prepare
+    async def cancel() -> None:
+        task = asyncio.ensure_future(execute_async(jobs, 1))
+        while not pid_file.exists() or not pid_file.read_text():  # noqa: ASYNC110
+            await asyncio.sleep(0.1)
+        task.cancel()
+        await task
+
+    pid_file = tmp_path / "pid"
+    script = f"sleep 60 & echo $! > {pid_file}; wait"
+    jobs = [Job(["sh", "-c", script], "spawning")]
+
+    # 2. Execute
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+
+    # 3. Verify
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("The grandchild is still running")
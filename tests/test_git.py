@@ -0,0 +1,121 @@
+"""Tests for the in-process git inspection."""
+import pathlib
+import subprocess
+
+import pytest
+
+from bob.git import (
+    git_dir,
+    head_revision,
+    is_checked_out,
+    peel_ref,
+    resolve_ref,
+    sparse_paths,
+)
+
+
+def _git(path: pathlib.Path, *args: str) -> str:
+    return subprocess.check_output(
+        ["git", "-C", str(path), *args], text=True  # noqa: S607
+    ).strip()
+
+
+@pytest.fixture()
+def repository(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Fixture for a repository with two commits and a tag."""
+    path = tmp_path / "repository"
+    path.mkdir()
+    _git(path, "init", "-q", "-b", "main")
+    _git(path, "config", "user.email", "bob@example.com")
+    _git(path, "config", "user.name", "Bob")
+    for index in range(2):
+        (path / "file.txt").write_text(str(index))
+        _git(path, "add", "file.txt")
+        _git(path, "commit", "-q", "-m", f"Commit {index}")
+    _git(path, "tag", "v1", "HEAD~1")
+    return path
+
+
+def test_head_revision(repository: pathlib.Path) -> None:
+    """Verify the revision is read from loose and packed references."""
+    # 1. Prepare
+    expected = _git(repository, "rev-parse", "HEAD")
+
+    # 2. Execute
+    loose = head_revision(repository)
+    _git(repository, "pack-refs", "--all")
+    packed = head_revision(repository)
+
+    # 3. Verify
+    assert loose == expected
+    assert packed == expected
+    folder = git_dir(repository)
+    assert folder is not None
+    assert resolve_ref(folder, "refs/tags/v1") == _git(repository, "rev-parse", "v1")
+    assert resolve_ref(folder, "refs/tags/v2") is None
+
+
+def test_head_revision_detached_worktree(
+    repository: pathlib.Path, tmp_path: pathlib.Path
+) -> None:
+    """Verify the revision of a detached worktree is read through its git file."""
+    # 1. Prepare
+    worktree = tmp_path / "worktree"
+    _git(repository, "worktree", "add", "-q", "--detach", str(worktree), "v1")
+    _git(repository, "worktree", "add", "-q", "-b", "other", str(tmp_path / "branch"))
+
+    # 2. Execute
+    detached = head_revision(worktree)
+    branch = head_revision(tmp_path / "branch")
+
+    # 3. Verify
+    assert detached == _git(repository, "rev-parse", "v1")
+    assert branch == _git(repository, "rev-parse", "HEAD")
+
+
+def test_head_revision_no_repository(tmp_path: pathlib.Path) -> None:
+    """Verify no revision is found outside of a repository."""
+    assert head_revision(tmp_path) is None
+    (tmp_path / ".git").write_text("not a git file")
+    assert head_revision(tmp_path) is None
+
+
+def test_is_checked_out(repository: pathlib.Path) -> None:
+    """Verify the checked out revision is compared with commits, tags and branches."""
+    # 1. Prepare
+    _git(repository, "tag", "-a", "v2", "-m", "Annotated")
+    head = _git(repository, "rev-parse", "HEAD")
+
+    # 2. Execute
+    result = [is_checked_out(repository, x) for x in ["v2", "main", head.upper(), "v1"]]
+    _git(repository, "gc", "-q")
+    packed = is_checked_out(repository, "v2")
+    _git(repository, "checkout", "-q", "v1")
+    detached = [is_checked_out(repository, x) for x in ["v1", "main", "v3"]]
+
+    # 3. Verify
+    assert result == [True, True, True, False]
+    assert packed
+    assert detached == [True, False, False]
+    folder = git_dir(repository)
+    assert folder is not None
+    assert peel_ref(folder, "refs/tags/v2") == head
+    assert peel_ref(folder, "refs/tags/v3") is None
+    assert not is_checked_out(repository.parent, "v1")
+
+
+@pytest.mark.parametrize("cone", [True, False])
+def test_sparse_paths(repository: pathlib.Path, cone: bool) -> None:  # noqa: FBT001
+    """Verify the paths of a sparse checkout are read in both modes."""
+    # 1. Prepare
+    mode = "--cone" if cone else "--no-cone"
+
+    # 2. Execute
+    before = sparse_paths(repository)
+    _git(repository, "sparse-checkout", "set", mode, "lib/a", "docs")
+    after = sparse_paths(repository)
+
+    # 3. Verify
+    assert before is None
+    assert after == {"lib/a", "docs"}
+    assert sparse_paths(repository / "missing") is None
@@ -0,0 +1,152 @@
+"""Tests for the build history."""
+import pathlib
+import sqlite3
+import subprocess
+import typing
+import unittest
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.common import parse_options
+from bob.executor import Job
+from bob.history import collect_stats, format_stats, history_path, record_run
+
+
+def _tracer(
+    mocker: pytest_mock.MockerFixture, durations: typing.Mapping[str, float]
+) -> unittest.mock.Mock:
+    jobs = []
+    start = 0
+    for name, duration in durations.items():
+        job = Job([name], name, [])
+        job.task = name.split(":")[0]
+        job.started = start
+        job.duration = duration
+        job.returncode = 0
+        jobs.append(job)
+        start += int(duration * 1e9)
+
+    elapsed = sum(durations.values()) + 0.5
+    return mocker.Mock(elapsed=elapsed, phases=[("Execute", elapsed)], jobs=jobs)
+
+
+def _combinations() -> typing.List[typing.Dict[str, typing.Any]]:
+    targets = {"linux": {}}
+    return [
+        parse_options({"target": "linux", "config": x, "targets": targets})
+        for x in ["release", "debug"]
+    ]
+
+
+def test_record_run(mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path) -> None:
+    """Verify an invocation and its steps are recorded."""
+    # 1. Prepare
+    tracer = _tracer(mocker, {"build:0": 2.0, "build:1": 1.0, "install:0": 0.5})
+
+    # 2. Execute
+    record_run(tmp_path, "install", _combinations(), tracer, 2)
+
+    # 3. Verify
+    with sqlite3.connect(history_path()) as db:
+        run = db.execute(
+            "SELECT project, command, target, config, status, revision FROM runs"
+        ).fetchall()
+        steps = db.execute("SELECT kind, name, duration FROM steps").fetchall()
+
+    assert run == [(str(tmp_path), "install", "linux", "release,debug", 2, None)]
+    assert steps == [
+        ("phase", "Execute", pytest.approx(4.0)),
+        ("task", "build", pytest.approx(3.0)),
+        ("task", "install", pytest.approx(0.5)),
+        ("command", "build:0", 2.0),
+        ("command", "build:1", 1.0),
+        ("command", "install:0", 0.5),
+    ]
+
+
+def test_record_run_error(
+    mocker: pytest_mock.MockerFixture,
+    tmp_path: pathlib.Path,
+    cache_path: pathlib.Path,
+) -> None:
+    """Verify failing to record an invocation is not an error."""
+    # 1. Prepare
+    cache_path.rmdir()
+    cache_path.write_text("not a folder")
+
+    # 2. Execute
+    record_run(tmp_path, "build", [], _tracer(mocker, {}), 0)
+
+    # 3. Verify
+    assert cache_path.is_file()
+
+
+def test_collect_stats(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify the last run is compared to the successful earlier runs."""
+    # 1. Prepare
+    for duration in [10.0, 11.0, 9.0, 10.0]:
+        tracer = _tracer(mocker, {"build:0": duration, "install:0": 1.0})
+        record_run(tmp_path, "install", _combinations(), tracer, 0)
+    tracer = _tracer(mocker, {"build:0": 50.0})
+    record_run(tmp_path, "install", _combinations(), tracer, 1)
+    tracer = _tracer(mocker, {"build:0": 2.0})
+    record_run(tmp_path, "build", _combinations(), tracer, 0)
+    tracer = _tracer(mocker, {"build:0": 13.0, "install:0": 1.0})
+    record_run(tmp_path, "install", _combinations(), tracer, 0)
+
+    # 2. Execute
+    stats = {x.name: x for x in collect_stats(tmp_path) if x.kind == "command"}
+    report = format_stats(collect_stats(tmp_path), 20)
+
+    # 3. Verify
+    assert set(stats) == {"build:0", "install:0"}
+    assert stats["build:0"].durations == [10.0, 11.0, 9.0, 10.0]
+    assert stats["build:0"].last == stats["build:0"].percentile(90)
+    assert stats["build:0"].baseline == stats["build:0"].percentile(50)
+    assert stats["build:0"].is_slower(20)
+    assert not stats["build:0"].is_slower(40)
+    assert not stats["install:0"].is_slower(20)
+
+    lines = {x.split()[1]: x for x in report.splitlines()}
+    assert lines["build:0"].endswith("SLOWER")
+    assert "+30%" in lines["build:0"]
+    assert not lines["install:0"].endswith("SLOWER")
+    assert lines["install"].split()[2] == "5"
+
+
+def test_collect_stats_without_history(tmp_path: pathlib.Path) -> None:
+    """Verify no statistics are collected without history."""
+    assert collect_stats(tmp_path) == []
+    history_path().parent.mkdir(parents=True, exist_ok=True)
+    sqlite3.connect(history_path()).close()
+    assert collect_stats(tmp_path) == []
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_bob_records_history(
+    mocker: pytest_mock.MockerFixture, enabled: bool  # noqa: FBT001
+) -> None:
+    """Verify each invocation is recorded, unless disabled."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run")
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+    subprocess.run.side_effect = subprocess.CalledProcessError(3, ["cmake"])
+    options = {"target": "native", "config": "debug", "history": {"enabled": enabled}}
+
+    # 2. Execute
+    with pytest.raises(subprocess.CalledProcessError):
+        bob.bob(bob.Command.Configure, options)
+
+    # 3. Verify
+    runs = []
+    if history_path().exists():
+        with sqlite3.connect(history_path()) as db:
+            runs = db.execute(
+                "SELECT command, target, config, status FROM runs"
+            ).fetchall()
+    assert runs == ([("configure", "native", "debug", 3)] if enabled else [])
@@ -0,0 +1,146 @@
+"""Tests for the jobserver."""
+import os
+import pathlib
+import stat
+import typing
+
+import pytest
+
+from bob.common import parse_options
+from bob.executor import Job
+from bob.jobserver import CONTAINER_FIFO, Jobserver, supports_jobserver
+from bob.tasks.build import generate_commands
+
+
+def _fake_tool(folder: pathlib.Path, name: str, output: str) -> pathlib.Path:
+    path = folder / name
+    path.write_text(f"#!/bin/sh\necho '{output}'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return path
+
+
+def _configured(build_path: pathlib.Path, program: pathlib.Path) -> pathlib.Path:
+    build_path.mkdir(parents=True, exist_ok=True)
+    (build_path / "CMakeCache.txt").write_text(
+        f"CMAKE_BUILD_TYPE:STRING=Release\nCMAKE_MAKE_PROGRAM:FILEPATH={program}\n"
+    )
+    return build_path
+
+
+def test_jobserver_tokens() -> None:
+    """Verify the clients own a slot each, the other slots are available as tokens."""
+    # 1. Prepare
+    jobserver = Jobserver(4, 2)
+
+    # 2. Execute
+    with jobserver:
+        path = jobserver.path
+        assert path is not None
+        assert stat.S_ISFIFO(path.stat().st_mode)
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        tokens = os.read(fd, 16)
+        os.close(fd)
+        makeflags = jobserver.makeflags()
+
+    # 3. Verify
+    assert tokens == b"++"
+    assert makeflags == f"-j4 --jobserver-auth=fifo:{path}"
+    assert not path.exists()
+    assert jobserver.path is None
+
+
+@pytest.mark.parametrize(
+    ("name", "output", "expected"),
+    [
+        ("ninja", "1.13.0", True),
+        ("ninja", "1.11.1", False),
+        ("make", "GNU Make 4.4.1", True),
+        ("make", "GNU Make 4.3", False),
+        ("msbuild", "17.0", False),
+    ],
+)
+def test_supports_jobserver(
+    tmp_path: pathlib.Path, name: str, output: str, expected: bool  # noqa: FBT001
+) -> None:
+    """Verify the build tool version is checked for jobserver support."""
+    # 1. Prepare
+    program = _fake_tool(tmp_path, name, output)
+    build_path = _configured(tmp_path / "build", program)
+
+    # 2. Execute
+    result = supports_jobserver(build_path)
+
+    # 3. Verify
+    assert result == expected
+
+
+def test_supports_jobserver_unknown(tmp_path: pathlib.Path) -> None:
+    """Verify the jobserver is not used for unconfigured builds or missing tools."""
+    assert not supports_jobserver(tmp_path)
+
+    (tmp_path / "CMakeCache.txt").write_text("CMAKE_BUILD_TYPE:STRING=Release\n")
+    assert not supports_jobserver(tmp_path)
+
+    _configured(tmp_path, tmp_path / "missing" / "ninja")
+    assert not supports_jobserver(tmp_path)
+
+
+def test_build_with_jobserver(tmp_path: pathlib.Path) -> None:
+    """Verify a supported build tool receives the jobserver."""
+    # 1. Prepare
+    program = _fake_tool(tmp_path, "ninja", "1.13.0")
+    _configured(tmp_path / "build" / "native-release", program)
+    options = parse_options({})
+    options["parallel"] = 2
+    env = {"root_path": tmp_path, "build_path": pathlib.Path("build/native-release")}
+
+    # 2. Execute
+    with Jobserver(4, 2) as jobserver:
+        options["jobserver"] = jobserver
+        result = generate_commands(options, env)
+        makeflags = jobserver.makeflags()
+
+    # 3. Verify
+    assert result == [["cmake", "--build", "build/native-release"]]
+    assert isinstance(result[0], Job)
+    assert result[0].env == {"MAKEFLAGS": makeflags}
+
+
+@pytest.mark.parametrize(
+    ("toolchain", "containers", "shared"),
+    [
+        ({"jobserver": True}, {}, True),
+        ({}, {}, False),
+        ({"jobserver": True}, {"session": True}, False),
+    ],
+)
+def test_build_with_jobserver_in_container(
+    tmp_path: pathlib.Path,
+    toolchain: typing.Dict[str, bool],
+    containers: typing.Dict[str, bool],
+    shared: bool,  # noqa: FBT001
+) -> None:
+    """Verify the jobserver is shared with a container, when declared supported."""
+    # 1. Prepare
+    options = parse_options(
+        {
+            "target": "linux",
+            "toolchains": {"linux": {"container": "builder", **toolchain}},
+            "targets": {"linux": {"toolchain": "linux"}},
+            "containers": containers,
+        }
+    )
+    options["parallel"] = 2
+    env = {"root_path": tmp_path, "build_path": pathlib.Path("build/linux-release")}
+
+    # 2. Execute
+    with Jobserver(4, 2) as jobserver:
+        options["jobserver"] = jobserver
+        command = generate_commands(options, env)[-1]
+        mount = f"{jobserver.path}:{CONTAINER_FIFO}"
+        makeflags = f"MAKEFLAGS={jobserver.makeflags(CONTAINER_FIFO)}"
+
+    # 3. Verify
+    assert (mount in command) == shared
+    assert (makeflags in command) == shared
+    assert (command[-2:] == ["--parallel", "2"]) != shared
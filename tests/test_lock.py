@@ -0,0 +1,91 @@
+"""Tests for the lock file of a bootstrap."""
+import pathlib
+
+import pytest
+
+from bob.lock import (
+    LOCK_FILE,
+    Lock,
+    diff_manifest,
+    manifest_path,
+    read_manifest,
+    tree_manifest,
+    write_manifest,
+)
+
+_DEPENDENCY = {"repository": "https://example.com/lib.git", "tag": "v1"}
+
+
+def test_lock_round_trip(tmp_path: pathlib.Path) -> None:
+    """Verify entries are saved and only match an unchanged configuration."""
+    # 1. Prepare
+    lock = Lock(tmp_path / LOCK_FILE)
+    lock.save()
+    assert not (tmp_path / LOCK_FILE).exists()
+    lock.lock_dependency("lib", _DEPENDENCY, "a" * 40)
+    lock.lock_dependency("missing", _DEPENDENCY, None)
+    lock.lock_toolchain("gcc", "https://example.com/gcc.tar.xz", None, ["gcc"], [])
+    lock.save()
+    written = (tmp_path / LOCK_FILE).stat().st_mtime_ns
+
+    # 2. Execute
+    loaded = Lock(tmp_path / LOCK_FILE)
+    loaded.save()
+
+    # 3. Verify
+    assert (tmp_path / LOCK_FILE).stat().st_mtime_ns == written
+    assert loaded.dependency("lib", _DEPENDENCY) == "a" * 40
+    assert loaded.dependency("lib", {**_DEPENDENCY, "tag": "v2"}) is None
+    assert loaded.dependency("missing", _DEPENDENCY) is None
+    assert loaded.toolchain("gcc", "https://example.com/gcc.tar.xz") is not None
+    assert loaded.toolchain("gcc", "https://example.com/gcc-2.tar.xz") is None
+    assert loaded.toolchain("gcc", "https://example.com/gcc.tar.xz", "ab") is None
+
+    loaded.retain([], ["gcc"])
+    assert loaded.dependencies == {}
+    assert list(loaded.toolchains) == ["gcc"]
+
+
+def test_lock_invalid(tmp_path: pathlib.Path) -> None:
+    """Verify an invalid lock file is reported."""
+    # 1. Prepare
+    path = tmp_path / LOCK_FILE
+
+    # 2. Execute & 3. Verify
+    path.write_text("version = ")
+    with pytest.raises(ValueError, match="Invalid lock file"):
+        Lock(path)
+    path.write_text("version = 2")
+    with pytest.raises(ValueError, match="Unsupported lock file version: 2"):
+        Lock(path)
+
+
+def test_tree_manifest(tmp_path: pathlib.Path) -> None:
+    """Verify the manifest lists files, folders and links, and their differences."""
+    # 1. Prepare
+    (tmp_path / "tool" / "bin").mkdir(parents=True)
+    (tmp_path / "tool" / "bin" / "cc").write_text("cc")
+    (tmp_path / "tool" / "cc").symlink_to("bin/cc")
+    path = manifest_path(tmp_path, "tool")
+
+    # 2. Execute
+    manifest = tree_manifest(tmp_path, ["tool", "missing"])
+    write_manifest(path, tree_manifest(tmp_path, ["tool"], local=True), "digest")
+    stored = read_manifest(path, "digest")
+    (tmp_path / "tool" / "bin" / "cc").write_text("CC")
+    rewritten = tree_manifest(tmp_path, ["tool"], local=True)
+    for index in range(12):
+        (tmp_path / "tool" / f"{index:02d}").touch()
+    changed = diff_manifest(stored, tree_manifest(tmp_path, ["tool"], local=True))
+
+    # 3. Verify
+    assert manifest == ["tool/", "tool/bin/", "tool/bin/cc 2", "tool/cc -> bin/cc"]
+    assert stored is not None
+    assert stored[2].startswith("tool/bin/cc 2 ")
+    assert rewritten != stored
+    assert tree_manifest(tmp_path, ["tool/bin"]) == ["tool/bin/", "tool/bin/cc 2"]
+    assert changed[0].startswith("+ tool/00 0 ")
+    assert changed[-1] == "... and 4 more"
+    assert read_manifest(path, "other") is None
+    assert read_manifest(tmp_path / "missing", "digest") is None
+    assert diff_manifest(None, manifest) == []
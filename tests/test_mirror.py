@@ -0,0 +1,61 @@
+"""Tests for the mirrors of repositories in the user-wide cache."""
+import concurrent.futures
+import pathlib
+import subprocess
+
+import pytest
+import pytest_mock
+
+from bob.mirror import main, update
+
+
+@pytest.fixture()
+def remote(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Fixture for a local repository with a single commit."""
+    path = tmp_path / "remote"
+    path.mkdir()
+    identity = ["-c", "user.name=bob", "-c", "user.email=bob@example.com"]
+    for args in [["init", "-q"], ["commit", "-q", "--allow-empty", "-m", "initial"]]:
+        subprocess.run(["git", *identity, *args], cwd=path, check=True)  # noqa: S607
+    return path
+
+
+def test_update_concurrently(remote: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    """Verify concurrent updates of a new mirror clone it once, then fetch."""
+    # 1. Prepare
+    mirror = tmp_path / "cache" / "remote.git"
+    partial = mirror.with_name("remote.git.part")
+    partial.mkdir(parents=True)
+    (partial / "HEAD").write_text("interrupted")
+
+    # 2. Execute
+    with concurrent.futures.ThreadPoolExecutor(4) as workers:
+        list(workers.map(lambda _: update(str(remote), mirror), range(4)))
+
+    # 3. Verify
+    assert (mirror / "HEAD").read_text().startswith("ref:")
+    assert sorted(x.name for x in mirror.parent.iterdir()) == [
+        "remote.git",
+        "remote.git.lock",
+    ]
+
+
+def test_update_failed(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify a failed clone leaves no mirror behind."""
+    # 1. Prepare
+    mirror = tmp_path / "remote.git"
+
+    def clone(cmd: list, **_: object) -> None:
+        pathlib.Path(cmd[-1]).mkdir()
+        raise subprocess.CalledProcessError(128, cmd)
+
+    mocker.patch("subprocess.run", side_effect=clone)
+
+    # 2. Execute
+    result = main(["https://example.com/remote.git", str(mirror)])
+
+    # 3. Verify
+    assert result == 128  # noqa: PLR2004
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["remote.git.lock"]
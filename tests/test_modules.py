@@ -0,0 +1,71 @@
+"""Tests for the task loader."""
+import importlib.metadata
+import sys
+import types
+import typing
+
+import pytest
+import pytest_mock
+
+from bob import modules
+from bob.api import Command
+
+
+@pytest.fixture()
+def registry() -> typing.Iterator[None]:
+    """Fixture resetting the task registry before and after a test."""
+    modules._registry.cache_clear()  # noqa: SLF001
+    modules._load_task.cache_clear()  # noqa: SLF001
+    yield
+    modules._registry.cache_clear()  # noqa: SLF001
+    modules._load_task.cache_clear()  # noqa: SLF001
+
+
+@pytest.mark.usefixtures("registry")
+def test_get_task_builtin(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify the tasks are only scanned once."""
+    # 1. Prepare
+    scan = mocker.spy(modules.pkgutil, "iter_modules")
+
+    # 2. Execute
+    configure = modules.get_task(Command.Configure)
+    build = modules.get_task(Command.Build)
+
+    # 3. Verify
+    assert configure.__name__ == "bob.tasks.configure"
+    assert build.__name__ == "bob.tasks.build"
+    assert modules.get_task("configure") is configure
+    assert scan.call_count == 1
+    assert {"bootstrap", "configure", "build", "install"} <= set(modules.list_tasks())
+
+
+@pytest.mark.usefixtures("registry")
+def test_get_task_entry_point(
+    mocker: pytest_mock.MockerFixture, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Verify tasks are loaded from entry points, when first used."""
+    # 1. Prepare
+    plugin = types.ModuleType("bob_plugin")
+    mocker.patch.dict(sys.modules, {"bob_plugin": plugin})
+    entry_points = [
+        importlib.metadata.EntryPoint("lint", "bob_plugin", modules.ENTRY_POINT_GROUP),
+        importlib.metadata.EntryPoint("build", "other", modules.ENTRY_POINT_GROUP),
+    ]
+    mocker.patch.object(modules, "_entry_points", return_value=entry_points)
+
+    # 2. Execute
+    tasks = modules.list_tasks()
+    result = modules.get_task("lint")
+
+    # 3. Verify
+    assert "lint" in tasks
+    assert result is plugin
+    assert modules.get_task(Command.Build).__name__ == "bob.tasks.build"
+    assert "Ignoring task `build`" in caplog.text
+
+
+@pytest.mark.usefixtures("registry")
+def test_get_task_unknown() -> None:
+    """Verify an unknown task is reported."""
+    with pytest.raises(ValueError, match="No corresponding task"):
+        modules.get_task("unknown")
@@ -0,0 +1,130 @@
+"""Tests for capturing the output of commands."""
+import pathlib
+import subprocess
+import sys
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.executor import Job, execute, link
+from bob.output import Output
+
+_SCRIPT = """
+import sys
+print("[1/2] Building a.o", flush=True)
+print("warning: b", file=sys.stderr, flush=True)
+print("[2/2] Linking app", flush=True)
+print("done")
+sys.exit(int(sys.argv[1]))
+"""
+
+
+def _job(name: str, returncode: int = 0) -> Job:
+    return Job([sys.executable, "-c", _SCRIPT, str(returncode)], name)
+
+
+def test_output_captured(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture) -> None:
+    """Verify the output is written to a timestamped log and to the terminal."""
+    # 1. Prepare
+    output = Output(tmp_path / "logs", interactive=False)
+
+    # 2. Execute
+    result = output.run(_job("linux-release:build:0"))
+
+    # 3. Verify
+    assert result == 0
+    log = (tmp_path / "logs" / "linux-release_build_0.log").read_text().splitlines()
+    assert log[0].startswith(f"# {sys.executable} -c")
+    assert log[1].startswith("# started ")
+    assert sorted(x.split("] ", 1)[1] for x in log[2:-1]) == [
+        "stderr: warning: b",
+        "stdout: [1/2] Building a.o",
+        "stdout: [2/2] Linking app",
+        "stdout: done",
+    ]
+    assert log[-1].startswith("# exit code 0 after ")
+
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "linux-release:build:0 | [1/2] Building a.o",
+        "linux-release:build:0 | [2/2] Linking app",
+        "linux-release:build:0 | done",
+    ]
+    assert captured.err == "linux-release:build:0 | warning: b\n"
+
+
+def test_output_status(capsys: pytest.CaptureFixture, tmp_path: pathlib.Path) -> None:
+    """Verify the progress of concurrent builds is combined in a status line."""
+    # 1. Prepare
+    output = Output(tmp_path, interactive=True)
+    first = output.open(Job(["a"], "a"))
+    second = output.open(Job(["b"], "b"))
+
+    # 2. Execute
+    first.line("stdout", b"[1/4] Building x.o\n")
+    second.line("stdout", b"[3/4] Building y.o\n")
+    status = output.status()
+    first.line("stdout", b"compiler output\n")
+    first.close(0)
+    finished = output.status()
+    second.close(0)
+    output.close()
+
+    # 3. Verify
+    assert status.startswith("[4/8 50%] ETA ")
+    assert status.endswith(" a 1/4, b 3/4")
+    assert finished.startswith("[7/8 87%] ETA ")
+    assert finished.endswith(" b 3/4")
+    assert output.status() == "[8/8 100%] "
+
+    captured = capsys.readouterr().out
+    assert "a | compiler output\n" in captured
+    assert "Building" not in captured
+    assert captured.endswith("\n")
+
+
+def test_output_failure(tmp_path: pathlib.Path) -> None:
+    """Verify a failing command is reported after capturing its output."""
+    # 1. Prepare
+    output = Output(tmp_path, interactive=False)
+
+    # 2. Execute
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        output.run(_job("failing", 3))
+
+    # 3. Verify
+    assert error.value.returncode == 3  # noqa: PLR2004
+    log = (tmp_path / "failing.log").read_text().splitlines()
+    assert log[-1].startswith("# exit code 3 after ")
+
+
+def test_execute_with_output(tmp_path: pathlib.Path) -> None:
+    """Verify the executor captures the output of each job, when requested."""
+    # 1. Prepare
+    output = Output(tmp_path, interactive=False)
+    jobs = link([_job("a"), _job("b", 1)], "task")
+    jobs[1].needs = []
+
+    # 2. Execute
+    with pytest.raises(subprocess.CalledProcessError):
+        execute(jobs, 2, output)
+
+    # 3. Verify
+    assert [x.returncode for x in jobs] == [0, 1]
+    assert {x.name for x in tmp_path.iterdir()} == {"a.log", "b.log"}
+
+
+def test_bob_log_dir(mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path) -> None:
+    """Verify each invocation writes its logs to a new folder."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    run = mocker.patch("bob.output.Output.run", return_value=0)
+    options = {"target": "native", "output": {"log_dir": str(tmp_path)}}
+
+    # 2. Execute
+    bob.bob(bob.Command.Configure, options)
+
+    # 3. Verify
+    assert run.called
+    assert len(list(tmp_path.iterdir())) == 1
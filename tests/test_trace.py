@@ -0,0 +1,93 @@
+"""Tests for the execution trace."""
+import json
+import pathlib
+import subprocess
+import typing
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.executor import ExecutionError, Job
+from bob.trace import Tracer
+
+
+def _job(name: str, started: typing.Optional[int], duration: float) -> Job:
+    job = Job([name], name, [])
+    job.task = "task"
+    job.started = started
+    job.duration = duration
+    job.returncode = None if started is None else 0
+    return job
+
+
+def test_trace_tracks() -> None:
+    """Verify overlapping commands are placed on separate tracks."""
+    # 1. Prepare
+    tracer = Tracer()
+    with tracer.phase("Execute"):
+        pass
+
+    jobs = [
+        _job("a", 1_000_000_000, 1.0),
+        _job("b", 1_500_000_000, 1.0),
+        _job("c", 2_000_000_000, 0.5),
+        _job("skipped", None, 0.0),
+    ]
+    tracer.add_jobs(jobs)
+
+    # 2. Execute
+    events = tracer.events()
+
+    # 3. Verify
+    phases = [x for x in events if x.get("cat") == "phase"]
+    assert [x["name"] for x in phases] == ["Execute"]
+    commands = {x["name"]: x for x in events if x.get("cat") == "command"}
+    assert set(commands) == {"a", "b", "c"}
+    assert commands["a"]["tid"] == commands["c"]["tid"]
+    assert commands["a"]["tid"] != commands["b"]["tid"]
+    assert commands["a"]["dur"] == pytest.approx(1e6)
+    assert commands["b"]["ts"] - commands["a"]["ts"] == pytest.approx(5e5)
+    assert commands["a"]["args"] == {"command": "a", "returncode": 0, "task": "task"}
+    tracks = [x for x in events if x["ph"] == "M" and x["tid"] > 0]
+    assert len(tracks) == 2  # noqa: PLR2004
+
+
+def test_bob_trace_file(
+    mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path
+) -> None:
+    """Verify the trace is written, including the phases and failed commands."""
+
+    # 1. Prepare
+    def run(cmd: typing.List[str], **_: bool) -> subprocess.CompletedProcess:
+        if cmd[:2] == ["cmake", "-B"]:
+            raise subprocess.CalledProcessError(3, cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    mocker.patch("subprocess.check_output")
+    mocker.patch("subprocess.run", side_effect=run)
+
+    subprocess.check_output.return_value = "dummy string 4.0.1"
+
+    trace_file = tmp_path / "trace.json"
+    options = {"target": "native", "trace_file": str(trace_file)}
+
+    # 2. Execute
+    with pytest.raises(ExecutionError):
+        bob.bob(bob.Command.Build, options)
+
+    # 3. Verify
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    phases = [x["name"] for x in events if x.get("cat") == "phase"]
+    assert phases == [
+        "Probe tools",
+        "Resolve tasks",
+        "Parse options",
+        "Generate commands",
+        "Execute",
+    ]
+    commands = {x["name"]: x["args"] for x in events if x.get("cat") == "command"}
+    assert commands["configure:0"]["returncode"] == 3  # noqa: PLR2004
+    assert commands["configure:0"]["task"] == "configure"
+    assert commands["bob:cmake"]["task"] == "bootstrap"
+    assert "build:0" not in commands
@@ -0,0 +1,215 @@
+"""Tests for rebuilding a project once its sources change."""
+import asyncio
+import contextlib
+import pathlib
+import shutil
+import subprocess
+import time
+import typing
+
+import pytest
+import pytest_mock
+
+from bob.api import Command
+from bob.watch import Inotify, Scope, SourceTree, watch
+
+_TIMEOUT = 10.0
+
+
+def _changes(
+    tree: SourceTree, inotify: Inotify, change: typing.Callable[[], object]
+) -> typing.Optional[Scope]:
+    change()
+    time.sleep(0.05)
+    return tree.changes(inotify.read())
+
+
+async def _until(condition: typing.Callable[[], bool]) -> None:
+    deadline = time.monotonic() + _TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_source_tree(tmp_path: pathlib.Path) -> None:
+    """Verify the scope of each change, ignoring the files bob and git ignore."""
+    # 1. Prepare
+    git = ["git", "init", "-q", str(tmp_path)]
+    subprocess.run(git, check=True)
+    (tmp_path / ".gitignore").write_text("*.o\nignored/\n")
+    for folder in ["src", "ignored", "build", "cmake"]:
+        (tmp_path / folder).mkdir()
+    (tmp_path / "CMakeLists.txt").write_text("project(app)")
+    (tmp_path / "cmake" / "Findbob.cmake").write_text("# bob")
+    (tmp_path / "bob.toml").write_text("")
+
+    # 2. Execute
+    with Inotify() as inotify:
+        tree = SourceTree(tmp_path, inotify, ["trace.json"])
+        tree.add(tmp_path)
+        folders = set(inotify.folders.values())
+        result = [
+            _changes(tree, inotify, lambda: (tmp_path / "src" / "a.c").write_text("")),
+            _changes(tree, inotify, lambda: (tmp_path / "src" / "a.o").write_text("")),
+            _changes(tree, inotify, lambda: (tmp_path / "build" / "x").write_text("")),
+            _changes(tree, inotify, lambda: (tmp_path / "trace.json").write_text("")),
+            _changes(tree, inotify, lambda: (tmp_path / "bob.lock").write_text("")),
+            _changes(
+                tree,
+                inotify,
+                lambda: (tmp_path / "cmake" / "Findbob.cmake").write_text("# bob"),
+            ),
+            _changes(
+                tree,
+                inotify,
+                lambda: (tmp_path / "cmake" / "Findbob.cmake").write_text("# new"),
+            ),
+            _changes(tree, inotify, lambda: (tmp_path / "bob.toml").write_text("[a]")),
+            _changes(tree, inotify, (tmp_path / "src" / "sub").mkdir),
+            _changes(
+                tree,
+                inotify,
+                lambda: (tmp_path / "src" / "sub" / "CMakeLists.txt").write_text(""),
+            ),
+            _changes(tree, inotify, lambda: shutil.rmtree(tmp_path / "src" / "sub")),
+            _changes(tree, inotify, lambda: shutil.rmtree(tmp_path / "src")),
+        ]
+
+    # 3. Verify
+    assert folders == {tmp_path, tmp_path / "src", tmp_path / "cmake"}
+    assert result == [
+        Scope.Build,
+        None,
+        None,
+        None,
+        None,
+        None,
+        Scope.Configure,
+        Scope.Bootstrap,
+        None,
+        Scope.Configure,
+        Scope.Configure,
+        Scope.Build,
+    ]
+
+
+def test_source_tree_workspace(tmp_path: pathlib.Path) -> None:
+    """Verify the folders bob writes to are ignored in each member of a workspace."""
+    # 1. Prepare
+    git = ["git", "init", "-q", str(tmp_path)]
+    subprocess.run(git, check=True)
+    (tmp_path / "bob.toml").write_text('[workspace]\nmembers = ["app", "lib"]')
+    for folder in ["app/src", "app/build", "app/external"]:
+        (tmp_path / folder).mkdir(parents=True)
+    (tmp_path / "app" / "bob.toml").write_text("")
+
+    # 2. Execute
+    with Inotify() as inotify:
+        tree = SourceTree(tmp_path, inotify)
+        tree.add(tmp_path)
+        folders = set(inotify.folders.values())
+        app = tmp_path / "app"
+        result = [
+            _changes(tree, inotify, lambda: (app / "build" / "a.o").write_text("")),
+            _changes(tree, inotify, lambda: (app / "src" / "a.c").write_text("")),
+            _changes(tree, inotify, (tmp_path / "lib").mkdir),
+            _changes(
+                tree, inotify, lambda: (tmp_path / "lib" / "bob.toml").write_text("")
+            ),
+            _changes(tree, inotify, (tmp_path / "lib" / "build").mkdir),
+        ]
+
+    # 3. Verify
+    assert folders == {tmp_path, tmp_path / "app", tmp_path / "app" / "src"}
+    assert result == [None, Scope.Build, None, Scope.Bootstrap, None]
+
+
+def test_watch(mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path) -> None:
+    """Verify a build is cancelled by a change, and a failed step is repeated."""
+    # 1. Prepare
+    mocker.patch("bob.watch.DEBOUNCE", 0.01)
+    calls: typing.List[typing.Tuple[typing.List[Command], bool]] = []
+    cancelled: typing.List[int] = []
+
+    async def rebuild(command: Command, options: dict, **_: object) -> None:
+        assert command == Command.Build
+        calls.append((options.get("skip_tasks", []), options.get("reconfigure", False)))
+        if len(calls) == 2:  # noqa: PLR2004
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(len(calls))
+                raise
+        if len(calls) == 3:  # noqa: PLR2004
+            raise ValueError
+
+    mocker.patch("bob.watch.bob_async", side_effect=rebuild)
+
+    async def run() -> None:
+        task = asyncio.ensure_future(watch(Command.Build, dict, tmp_path))
+        await _until(lambda: len(calls) == 1)
+        (tmp_path / "a.c").write_text("a")
+        await _until(lambda: len(calls) == 2)  # noqa: PLR2004
+        (tmp_path / "CMakeLists.txt").write_text("project(app)")
+        await _until(lambda: len(calls) == 3)  # noqa: PLR2004
+        (tmp_path / "a.c").write_text("b")
+        await _until(lambda: len(calls) == 4)  # noqa: PLR2004
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    # 2. Execute
+    asyncio.run(run())
+
+    # 3. Verify
+    configure = ([Command.Bootstrap], True)
+    assert calls == [
+        ([], False),
+        ([Command.Bootstrap, Command.Configure], False),
+        configure,
+        configure,
+    ]
+    assert cancelled == [2]
+
+
+def test_watch_error(mocker: pytest_mock.MockerFixture, tmp_path: pathlib.Path) -> None:
+    """Verify an unexpected error fails the rebuild, without ending the watch."""
+    # 1. Prepare
+    mocker.patch("bob.watch.DEBOUNCE", 0.01)
+    calls: typing.List[dict] = []
+
+    async def rebuild(_: Command, options: dict, **__: object) -> None:
+        calls.append(options)
+        if len(calls) == 1:
+            raise FileNotFoundError("cmake")
+        if len(calls) == 2:  # noqa: PLR2004
+            raise OSError("log dir")
+
+    mocker.patch("bob.watch.bob_async", side_effect=rebuild)
+
+    async def run() -> None:
+        task = asyncio.ensure_future(watch(Command.Build, dict, tmp_path))
+        await _until(lambda: len(calls) == 1)
+        (tmp_path / "a.c").write_text("a")
+        await _until(lambda: len(calls) == 2)  # noqa: PLR2004
+        (tmp_path / "a.c").write_text("b")
+        await _until(lambda: len(calls) == 3)  # noqa: PLR2004
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    # 2. Execute
+    asyncio.run(run())
+
+    # 3. Verify
+    assert calls == [{}, {}, {}]
+
+
+def test_watch_unavailable(mocker: pytest_mock.MockerFixture) -> None:
+    """Verify watching fails when inotify is not available."""
+    # 1. Prepare
+    mocker.patch("ctypes.util.find_library", return_value="missing-libc.so")
+
+    # 2. Execute & 3. Verify
+    with pytest.raises(RuntimeError, match="requires inotify"):
+        Inotify()
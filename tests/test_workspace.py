@@ -0,0 +1,168 @@
+"""Tests for workspaces of several projects."""
+import pathlib
+import typing
+
+import pytest
+import pytest_mock
+
+import bob
+from bob.workspace import (
+    discover,
+    link_dependencies,
+    share_dependencies,
+    shared_options,
+    width,
+)
+
+_FMT = '[dependencies.fmt]\nrepository = "https://example.com/fmt.git"\ntag = "10.0"\n'
+
+
+def _member(root: pathlib.Path, folder: str, config: str = "") -> pathlib.Path:
+    path = root / folder
+    path.mkdir(parents=True)
+    (path / "bob.toml").write_text(config)
+    return path
+
+
+def test_discover(tmp_path: pathlib.Path) -> None:
+    """Verify members are ordered after their dependencies, using the defaults."""
+    # 1. Prepare
+    _member(tmp_path, "app", '[workspace]\ndepends = ["core", "util"]\n')
+    _member(tmp_path, "libs/util", '[workspace]\ndepends = ["core"]\n')
+    _member(tmp_path, "libs/base", '[workspace]\nname = "core"\n' + _FMT)
+    _member(tmp_path, "libs/net", '[dependencies]\nfolder = "deps"\n' + _FMT)
+    (tmp_path / "libs" / "docs").mkdir()
+    options = {
+        "workspace": {"members": ["libs/*", "app", "libs/util"]},
+        "jobs": 4,
+        "dependencies": {"mirror": True},
+    }
+
+    # 2. Execute
+    members = discover(tmp_path, options)
+
+    # 3. Verify
+    assert [x.name for x in members] == ["core", "net", "util", "app"]
+    assert [x.path for x in members] == [
+        tmp_path / "libs" / "base",
+        tmp_path / "libs" / "net",
+        tmp_path / "libs" / "util",
+        tmp_path / "app",
+    ]
+    assert members[0].options["jobs"] == 4  # noqa: PLR2004
+    assert members[0].options["dependencies"]["mirror"] is True
+    assert members[0].options["dependencies"]["fmt"]["tag"] == "10.0"
+    assert members[1].options["dependencies"]["folder"] == str(
+        tmp_path / "libs" / "net" / "deps"
+    )
+    assert "workspace" not in members[3].options
+    assert width(members) == 2  # noqa: PLR2004
+    assert set(share_dependencies(members)) == {"fmt"}
+
+
+@pytest.mark.parametrize(
+    ("configs", "message"),
+    [
+        ({}, "No workspace members match"),
+        ({"a": "[invalid"}, "Invalid configuration"),
+        ({"a": "", "b": '[workspace]\nname = "a"\n'}, "Duplicate"),
+        ({"workspace": ""}, "Reserved"),
+        ({"a": '[workspace]\ndepends = ["c"]\n'}, "unknown members"),
+        (
+            {
+                "a": '[workspace]\ndepends = ["b"]\n',
+                "b": '[workspace]\ndepends = ["a"]',
+            },
+            "depend on each other",
+        ),
+    ],
+)
+def test_discover_invalid(
+    tmp_path: pathlib.Path, configs: typing.Dict[str, str], message: str
+) -> None:
+    """Verify invalid workspaces are rejected."""
+    # 1. Prepare
+    for folder, config in configs.items():
+        _member(tmp_path, folder, config)
+
+    # 2. Execute & 3. Verify
+    with pytest.raises(ValueError, match=message):
+        discover(tmp_path, {"workspace": {"members": "*"}})
+
+
+def test_link_dependencies(tmp_path: pathlib.Path) -> None:
+    """Verify shared dependencies are linked, unless a member has its own checkout."""
+    # 1. Prepare
+    for folder in ["one", "two", "three"]:
+        _member(tmp_path, folder, _FMT)
+    (tmp_path / "two" / "external" / "fmt").mkdir(parents=True)
+    (tmp_path / "three" / "external").mkdir()
+    shared_folder = tmp_path / "external"
+    (tmp_path / "three" / "external" / "fmt").symlink_to(shared_folder / "fmt")
+    members = discover(tmp_path, {"workspace": {"members": ["one", "two", "three"]}})
+    shared = share_dependencies(members)
+
+    # 2. Execute
+    result = [link_dependencies(x, shared, shared_folder) for x in members]
+
+    # 3. Verify
+    assert result[0][0]["dependencies"] == {}
+    assert result[0][1] == [
+        ["cmake", "-E", "make_directory", str(tmp_path / "one" / "external")],
+        [
+            "cmake",
+            "-E",
+            "create_symlink",
+            str(shared_folder / "fmt"),
+            str(tmp_path / "one" / "external" / "fmt"),
+        ],
+    ]
+    assert result[1] == (members[1].options, [])
+    assert result[2] == ({"dependencies": {}}, [])
+    options = shared_options(tmp_path, {"workspace": {}, "toolchains": {}}, shared)
+    assert options == {"dependencies": shared}
+
+
+def test_bob_workspace(
+    mocker: pytest_mock.MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pathlib.Path,
+) -> None:
+    """Verify the members are built as one graph, each in its own folder."""
+    # 1. Prepare
+    mocker.patch("subprocess.check_output", return_value="dummy string 4.0.1")
+    execute = mocker.patch("bob.executor.execute")
+    monkeypatch.chdir(tmp_path)
+    core = _member(tmp_path, "core", _FMT)
+    app = _member(tmp_path, "app", '[workspace]\ndepends = ["core"]\n' + _FMT)
+    tool = _member(tmp_path, "tool", "")
+    options = {
+        "workspace": {"members": ["*"]},
+        "jobs": "4",
+        "history": {"enabled": False},
+    }
+
+    # 2. Execute
+    bob.bob(bob.Command.Build, options)
+
+    # 3. Verify
+    jobs = {x.name: x for x in execute.call_args.args[0]}
+    shared = [x for x in jobs if x.startswith("workspace/")]
+    assert "workspace/clone:fmt" in shared
+    assert all(jobs[x].cwd == tmp_path for x in shared)
+    assert jobs["core/link:1"][-1] == str(core / "external" / "fmt")
+    assert jobs["core/link:0"].needs == ["workspace/checkout:fmt"]
+    assert jobs["core/bob:cmake"].needs == ["core/link:1"]
+    assert jobs["tool/bob:cmake"].needs == ["workspace/checkout:fmt"]
+    assert jobs["app/link:0"].needs == [
+        "workspace/checkout:fmt",
+        "core/native-release:build:0",
+    ]
+    assert not any("clone" in x for x in jobs if not x.startswith("workspace/"))
+
+    build = jobs["app/native-release:build:0"]
+    assert build.cwd == app
+    assert build.task == "app/native-release:build"
+    assert build.needs == ["app/native-release:configure:0"]
+    assert build[:3] == ["cmake", "--build", "build/native-release"]
+    assert jobs["tool/native-release:configure:0"].cwd == tool